@@ -0,0 +1,120 @@
+# Exports analytiques MonDRH
+# Export en colonnes (Parquet, Feather) des tables complètes pour les outils de BI
+#
+# Les lignes sont lues par blocs avec pandas.read_sql, les types sont normalisés
+# colonne par colonne (catégories, dates, entiers nullables) puis chaque bloc est
+# ajouté au fichier avec pyarrow : la mémoire reste bornée à un bloc, quelle que
+# soit la taille de la table. Ce module ne dépend pas de app.py.
+
+from dataclasses import dataclass
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import sqlalchemy as sa
+
+# Formats d'export : (type MIME, extension)
+ANALYTICS_FORMATS = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'feather': ('application/vnd.apache.arrow.file', 'feather'),
+}
+
+ANALYTICS_CHUNK_SIZE = 50000
+
+# Type Arrow de chaque famille de colonnes
+ARROW_TYPES = {
+    'category': pa.dictionary(pa.int32(), pa.string()),
+    'datetime': pa.timestamp('us', tz='UTC'),
+    'date': pa.date32(),
+    'time': pa.string(),
+    'bool': pa.bool_(),
+    'int': pa.int64(),
+    'float': pa.float64(),
+    'string': pa.string(),
+}
+
+@dataclass
+class AnalyticsDataset:
+    """Table exportée : requête source et colonnes à encoder en catégories"""
+    name: str
+    query: object
+    categorical: tuple = ()
+
+def column_kind(column, categorical):
+    """Famille d'une colonne, déduite de son type SQLAlchemy"""
+    if column.name in categorical:
+        return 'category'
+    sql_type = column.type
+    if isinstance(sql_type, sa.DateTime):
+        return 'datetime'
+    if isinstance(sql_type, sa.Date):
+        return 'date'
+    if isinstance(sql_type, sa.Time):
+        return 'time'
+    if isinstance(sql_type, sa.Boolean):
+        return 'bool'
+    if isinstance(sql_type, sa.Integer):
+        return 'int'
+    if isinstance(sql_type, (sa.Float, sa.Numeric)):
+        return 'float'
+    return 'string'
+
+def distinct_values(connection, query, column_name):
+    """Valeurs distinctes (non nulles) d'une colonne de la requête, triées"""
+    subquery = query.order_by(None).subquery()
+    column = subquery.c[column_name]
+    rows = connection.execute(sa.select(column).where(column.isnot(None)).distinct())
+    return sorted(str(value) for value, in rows)
+
+def normalize_chunk(chunk, kinds, categories):
+    """Convertit un bloc lu par read_sql vers les types de l'export (opérations vectorisées)"""
+    for name, kind in kinds.items():
+        values = chunk[name]
+        if kind == 'category':
+            known = categories[name]
+            unseen = set(values.dropna().astype(str)) - set(known)
+            if unseen:
+                # Valeur apparue pendant l'export : le dictionnaire est complété
+                known.extend(sorted(unseen))
+            chunk[name] = pd.Categorical(values.astype('string'), categories=known)
+        elif kind == 'datetime':
+            chunk[name] = pd.to_datetime(values, utc=True)
+        elif kind == 'date':
+            chunk[name] = pd.to_datetime(values).dt.date
+        elif kind == 'time':
+            chunk[name] = values.astype('string').str.slice(0, 8)
+        elif kind == 'bool':
+            chunk[name] = values.astype('boolean')
+        elif kind == 'int':
+            chunk[name] = values.astype('Int64')
+        elif kind == 'string':
+            chunk[name] = values.astype('string')
+    return chunk
+
+def _open_writer(output, schema, format):
+    if format == 'parquet':
+        return pq.ParquetWriter(output, schema, compression='zstd')
+    if format == 'feather':
+        # Feather v2 = fichier Arrow IPC
+        return pa.ipc.new_file(output, schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+    raise ValueError(f"Format analytique non supporté : {format}")
+
+def write_dataset(output, connection, dataset, format, chunksize=ANALYTICS_CHUNK_SIZE):
+    """Écrit une table complète dans output (fichier ou chemin) ; retourne le nombre de lignes"""
+    kinds = {column.name: column_kind(column, dataset.categorical) for column in dataset.query.selected_columns}
+    categories = {name: distinct_values(connection, dataset.query, name) for name in dataset.categorical}
+    schema = pa.schema([pa.field(name, ARROW_TYPES[kind]) for name, kind in kinds.items()])
+
+    rows = 0
+    with _open_writer(output, schema, format) as writer:
+        for chunk in pd.read_sql(dataset.query, connection, chunksize=chunksize):
+            normalize_chunk(chunk, kinds, categories)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+        if not rows:
+            writer.write_table(schema.empty_table())
+    return rows
+
+def analytics_filename(dataset_name, format, generated_at):
+    """Nom du fichier d'export analytique"""
+    return f"monderh_{dataset_name}_{generated_at.strftime('%Y%m%d_%H%M')}.{ANALYTICS_FORMATS[format][1]}"
@@ -1,42 +1,66 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, abort, Response, make_response
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, abort, Response, stream_with_context, send_file, g
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-from flask_mail import Mail, Message
+from flask_mail import Mail, Message, Connection, sanitize_address
 from flask_wtf import FlaskForm
 from wtforms import StringField, TextAreaField, SelectField, FileField, DateField, TimeField, SubmitField, BooleanField, PasswordField
 from wtforms.validators import DataRequired, Email, Length, EqualTo
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
 import os
 import logging
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, date, timedelta, timezone
 import json
 from functools import wraps
-import io
+from dataclasses import dataclass, field
 from io import StringIO
 import pickle
 import csv
-import pandas as pd
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.chart import BarChart, Reference
+import threading
+import time
+import tempfile
+import hashlib
+import random
+import uuid
+from email.utils import formataddr
+from urllib.parse import urlsplit
+from concurrent.futures import wait, FIRST_COMPLETED
+from itsdangerous import BadSignature, URLSafeSerializer
 from dotenv import load_dotenv
 
+from reports import (
+    ReportSnapshot, REPORT_FORMATS, EXCEL_MIMETYPE, APPLICATION_HEADERS, APPOINTMENT_HEADERS, JOB_HEADERS,
+    TimeSeries, TIME_SERIES_GRANULARITIES, bucket_start, bucket_range, next_bucket,
+    format_application_row, format_appointment_row, write_streaming_workbook,
+    report_filename, report_cache_key, render_report_bytes
+)
+from charts import ChartRenderer, CHART_PRESETS
+from render_cache import RenderCache
+from sql_profiler import init_sql_profiler, N_PLUS_ONE_THRESHOLD
+from pool_metrics import POOL_METRICS, init_pool_metrics
+from sqlite_profile import init_sqlite_profile
+from replica import ReplicaRouter, REPLICA_MAX_LAG, REPLICA_LAG_CHECK_INTERVAL
+from campaigns import RenderedCampaign, RateLimiter, SMTPConnectionPool, message_bytes, CAMPAIGN_RATE, CAMPAIGN_SMTP_CONNECTIONS, CAMPAIGN_BATCH_SIZE
+from email_templates import EmailTemplates
+from config import config
+from pagination import SortKey, KeysetPage, KeysetPaginator, estimate_count
+from backfill import Backfill
+from search import (
+    SearchDocument, SEARCH_MAX_RESULTS, get_search_backend, query_terms, highlight, snippet,
+    LookupDocument, LOOKUP_MAX_RESULTS, get_lookup_backend
+)
+from analytics import AnalyticsDataset, ANALYTICS_FORMATS, write_dataset, analytics_filename
+
 # Google API imports
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload, MediaIoBaseDownload
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
+from google_clients import GoogleClientCache
 
 # Charger les variables d'environnement
 load_dotenv()
@@ -55,27 +79,98 @@ CORS(app)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///monderh.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Pool de connexions selon l'environnement (pre-ping, recyclage, taille, statement_timeout) : voir config.py
+database_config = config.get(os.environ.get('FLASK_ENV'), config['default'])
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database_config.engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+# Réplica en lecture pour les exports et le reporting (optionnel, voir replica.py)
+app.config['REPLICA_DATABASE_URL'] = os.environ.get('REPLICA_DATABASE_URL')
+app.config['REPLICA_MAX_LAG'] = int(os.environ.get('REPLICA_MAX_LAG', REPLICA_MAX_LAG))  # secondes
+app.config['REPLICA_LAG_CHECK_INTERVAL'] = int(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', REPLICA_LAG_CHECK_INTERVAL))
+if app.config['REPLICA_DATABASE_URL']:
+    app.config['SQLALCHEMY_BINDS'] = {'replica': dict(
+        database_config.engine_options(app.config['REPLICA_DATABASE_URL']), url=app.config['REPLICA_DATABASE_URL']
+    )}
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['REPORT_SNAPSHOT_TTL'] = int(os.environ.get('REPORT_SNAPSHOT_TTL', 60))  # secondes
+app.config['LISTING_COUNT_TTL'] = int(os.environ.get('LISTING_COUNT_TTL', 60))  # secondes, totaux des listes filtrées
+
+# Exports en arrière-plan (worker.py)
+app.config['EXPORT_FOLDER'] = os.environ.get('EXPORT_FOLDER', os.path.join(app.instance_path, 'exports'))
+app.config['EXPORT_WORKERS'] = int(os.environ.get('EXPORT_WORKERS', 2))  # processus de rendu
+app.config['EXPORT_RETENTION_HOURS'] = int(os.environ.get('EXPORT_RETENTION_HOURS', 24))
+app.config['EXPORT_JOB_TIMEOUT'] = int(os.environ.get('EXPORT_JOB_TIMEOUT', 30 * 60))  # secondes avant reprise d'un job 'running'
+
+# Rendu des graphiques (pool de processus dédié, voir charts.py)
+app.config['CHART_RENDER_WORKERS'] = int(os.environ.get('CHART_RENDER_WORKERS', 2))
+app.config['CHART_RENDERS_PER_WORKER'] = int(os.environ.get('CHART_RENDERS_PER_WORKER', 50))  # avant recyclage du pool
+app.config['CHART_RENDER_TIMEOUT'] = int(os.environ.get('CHART_RENDER_TIMEOUT', 60))  # secondes
+app.config['CHART_PRESET'] = os.environ.get('CHART_PRESET', 'print')  # print, screen, thumbnail
+
+# Cache disque des rendus d'export (adressé par le contenu, éviction LRU)
+app.config['RENDER_CACHE_FOLDER'] = os.environ.get('RENDER_CACHE_FOLDER', os.path.join(app.instance_path, 'render_cache'))
+app.config['RENDER_CACHE_MAX_MB'] = int(os.environ.get('RENDER_CACHE_MAX_MB', 200))
+
+# Instrumentation SQL par requête (en-tête Server-Timing, /admin/debug/sql)
+app.config['SQL_PROFILING'] = os.environ.get('SQL_PROFILING', 'false').lower() in ('1', 'true', 'yes')
+app.config['SQL_N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', N_PLUS_ONE_THRESHOLD))
+
+# Exports en flux continu
+EXPORT_BATCH_SIZE = 1000  # lignes lues par lot
+EXPORT_CHUNK_SIZE = 64 * 1024  # octets envoyés par bloc
 
 # Email configuration
-app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-app.config['MAIL_PORT'] = 587
-app.config['MAIL_USE_TLS'] = True
+app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
+app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
+app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', 'true').lower() in ('1', 'true', 'yes')
 app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME', 'contact@monderh.fr')
 app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD', '')
 
+# Boîte d'envoi des emails (worker.py emails)
+app.config['EMAIL_BATCH_SIZE'] = int(os.environ.get('EMAIL_BATCH_SIZE', 50))  # emails réservés par lot
+app.config['EMAIL_MAX_ATTEMPTS'] = int(os.environ.get('EMAIL_MAX_ATTEMPTS', 8))  # avant passage en lettre morte
+app.config['EMAIL_RETRY_BASE'] = int(os.environ.get('EMAIL_RETRY_BASE', 60))  # secondes, doublé à chaque échec
+app.config['EMAIL_RETRY_MAX'] = int(os.environ.get('EMAIL_RETRY_MAX', 6 * 3600))  # secondes
+app.config['EMAIL_SMTP_IDLE_TIMEOUT'] = int(os.environ.get('EMAIL_SMTP_IDLE_TIMEOUT', 60))  # secondes avant fermeture de la connexion inactive
+app.config['EMAIL_OUTBOX_RETENTION_DAYS'] = int(os.environ.get('EMAIL_OUTBOX_RETENTION_DAYS', 30))
+app.config['EMAIL_CLAIM_LEASE'] = int(os.environ.get('EMAIL_CLAIM_LEASE', 15 * 60))  # secondes avant reprise d'un lot réservé
+
+# Campagnes newsletter (send_campaign.py, voir campaigns.py)
+app.config['CAMPAIGN_RATE'] = float(os.environ.get('CAMPAIGN_RATE', CAMPAIGN_RATE))  # emails par seconde
+app.config['CAMPAIGN_SMTP_CONNECTIONS'] = int(os.environ.get('CAMPAIGN_SMTP_CONNECTIONS', CAMPAIGN_SMTP_CONNECTIONS))
+app.config['SITE_URL'] = os.environ.get('SITE_URL', 'http://localhost:5000')  # liens absolus des emails (désinscription)
+
 # Google API configuration
 app.config['GOOGLE_CLIENT_ID'] = os.environ.get('GOOGLE_CLIENT_ID', '')
 app.config['GOOGLE_CLIENT_SECRET'] = os.environ.get('GOOGLE_CLIENT_SECRET', '')
 app.config['GOOGLE_DISCOVERY_URL'] = "https://accounts.google.com/.well-known/openid_configuration"
 
+# Copie des CV sur Google Drive (worker.py drive) : upload résumable par blocs
+app.config['DRIVE_UPLOAD_CHUNK_SIZE'] = int(os.environ.get('DRIVE_UPLOAD_CHUNK_SIZE', 1024 * 1024))  # octets, multiple de 256 Kio
+app.config['DRIVE_UPLOAD_MAX_ATTEMPTS'] = int(os.environ.get('DRIVE_UPLOAD_MAX_ATTEMPTS', 8))
+app.config['DRIVE_UPLOAD_RETRY_BASE'] = int(os.environ.get('DRIVE_UPLOAD_RETRY_BASE', 60))  # secondes, doublé à chaque échec
+app.config['DRIVE_UPLOAD_RETRY_MAX'] = int(os.environ.get('DRIVE_UPLOAD_RETRY_MAX', 3600))  # secondes
+app.config['DRIVE_UPLOAD_CLAIM_LEASE'] = int(os.environ.get('DRIVE_UPLOAD_CLAIM_LEASE', 10 * 60))  # secondes sans bloc envoyé avant reprise
+
 # Initialize extensions
 db = SQLAlchemy(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 mail = Mail(app)
+if app.config['SQL_PROFILING']:
+    init_sql_profiler(app)
+with app.app_context():
+    init_pool_metrics(db.engine)
+    # SQLite : mode WAL, synchronous=NORMAL, cache, mmap et busy_timeout (voir sqlite_profile.py)
+    init_sqlite_profile(db.engine, database_config.sqlite_profile())
+    replica_engine = db.engines.get('replica')
+    if replica_engine is not None:
+        init_sqlite_profile(replica_engine, database_config.sqlite_profile())
+    replica_router = ReplicaRouter(
+        db.engine, replica_engine,
+        max_lag=app.config['REPLICA_MAX_LAG'], check_interval=app.config['REPLICA_LAG_CHECK_INTERVAL']
+    )
 
 # Create upload folder
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -97,6 +192,11 @@ class User(UserMixin, db.Model):
     applications = db.relationship('Application', backref='applicant', lazy=True)
     appointments = db.relationship('Appointment', backref='user', lazy=True)
     
+    # Index des requêtes fréquentes (créés sur les bases existantes par migrations.py)
+    __table_args__ = (
+        db.Index('ix_user_created_at_id', 'created_at', 'id'),
+    )
+    
     def is_admin(self):
         return self.user_type == 'admin'
 
@@ -115,6 +215,13 @@ class Application(db.Model):
     status = db.Column(db.String(20), default='pending')  # pending, reviewed, accepted, rejected
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     notes = db.Column(db.Text)
+    
+    __table_args__ = (
+        db.Index('ix_application_created_at_id', 'created_at', 'id'),
+        db.Index('ix_application_status_created_at', 'status', 'created_at'),
+        db.Index('ix_application_service_type_created_at', 'service_type', 'created_at'),
+        db.Index('ix_application_user_id', 'user_id'),
+    )
 
 class Appointment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -128,6 +235,11 @@ class Appointment(db.Model):
     google_calendar_link = db.Column(db.String(500))
     status = db.Column(db.String(20), default='pending')  # pending, confirmed, cancelled, completed
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    __table_args__ = (
+        db.Index('ix_appointment_date_id', 'date', 'id'),
+        db.Index('ix_appointment_user_id_date', 'user_id', 'date'),
+    )
 
 class JobOffer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -148,6 +260,11 @@ class JobOffer(db.Model):
     # Relationships
     applications = db.relationship('JobApplication', backref='job_offer', lazy=True)
     
+    __table_args__ = (
+        db.Index('ix_job_offer_created_at_id', 'created_at', 'id'),
+        db.Index('ix_job_offer_is_active_created_at', 'is_active', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<JobOffer {self.title} at {self.company}>'
 
@@ -160,6 +277,32 @@ class JobApplication(db.Model):
     status = db.Column(db.String(20), default='pending')  # pending, reviewed, accepted, rejected
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     notes = db.Column(db.Text)
+    
+    __table_args__ = (
+        db.Index('ix_job_application_job_offer_id', 'job_offer_id'),
+        db.Index('ix_job_application_user_id', 'user_id'),
+    )
+
+# Compteurs agrégés (sous-requêtes corrélées) : différés, chargés avec la requête
+# principale via undefer() au lieu de charger les collections pour les compter
+JobOffer.applications_count = db.column_property(
+    db.select(db.func.count(JobApplication.id)).where(
+        JobApplication.job_offer_id == JobOffer.id
+    ).correlate_except(JobApplication).scalar_subquery(),
+    deferred=True
+)
+User.applications_count = db.column_property(
+    db.select(db.func.count(Application.id)).where(
+        Application.user_id == User.id
+    ).correlate_except(Application).scalar_subquery(),
+    deferred=True
+)
+User.appointments_count = db.column_property(
+    db.select(db.func.count(Appointment.id)).where(
+        Appointment.user_id == User.id
+    ).correlate_except(Appointment).scalar_subquery(),
+    deferred=True
+)
 
 class Newsletter(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -196,10 +339,839 @@ class GoogleToken(db.Model):
     client_secret = db.Column(db.String(500))
     scopes = db.Column(db.Text)  # JSON array of scopes
     expiry = db.Column(db.DateTime)
+    drive_folder_id = db.Column(db.String(200))  # dossier MondeRH_CV, résolu au premier upload
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     
     user = db.relationship('User', backref=db.backref('google_tokens', lazy=True))
+    
+    __table_args__ = (
+        db.Index('ix_google_token_user_id', 'user_id'),
+    )
+
+class DriveUpload(db.Model):
+    """Copie d'un CV sur le Google Drive d'un administrateur, envoyée par worker.py drive"""
+    __tablename__ = 'drive_upload'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    application_id = db.Column(db.Integer, db.ForeignKey('application.id', ondelete='SET NULL'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)  # Drive de destination
+    filename = db.Column(db.String(200), nullable=False)  # dans UPLOAD_FOLDER
+    mimetype = db.Column(db.String(100))
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, uploading, done, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    claim_token = db.Column(db.String(32))
+    claimed_at = db.Column(db.DateTime)  # réservation, prolongée à chaque bloc envoyé
+    upload_uri = db.Column(db.Text)  # session d'upload résumable en cours
+    uploaded_bytes = db.Column(db.BigInteger, nullable=False, default=0)  # octets confirmés par Drive
+    file_id = db.Column(db.String(200))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    finished_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_drive_upload_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+class ExportJob(db.Model):
+    """Export de rapport rendu en arrière-plan par worker.py"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    format = db.Column(db.String(20), nullable=False)  # csv, excel, pdf, png, svg, dashboard_pdf, dashboard_png, dashboard_svg
+    params_hash = db.Column(db.String(64), nullable=False, index=True)
+    status = db.Column(db.String(20), default='queued')  # queued, running, done, failed
+    filename = db.Column(db.String(200))
+    file_path = db.Column(db.String(500))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'format': self.format,
+            'status': self.status,
+            'filename': self.filename,
+            'error': self.error,
+            'download_url': url_for('admin_download_export', job_id=self.id) if self.status == 'done' else None
+        }
+
+class EmailOutbox(db.Model):
+    """Email à envoyer par worker.py emails, écrit dans la transaction de l'action qui l'a produit"""
+    __tablename__ = 'email_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    sender = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)  # liste JSON
+    body = db.Column(db.Text)
+    html = db.Column(db.Text)
+    headers = db.Column(db.Text)  # en-têtes supplémentaires (JSON)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, sending, sent, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    claim_token = db.Column(db.String(32))
+    claimed_at = db.Column(db.DateTime)  # réservation par un worker, reprise après EMAIL_CLAIM_LEASE
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    sent_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+class NewsletterCampaign(db.Model):
+    """Campagne envoyée aux abonnés newsletter par send_campaign.py"""
+    __tablename__ = 'newsletter_campaign'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)  # gabarits Jinja2 + champs de fusion [[...]]
+    body_text = db.Column(db.Text)
+    body_html = db.Column(db.Text)
+    segment = db.Column(db.String(50))  # intérêt ciblé (recrutement, coaching...), vide : tous les abonnés
+    status = db.Column(db.String(20), nullable=False, default='draft')  # draft, sending, paused, sent
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+class CampaignDelivery(db.Model):
+    """Envoi d'une campagne à un abonné : une ligne par destinataire, point de reprise de l'envoi"""
+    __tablename__ = 'campaign_delivery'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    campaign_id = db.Column(db.Integer, db.ForeignKey('newsletter_campaign.id'), nullable=False)
+    subscriber_id = db.Column(db.Integer, db.ForeignKey('newsletter.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='sending')  # sending, sent, failed, unknown
+    error = db.Column(db.Text)
+    sent_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.UniqueConstraint('campaign_id', 'subscriber_id', name='uq_campaign_delivery_subscriber'),
+    )
+
+class DailyStat(db.Model):
+    """Agrégat journalier (jour × type de service × statut) maintenu par les hooks SQLAlchemy"""
+    __tablename__ = 'daily_stats'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    entity = db.Column(db.String(20), nullable=False)  # application, appointment, user, newsletter, job_offer
+    service_type = db.Column(db.String(50), nullable=False, default='')
+    status = db.Column(db.String(20), nullable=False, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('day', 'entity', 'service_type', 'status', name='uq_daily_stats_bucket'),
+    )
+
+# Lectures de reporting
+# Les agrégations du tableau de bord, les instantanés de rapports et les exports lisent
+# via reporting_session() : sur le réplica s'il est configuré et à jour, sinon sur la
+# base principale (voir replica.py). Les écritures passent toujours par db.session.
+def reporting_session():
+    """Session des lectures de reporting, ouverte une fois par contexte d'application"""
+    if 'reporting_session' not in g:
+        engine = replica_router.engine()
+        g.reporting_session = db.session if engine is replica_router.primary else Session(bind=engine)
+    return g.reporting_session
+
+@app.teardown_appcontext
+def close_reporting_session(exception=None):
+    read_session = g.pop('reporting_session', None)
+    if read_session is not None and read_session is not db.session:
+        read_session.close()
+
+# Agrégats journaliers (daily_stats)
+def _day_key(value):
+    """Normalise une valeur de date SQL (date, datetime ou chaîne ISO) en 'YYYY-MM-DD'"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value[:10]
+    return value.strftime('%Y-%m-%d')
+
+def _active_label(value):
+    return 'inactive' if value is False else 'active'
+
+# Pour chaque modèle suivi : (entité, colonne date, colonne "service", colonne statut, conversion du statut)
+ROLLUP_SOURCES = {
+    Application: ('application', 'created_at', 'service_type', 'status', None),
+    Appointment: ('appointment', 'created_at', 'service_type', 'status', None),
+    User: ('user', 'created_at', None, 'user_type', None),
+    Newsletter: ('newsletter', 'subscribed_at', None, 'is_active', _active_label),
+    JobOffer: ('job_offer', 'created_at', 'contract_type', 'is_active', _active_label),
+}
+
+def _rollup_bucket(model, values):
+    """Calcule la clé (jour, entité, service, statut) d'une ligne à partir de ses valeurs"""
+    entity, date_attr, service_attr, status_attr, convert = ROLLUP_SOURCES[model]
+    created = values(date_attr)
+    if created is None:
+        return None
+    status = values(status_attr)
+    if convert:
+        status = convert(status)
+    service_type = values(service_attr) if service_attr else None
+    return (created.date() if isinstance(created, datetime) else created, entity, service_type or '', status or '')
+
+def _bump_daily_stat(connection, bucket, delta):
+    """Incrémente (ou décrémente) un compteur journalier dans la transaction en cours"""
+    table = DailyStat.__table__
+    day, entity, service_type, status = bucket
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table).values(
+            day=day, entity=entity, service_type=service_type, status=status, count=delta
+        ).on_conflict_do_update(
+            index_elements=['day', 'entity', 'service_type', 'status'],
+            set_={'count': table.c.count + delta}
+        )
+        connection.execute(stmt)
+        return
+    
+    # Autres moteurs : UPDATE puis INSERT si le compteur n'existe pas encore
+    result = connection.execute(table.update().where(
+        table.c.day == day, table.c.entity == entity,
+        table.c.service_type == service_type, table.c.status == status
+    ).values(count=table.c.count + delta))
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(
+            day=day, entity=entity, service_type=service_type, status=status, count=delta
+        ))
+
+def _rollup_after_insert(mapper, connection, target):
+    bucket = _rollup_bucket(mapper.class_, lambda attr: getattr(target, attr))
+    if bucket:
+        _bump_daily_stat(connection, bucket, 1)
+
+def _rollup_after_delete(mapper, connection, target):
+    bucket = _rollup_bucket(mapper.class_, lambda attr: getattr(target, attr))
+    if bucket:
+        _bump_daily_stat(connection, bucket, -1)
+
+def _rollup_after_update(mapper, connection, target):
+    state = db.inspect(target)
+    
+    def old_value(attr):
+        history = state.attrs[attr].history
+        if history.deleted:
+            return history.deleted[0]
+        return getattr(target, attr)
+    
+    old_bucket = _rollup_bucket(mapper.class_, old_value)
+    new_bucket = _rollup_bucket(mapper.class_, lambda attr: getattr(target, attr))
+    if old_bucket == new_bucket:
+        return
+    if old_bucket:
+        _bump_daily_stat(connection, old_bucket, -1)
+    if new_bucket:
+        _bump_daily_stat(connection, new_bucket, 1)
+
+def _keep_previous_value(target, value, oldvalue, initiator):
+    return value
+
+for _model, _spec in ROLLUP_SOURCES.items():
+    event.listen(_model, 'after_insert', _rollup_after_insert)
+    event.listen(_model, 'after_update', _rollup_after_update)
+    event.listen(_model, 'after_delete', _rollup_after_delete)
+    # Charger l'ancienne valeur avant modification pour décrémenter le bon compteur
+    for _attr in _spec[1:4]:
+        if _attr:
+            event.listen(getattr(_model, _attr), 'set', _keep_previous_value, active_history=True, retval=True)
+
+def rebuild_daily_stats():
+    """Reconstruit entièrement daily_stats à partir des tables sources (backfill)"""
+    table = DailyStat.__table__
+    with db.engine.begin() as connection:
+        connection.execute(table.delete())
+        for model, (entity, date_attr, service_attr, status_attr, convert) in ROLLUP_SOURCES.items():
+            date_column = getattr(model, date_attr)
+            day = db.func.date(date_column)
+            service_type = db.func.coalesce(getattr(model, service_attr), '') if service_attr else db.literal('')
+            if convert:
+                status = db.case((getattr(model, status_attr).is_(False), 'inactive'), else_='active')
+            else:
+                status = db.func.coalesce(getattr(model, status_attr), '')
+            
+            select = db.select(
+                day, db.literal(entity), service_type, status, db.func.count()
+            ).where(date_column.isnot(None)).group_by(day, service_type, status)
+            connection.execute(table.insert().from_select(
+                ['day', 'entity', 'service_type', 'status', 'count'], select
+            ))
+    return DailyStat.query.count()
+
+@dataclass
+class RollupTotals:
+    """Totaux lus depuis daily_stats, sans parcourir les tables sources"""
+    users: int = 0
+    applications: int = 0
+    appointments: int = 0
+    newsletters: int = 0
+    job_offers: int = 0
+    active_job_offers: int = 0
+    applications_by_service: dict = field(default_factory=dict)
+    applications_by_status: dict = field(default_factory=dict)
+    job_offers_by_contract: dict = field(default_factory=dict)
+
+def get_rollup_totals(read_session=None):
+    """Retourne les totaux globaux en une seule requête GROUP BY sur daily_stats"""
+    rows = (read_session or db.session).query(
+        DailyStat.entity, DailyStat.service_type, DailyStat.status, db.func.sum(DailyStat.count)
+    ).group_by(DailyStat.entity, DailyStat.service_type, DailyStat.status).all()
+    
+    totals = RollupTotals()
+    for entity, service_type, status, count in rows:
+        count = int(count or 0)
+        if not count:
+            continue
+        if entity == 'user':
+            totals.users += count
+        elif entity == 'application':
+            totals.applications += count
+            totals.applications_by_service[service_type] = totals.applications_by_service.get(service_type, 0) + count
+            totals.applications_by_status[status] = totals.applications_by_status.get(status, 0) + count
+        elif entity == 'appointment':
+            totals.appointments += count
+        elif entity == 'newsletter':
+            if status == 'active':
+                totals.newsletters += count
+        elif entity == 'job_offer':
+            totals.job_offers += count
+            if status == 'active':
+                totals.active_job_offers += count
+            totals.job_offers_by_contract[service_type] = totals.job_offers_by_contract.get(service_type, 0) + count
+    return totals
+
+# Séries temporelles
+# Regroupement par jour, semaine ou mois calculé en SQL avec les fonctions de date du
+# dialecte : toutes les séries d'une période, quelle que soit sa durée, sont obtenues
+# en une seule requête agrégée (UNION ALL d'un GROUP BY par source).
+TIME_SERIES_SOURCES = {
+    'applications': Application.created_at,
+    'appointments': Appointment.created_at,
+    'registrations': User.created_at,
+}
+
+def time_bucket(column, granularity, dialect_name):
+    """Expression SQL du début d'intervalle contenant column"""
+    if dialect_name == 'postgresql':
+        # date_trunc('week') commence le lundi (semaine ISO)
+        return db.cast(db.func.date_trunc(db.literal_column(f"'{granularity}'"), column), db.Date)
+    if dialect_name == 'sqlite':
+        if granularity == 'week':
+            # dimanche suivant (ou le jour même) moins 6 jours = lundi de la semaine
+            return db.func.date(column, db.literal_column("'weekday 0'"), db.literal_column("'-6 days'"))
+        if granularity == 'month':
+            return db.func.strftime(db.literal_column("'%Y-%m-01'"), column)
+        return db.func.date(column)
+    # Autres bases : regroupement SQL par jour, complété en Python (bucket_start)
+    return db.func.date(column)
+
+def get_time_series(granularity='month', first_day=None, last_day=None, sources=None, read_session=None):
+    """Comptages par intervalle entre first_day et last_day (inclus), intervalles vides compris"""
+    if granularity not in TIME_SERIES_GRANULARITIES:
+        raise ValueError(f"Granularité non supportée : {granularity}")
+    sources = list(sources or TIME_SERIES_SOURCES)
+    last_day = last_day or datetime.now(timezone.utc).date()
+    first_day = first_day or bucket_start(last_day, granularity)
+    buckets = bucket_range(first_day, last_day, granularity)
+    # Bornes alignées sur les intervalles, en UTC naïf comme created_at
+    start = datetime.combine(buckets[0], datetime.min.time())
+    end = datetime.combine(next_bucket(buckets[-1], granularity), datetime.min.time())
+    
+    read_session = read_session or db.session
+    dialect_name = read_session.get_bind().dialect.name
+    selects = []
+    for name in sources:
+        column = TIME_SERIES_SOURCES[name]
+        bucket = time_bucket(column, granularity, dialect_name)
+        selects.append(
+            db.select(db.literal(name).label('source'), bucket.label('bucket'), db.func.count().label('total'))
+            .where(column >= start, column < end)
+            .group_by(bucket)
+        )
+    
+    counts = {name: dict.fromkeys(buckets, 0) for name in sources}
+    for name, bucket, total in read_session.execute(db.union_all(*selects)).all():
+        key = bucket_start(date.fromisoformat(_day_key(bucket)), granularity)
+        counts[name][key] = counts[name].get(key, 0) + total
+    
+    return TimeSeries(
+        granularity=granularity,
+        buckets=buckets,
+        series={name: [counts[name][key] for key in buckets] for name in sources}
+    )
+
+# Recherche plein texte des candidatures
+# Index FTS5 (SQLite) ou tsvector + GIN (PostgreSQL), voir search.py. Il est tenu à
+# jour par les hooks SQLAlchemy dans la transaction de l'écriture ; sans index
+# disponible (autre base, FTS5 absent), la recherche se replie sur LIKE.
+_search_index = {'ready': False}
+
+def _search_documents(connection, application_ids):
+    rows = connection.execute(
+        db.select(
+            Application.id, Application.position, Application.cover_letter,
+            User.first_name, User.last_name, User.email
+        ).outerjoin(User, Application.user_id == User.id).where(Application.id.in_(application_ids))
+    )
+    return [SearchDocument.build(*row) for row in rows]
+
+def reindex_applications(connection, application_ids):
+    """Met à jour l'entrée d'index des candidatures données"""
+    if _search_index['ready'] and application_ids:
+        get_search_backend(connection.dialect.name).upsert(connection, _search_documents(connection, application_ids))
+
+def _has_changes(target, attributes):
+    state = db.inspect(target)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+def _search_after_insert(mapper, connection, target):
+    reindex_applications(connection, [target.id])
+
+def _search_after_update_application(mapper, connection, target):
+    if _has_changes(target, ('position', 'cover_letter', 'user_id')):
+        reindex_applications(connection, [target.id])
+
+def _search_after_update_user(mapper, connection, target):
+    if _search_index['ready'] and _has_changes(target, ('first_name', 'last_name', 'email')):
+        application_ids = connection.execute(
+            db.select(Application.id).where(Application.user_id == target.id)
+        ).scalars().all()
+        reindex_applications(connection, application_ids)
+
+def _search_after_delete(mapper, connection, target):
+    if _search_index['ready']:
+        get_search_backend(connection.dialect.name).delete(connection, [target.id])
+
+event.listen(Application, 'after_insert', _search_after_insert)
+event.listen(Application, 'after_update', _search_after_update_application)
+event.listen(Application, 'after_delete', _search_after_delete)
+event.listen(User, 'after_update', _search_after_update_user)
+
+def setup_search_index():
+    """Crée l'index de recherche s'il manque (et le remplit dans ce cas)"""
+    with db.engine.begin() as connection:
+        backend = get_search_backend(connection.dialect.name)
+        if backend is None:
+            return
+        created = backend.setup(connection)
+    _search_index['ready'] = True
+    if created:
+        indexed = rebuild_search_index()
+        logger.info(f"Index de recherche créé ({indexed} candidatures indexées)")
+
+def rebuild_search_index(batch_size=1000):
+    """Reconstruit entièrement l'index de recherche ; retourne le nombre de candidatures indexées"""
+    if not _search_index['ready']:
+        return 0
+    total = 0
+    with db.engine.begin() as connection:
+        backend = get_search_backend(connection.dialect.name)
+        backend.clear(connection)
+        last_id = 0
+        while True:
+            application_ids = connection.execute(
+                db.select(Application.id).where(Application.id > last_id).order_by(Application.id).limit(batch_size)
+            ).scalars().all()
+            if not application_ids:
+                break
+            backend.upsert(connection, _search_documents(connection, application_ids))
+            total += len(application_ids)
+            last_id = application_ids[-1]
+    return total
+
+def search_application_ids(search, limit=SEARCH_MAX_RESULTS):
+    """Identifiants des candidatures trouvées, par pertinence décroissante ; None sans index"""
+    if not _search_index['ready']:
+        return None
+    terms = query_terms(search)
+    if not terms:
+        return []
+    connection = db.session.connection()
+    return [application_id for application_id, _ in get_search_backend(connection.dialect.name).search(connection, terms, limit)]
+
+# Recherche approximative des utilisateurs
+# Index de trigrammes sur prénom, nom, email et entreprise (voir search.py), tenu à
+# jour par les hooks SQLAlchemy ; sans index disponible, recherche par LIKE.
+_lookup_index = {'ready': False}
+LOOKUP_FIELDS = ('first_name', 'last_name', 'email', 'company')
+
+def _lookup_documents(connection, user_ids):
+    rows = connection.execute(
+        db.select(User.id, User.first_name, User.last_name, User.email, User.company).where(User.id.in_(user_ids))
+    )
+    return [LookupDocument.build(*row) for row in rows]
+
+def reindex_users(connection, user_ids):
+    """Met à jour l'entrée d'index des utilisateurs donnés"""
+    if _lookup_index['ready'] and user_ids:
+        get_lookup_backend(connection.dialect.name).upsert(connection, _lookup_documents(connection, user_ids))
+
+def _lookup_after_insert(mapper, connection, target):
+    reindex_users(connection, [target.id])
+
+def _lookup_after_update(mapper, connection, target):
+    if _has_changes(target, LOOKUP_FIELDS):
+        reindex_users(connection, [target.id])
+
+def _lookup_after_delete(mapper, connection, target):
+    if _lookup_index['ready']:
+        get_lookup_backend(connection.dialect.name).delete(connection, [target.id])
+
+event.listen(User, 'after_insert', _lookup_after_insert)
+event.listen(User, 'after_update', _lookup_after_update)
+event.listen(User, 'after_delete', _lookup_after_delete)
+
+def setup_user_lookup():
+    """Crée l'index de recherche des utilisateurs s'il manque (et le remplit dans ce cas)"""
+    with db.engine.begin() as connection:
+        backend = get_lookup_backend(connection.dialect.name)
+        if backend is None:
+            return
+        created = backend.setup(connection)
+    _lookup_index['ready'] = True
+    if created:
+        indexed = rebuild_user_lookup()
+        logger.info(f"Index de recherche des utilisateurs créé ({indexed} utilisateurs indexés)")
+
+def rebuild_user_lookup(batch_size=1000):
+    """Reconstruit l'index de recherche des utilisateurs ; retourne le nombre d'utilisateurs indexés"""
+    if not _lookup_index['ready']:
+        return 0
+    total = 0
+    with db.engine.begin() as connection:
+        backend = get_lookup_backend(connection.dialect.name)
+        backend.clear(connection)
+        last_id = 0
+        while True:
+            user_ids = connection.execute(
+                db.select(User.id).where(User.id > last_id).order_by(User.id).limit(batch_size)
+            ).scalars().all()
+            if not user_ids:
+                break
+            backend.upsert(connection, _lookup_documents(connection, user_ids))
+            total += len(user_ids)
+            last_id = user_ids[-1]
+    return total
+
+def lookup_users(query, limit=LOOKUP_MAX_RESULTS):
+    """[(utilisateur, score)] les plus proches de la saisie, tolérant les fautes de frappe"""
+    query = (query or '').strip()
+    if len(query) < 2:
+        return []
+    if _lookup_index['ready']:
+        connection = db.session.connection()
+        ranked = get_lookup_backend(connection.dialect.name).search(connection, query, limit)
+        users = {user.id: user for user in User.query.filter(User.id.in_([user_id for user_id, _ in ranked]))}
+        return [(users[user_id], score) for user_id, score in ranked if user_id in users]
+    pattern = f"%{query}%"
+    users = User.query.filter(db.or_(*(getattr(User, name).ilike(pattern) for name in LOOKUP_FIELDS))).order_by(User.id).limit(limit)
+    return [(user, None) for user in users]
+
+# Chargement des listes d'administration
+# Options de chargement par vue : les relations affichées sont chargées avec la page
+# (joinedload pour un objet lié, compteur agrégé pour une collection), ce qui fixe le
+# nombre de requêtes d'une page quel que soit le nombre de lignes affichées.
+def admin_query_options(view):
+    """Options de chargement de la requête principale d'une vue d'administration"""
+    options = {
+        'applications': [db.joinedload(Application.applicant)],
+        'appointments': [db.joinedload(Appointment.user)],
+        'jobs': [db.undefer(JobOffer.applications_count)],
+        'user_detail': [db.undefer(User.applications_count), db.undefer(User.appointments_count)],
+    }
+    return options[view]
+
+# Remplissages progressifs (run_backfill.py)
+# Index et colonnes dérivées à peupler par lots sur une base en production, sans
+# transaction unique ni verrou prolongé : voir backfill.py.
+BACKFILLS = {
+    backfill.name: backfill for backfill in (
+        Backfill('search_index', Application.__table__, reindex_applications,
+                 description="Index plein texte des candidatures"),
+        Backfill('user_lookup', User.__table__, reindex_users,
+                 description="Index de trigrammes des utilisateurs"),
+    )
+}
+
+# Pagination des listes d'administration
+# Parcours par curseur sur (created_at, id) / (date, id) : voir pagination.py. Les
+# totaux viennent de daily_stats pour les listes non filtrées, sinon de l'estimation
+# du planificateur (PostgreSQL) ou d'un COUNT mis en cache LISTING_COUNT_TTL secondes.
+LISTING_PER_PAGE = 20
+LISTING_SORT_KEYS = {
+    'users': (SortKey(User.created_at), SortKey(User.id)),
+    'applications': (SortKey(Application.created_at), SortKey(Application.id)),
+    'appointments': (SortKey(Appointment.date), SortKey(Appointment.id)),
+    'jobs': (SortKey(JobOffer.created_at), SortKey(JobOffer.id)),
+}
+LISTING_COUNT_CACHE_SIZE = 256
+_listing_count_cache = {}
+_listing_count_lock = threading.Lock()
+
+def ranked_sort_keys(column, ranked_ids):
+    """Clés de tri suivant l'ordre de pertinence d'une recherche"""
+    if not ranked_ids:
+        # CASE sans branche WHEN : SQL invalide
+        return (SortKey(column, descending=False),)
+    ranks = {item_id: rank for rank, item_id in enumerate(ranked_ids)}
+    rank = db.case(ranks, value=column, else_=len(ranks))
+    return (
+        SortKey(rank, descending=False, value=lambda item: ranks.get(getattr(item, column.key), len(ranks))),
+        SortKey(column, descending=False),
+    )
+
+def listing_total(query):
+    """(total, estimé ?) d'une liste filtrée"""
+    statement = query.order_by(None).statement
+    connection = db.session.connection()
+    estimate = estimate_count(connection, statement)
+    if estimate is not None:
+        return estimate, True
+    
+    compiled = statement.compile(dialect=connection.dialect)
+    key = str(compiled) + repr(sorted(compiled.params.items()))
+    now = time.monotonic()
+    with _listing_count_lock:
+        cached = _listing_count_cache.get(key)
+        if cached is not None and now < cached[1]:
+            return cached[0], False
+    total = query.order_by(None).count()
+    with _listing_count_lock:
+        if len(_listing_count_cache) >= LISTING_COUNT_CACHE_SIZE:
+            _listing_count_cache.clear()
+        _listing_count_cache[key] = (total, now + app.config['LISTING_COUNT_TTL'])
+    return total, False
+
+def paginate_listing(query, keys, rollup_total=None):
+    """Page demandée (paramètre cursor) d'une liste d'administration, avec son total"""
+    page = KeysetPaginator(keys, app.config['SECRET_KEY']).paginate(
+        query, request.args.get('cursor'), LISTING_PER_PAGE
+    )
+    if rollup_total is not None:
+        page.total = rollup_total
+    else:
+        page.total, page.total_is_estimate = listing_total(query)
+    return page
+
+# Campagnes newsletter
+# Chaque abonné destinataire reçoit une ligne campaign_delivery, validée ('sending')
+# avant que son email parte : une reprise après interruption ne considère que les
+# abonnés sans ligne, et n'envoie donc jamais deux fois. Un envoi dont l'issue est
+# inconnue après un arrêt brutal passe en 'unknown' au lieu d'être renvoyé. Le rendu
+# Jinja2 est fait une fois par segment (intérêt de l'abonné), voir campaigns.py.
+@dataclass
+class CampaignProgress:
+    """Avancement d'une campagne"""
+    status: str
+    sent: int = 0
+    failed: int = 0
+    unknown: int = 0
+    remaining: int = 0
+
+def _site_urls():
+    """Constructeur d'URL absolues vers SITE_URL, utilisable hors requête (scripts, workers)"""
+    site = urlsplit(app.config['SITE_URL'])
+    return app.url_map.bind(site.netloc, script_name=site.path or '/', url_scheme=site.scheme or 'https')
+
+def _unsubscribe_serializer():
+    return URLSafeSerializer(app.config['SECRET_KEY'], salt='newsletter-unsubscribe')
+
+def newsletter_unsubscribe_url(subscriber_id, urls=None):
+    token = _unsubscribe_serializer().dumps(subscriber_id)
+    return (urls or _site_urls()).build('newsletter_unsubscribe', {'token': token}, force_external=True)
+
+def _campaign_recipients_query(campaign, *columns):
+    """Abonnés actifs du segment de la campagne sans ligne d'envoi"""
+    delivered = db.exists().where(
+        CampaignDelivery.campaign_id == campaign.id, CampaignDelivery.subscriber_id == Newsletter.id
+    )
+    query = db.session.query(*columns).filter(Newsletter.is_active.is_(True), ~delivered)
+    if campaign.segment:
+        query = query.filter(db.or_(
+            Newsletter.interests == campaign.segment, Newsletter.interests == 'all', Newsletter.interests.is_(None)
+        ))
+    return query
+
+def campaign_recipients(campaign, after_id=0, limit=CAMPAIGN_BATCH_SIZE):
+    """Prochains destinataires (id croissant) : lignes (id, email, prénom, nom, entreprise, intérêt)"""
+    return _campaign_recipients_query(
+        campaign, Newsletter.id, Newsletter.email, Newsletter.first_name, Newsletter.last_name,
+        Newsletter.company, Newsletter.interests
+    ).filter(Newsletter.id > after_id).order_by(Newsletter.id).limit(limit).all()
+
+def campaign_progress(campaign):
+    """Compteurs d'envoi d'une campagne et nombre de destinataires restants"""
+    counts = dict(db.session.query(CampaignDelivery.status, db.func.count()).filter(
+        CampaignDelivery.campaign_id == campaign.id
+    ).group_by(CampaignDelivery.status).all())
+    return CampaignProgress(
+        status=campaign.status,
+        sent=counts.get('sent', 0),
+        failed=counts.get('failed', 0),
+        unknown=counts.get('unknown', 0) + counts.get('sending', 0),
+        remaining=_campaign_recipients_query(campaign, db.func.count(Newsletter.id)).scalar()
+    )
+
+def campaign_renderer(campaign):
+    """Compile les gabarits de la campagne ; retourne render(segment), rendu une fois par segment"""
+    subject, body, html = (
+        app.jinja_env.from_string(source) if source else None
+        for source in (campaign.subject, campaign.body_text, campaign.body_html)
+    )
+    context = {'campaign_id': campaign.id, 'site_url': app.config['SITE_URL']}
+    rendered = {}
+    
+    def render(segment):
+        if segment not in rendered:
+            values = dict(context, segment=segment)
+            rendered[segment] = RenderedCampaign(
+                subject=subject.render(values),
+                body=body.render(values) if body else '',
+                html=html.render(values) if html else None
+            )
+        return rendered[segment]
+    
+    return render
+
+def campaign_message(rendered, recipient, urls=None):
+    """Message personnalisé d'un destinataire (ligne de campaign_recipients)"""
+    subscriber_id, email, first_name, last_name, company, interests = recipient
+    unsubscribe_url = newsletter_unsubscribe_url(subscriber_id, urls)
+    subject, body, html = rendered.personalize({
+        'first_name': first_name, 'last_name': last_name, 'email': email, 'company': company,
+        'unsubscribe_url': unsubscribe_url
+    })
+    return Message(
+        subject,
+        sender=app.config['MAIL_USERNAME'],
+        recipients=[email],
+        body=body,
+        html=html,
+        extra_headers={
+            'List-Unsubscribe': f'<{unsubscribe_url}>',
+            'List-Unsubscribe-Post': 'List-Unsubscribe=One-Click',
+            'Precedence': 'bulk',
+        }
+    )
+
+def _campaign_smtp_connect():
+    return Connection(app.extensions['mail']).configure_host()
+
+def reset_failed_deliveries(campaign):
+    """Supprime les envois en échec : leurs destinataires seront repris au prochain envoi"""
+    count = CampaignDelivery.query.filter_by(campaign_id=campaign.id, status='failed').delete(synchronize_session=False)
+    db.session.commit()
+    return count
+
+def send_campaign(campaign_id, rate=None, connections=None, batch_size=CAMPAIGN_BATCH_SIZE, max_recipients=None, on_progress=None, force=False):
+    """Envoie la campagne aux abonnés qui ne l'ont pas encore reçue ; retourne son avancement
+
+    Un seul envoi à la fois par campagne : la campagne est réservée en passant de 'draft'
+    ou 'paused' à 'sending', et l'envoi est refusé si elle est déjà 'sending'. force=True
+    reprend une campagne restée 'sending' après l'arrêt brutal de son processus.
+    Interrompu (Ctrl+C), l'envoi attend les emails en cours, enregistre leur résultat et
+    passe la campagne en 'paused'. on_progress(envoyés) est appelé après chaque destinataire.
+    """
+    campaign = db.session.get(NewsletterCampaign, campaign_id)
+    if campaign is None:
+        raise ValueError(f"Campagne {campaign_id} introuvable")
+    if campaign.status == 'sent':
+        return campaign_progress(campaign)
+    
+    # Réservation atomique : un second processus ne peut pas envoyer la même campagne
+    claimable = ['draft', 'paused', 'sending'] if force else ['draft', 'paused']
+    claimed = NewsletterCampaign.query.filter(
+        NewsletterCampaign.id == campaign_id, NewsletterCampaign.status.in_(claimable)
+    ).update({'status': 'sending'}, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        raise ValueError(
+            f"Campagne {campaign_id} déjà en cours d'envoi par un autre processus "
+            f"(forcer la reprise si celui-ci a été arrêté brutalement)"
+        )
+    db.session.refresh(campaign)
+    
+    # Envois commencés par un processus arrêté brutalement : issue inconnue, jamais renvoyés
+    CampaignDelivery.query.filter_by(campaign_id=campaign.id, status='sending').update(
+        {'status': 'unknown'}, synchronize_session=False
+    )
+    campaign.started_at = campaign.started_at or datetime.now(timezone.utc)
+    db.session.commit()
+    
+    connections = connections or app.config['CAMPAIGN_SMTP_CONNECTIONS']
+    limiter = RateLimiter(app.config['CAMPAIGN_RATE'] if rate is None else rate)
+    render = campaign_renderer(campaign)
+    urls = _site_urls()
+    sender = sanitize_address(app.config['MAIL_USERNAME'])
+    pending = {}
+    submitted = 0
+    last_id = 0
+    finished = False
+    unsent = None  # ligne validée dont l'email n'est pas encore confié au pool
+    
+    def record(futures):
+        for future in futures:
+            delivery = pending.pop(future)
+            error = future.exception()
+            delivery.status = 'failed' if error else 'sent'
+            delivery.error = str(error)[:2000] if error else None
+            delivery.sent_at = None if error else datetime.now(timezone.utc)
+            if error:
+                logger.warning(f"Campagne {campaign_id} : envoi à l'abonné {delivery.subscriber_id} en échec: {error}")
+    
+    with SMTPConnectionPool(_campaign_smtp_connect, connections) as pool:
+        try:
+            while max_recipients is None or submitted < max_recipients:
+                recipients = campaign_recipients(campaign, last_id, batch_size)
+                if not recipients:
+                    finished = True
+                    break
+                for recipient in recipients:
+                    if max_recipients is not None and submitted >= max_recipients:
+                        break
+                    last_id = recipient[0]
+                    payload = message_bytes(campaign_message(render(recipient[5] or 'all'), recipient, urls))
+                    limiter.acquire()
+                    
+                    unsent = CampaignDelivery(campaign_id=campaign_id, subscriber_id=recipient[0], status='sending')
+                    db.session.add(unsent)
+                    # Point de reprise validé avant l'envoi, avec le résultat des envois terminés
+                    record([future for future in pending if future.done()])
+                    db.session.commit()
+                    pending[pool.submit(sender, [sanitize_address(recipient[1])], payload)] = unsent
+                    unsent = None
+                    submitted += 1
+                    if len(pending) >= connections * 2:
+                        wait(pending, return_when=FIRST_COMPLETED)
+                    if on_progress is not None:
+                        on_progress(submitted)
+        finally:
+            # Attendre les envois en cours pour enregistrer leur résultat, même après Ctrl+C
+            wait(pending)
+            record(list(pending))
+            if unsent is not None:
+                if unsent in db.session.new:
+                    db.session.expunge(unsent)
+                else:
+                    db.session.delete(unsent)
+            campaign.status = 'sent' if finished else 'paused'
+            if finished:
+                campaign.finished_at = datetime.now(timezone.utc)
+            db.session.commit()
+    
+    progress = campaign_progress(campaign)
+    logger.info(f"Campagne {campaign_id} {campaign.status} : {progress.sent} envoyés, {progress.failed} en échec, {progress.remaining} restants")
+    return progress
 
 # Admin decorator
 def admin_required(f):
@@ -239,12 +1211,13 @@ def get_google_credentials(user_id):
     # Vérifier si le token doit être rafraîchi
     if creds and creds.expired and creds.refresh_token:
         creds.refresh(Request())
-        # Sauvegarder le nouveau token
-        save_google_credentials(user_id, creds)
+        # Sauvegarder le nouveau token ; les clients en cache aux credentials expirés sont
+        # reconstruits d'eux-mêmes : invalider écarterait celui que google_clients construit avec
+        save_google_credentials(user_id, creds, invalidate_clients=False)
     
     return creds
 
-def save_google_credentials(user_id, credentials):
+def save_google_credentials(user_id, credentials, invalidate_clients=True):
     """Sauvegarde les credentials Google d'un utilisateur"""
     token = GoogleToken.query.filter_by(user_id=user_id).first()
     if not token:
@@ -261,63 +1234,52 @@ def save_google_credentials(user_id, credentials):
     
     db.session.add(token)
     db.session.commit()
+    # Les clients construits avec les anciens credentials ne sont plus réutilisés
+    if invalidate_clients:
+        google_clients.invalidate(user_id)
 
-def upload_to_google_drive(user_id, file_content, filename, mimetype):
-    """Upload un fichier vers Google Drive"""
-    creds = get_google_credentials(user_id)
-    if not creds:
-        return None
-    
-    try:
-        service = build('drive', 'v3', credentials=creds)
-        
-        # Créer le dossier MondeRH s'il n'existe pas
-        folder_name = 'MondeRH_CV'
-        folders = service.files().list(
-            q=f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder'",
-            fields="files(id, name)"
-        ).execute()
-        
-        if not folders.get('files'):
-            folder_metadata = {
-                'name': folder_name,
-                'mimeType': 'application/vnd.google-apps.folder'
-            }
-            folder = service.files().create(body=folder_metadata, fields='id').execute()
-            folder_id = folder.get('id')
-        else:
-            folder_id = folders.get('files')[0].get('id')
-        
-        # Upload le fichier
-        file_metadata = {
-            'name': filename,
-            'parents': [folder_id]
-        }
-        
-        media = MediaIoBaseUpload(io.BytesIO(file_content), mimetype=mimetype)
-        file = service.files().create(
-            body=file_metadata,
-            media_body=media,
-            fields='id,webViewLink'
+# Clients des API Google par utilisateur, construits une fois et réutilisés tant que
+# leurs credentials sont valides (voir google_clients.py)
+google_clients = GoogleClientCache()
+
+DRIVE_CV_FOLDER = 'MondeRH_CV'
+DRIVE_FOLDER_MIMETYPE = 'application/vnd.google-apps.folder'
+
+def google_service(user_id, api, version):
+    """Client d'API Google de l'utilisateur (None s'il n'a pas autorisé Google)"""
+    return google_clients.get(user_id, api, version, lambda: get_google_credentials(user_id))
+
+def drive_cv_folder_id(service, user_id, refresh=False):
+    """Id du dossier MondeRH_CV : enregistré sur le GoogleToken, sinon recherché ou créé sur Drive"""
+    token = GoogleToken.query.filter_by(user_id=user_id).first()
+    if token is not None and token.drive_folder_id and not refresh:
+        return token.drive_folder_id
+    
+    folders = service.files().list(
+        q=f"name='{DRIVE_CV_FOLDER}' and mimeType='{DRIVE_FOLDER_MIMETYPE}' and trashed=false",
+        fields="files(id)",
+        pageSize=1
+    ).execute().get('files')
+    if folders:
+        folder_id = folders[0]['id']
+    else:
+        folder = service.files().create(
+            body={'name': DRIVE_CV_FOLDER, 'mimeType': DRIVE_FOLDER_MIMETYPE}, fields='id'
         ).execute()
-        
-        return {
-            'file_id': file.get('id'),
-            'web_link': file.get('webViewLink')
-        }
-        
-    except Exception as e:
-        print(f"Erreur upload Google Drive: {e}")
-        return None
+        folder_id = folder['id']
+    
+    if token is not None:
+        token.drive_folder_id = folder_id
+        db.session.commit()
+    return folder_id
 
 def create_calendar_event(user_id, appointment_data):
     """Crée un événement dans Google Calendar"""
-    creds = get_google_credentials(user_id)
-    if not creds:
+    service = google_service(user_id, 'calendar', 'v3')
+    if not service:
         return None
     
     try:
-        service = build('calendar', 'v3', credentials=creds)
         
         # Convertir la date et l'heure en format ISO
         start_datetime = datetime.combine(appointment_data['date'], appointment_data['time'])
@@ -356,6 +1318,162 @@ def create_calendar_event(user_id, appointment_data):
         print(f"Erreur création événement Calendar: {e}")
         return None
 
+# Copie des CV sur Google Drive (drive_upload)
+# Le CV est d'abord enregistré dans UPLOAD_FOLDER avec la candidature ; worker.py drive
+# l'envoie ensuite sur le Drive de l'administrateur par upload résumable, bloc par
+# bloc depuis le fichier local. L'adresse de la session et les octets confirmés sont
+# enregistrés après chaque bloc : une nouvelle tentative reprend au dernier bloc reçu.
+# Application.google_drive_link est renseigné une fois l'upload terminé.
+def retry_delay(attempts, base, maximum):
+    """Délai avant la tentative suivante : doublé à chaque échec, plafonné, avec une gigue de ±20 %"""
+    delay = min(base * 2 ** max(attempts - 1, 0), maximum)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+def queue_drive_upload(application, user_id, mimetype=None):
+    """Programme la copie du CV de la candidature sur le Drive de l'utilisateur (sans commit)"""
+    upload = DriveUpload(
+        application_id=application.id,
+        user_id=user_id,
+        filename=application.cv_filename,
+        mimetype=mimetype,
+        status='queued'
+    )
+    db.session.add(upload)
+    return upload
+
+def claim_drive_uploads(limit=10):
+    """Réserve les uploads dont la tentative est due (sûr avec plusieurs workers)"""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    ids = db.session.execute(db.select(DriveUpload.id).where(
+        DriveUpload.status == 'queued', DriveUpload.next_attempt_at <= now
+    ).order_by(DriveUpload.next_attempt_at, DriveUpload.id).limit(limit)).scalars().all()
+    if not ids:
+        return []
+    
+    token = uuid.uuid4().hex
+    DriveUpload.query.filter(DriveUpload.id.in_(ids), DriveUpload.status == 'queued').update(
+        {'status': 'uploading', 'claim_token': token, 'claimed_at': now}, synchronize_session=False
+    )
+    db.session.commit()
+    return DriveUpload.query.filter_by(claim_token=token, status='uploading').order_by(DriveUpload.id).all()
+
+def drive_upload_request(service, upload, chunk_size):
+    """Requête d'upload résumable ; retourne (requête, fichier Drive si l'upload était déjà terminé)
+
+    Sans session enregistrée, une nouvelle session est ouverte dans MondeRH_CV. Sinon,
+    Drive indique les octets déjà reçus (PUT vide, Content-Range: bytes */taille) et
+    l'envoi reprend à partir de là.
+    """
+    path = os.path.join(app.config['UPLOAD_FOLDER'], upload.filename)
+    media = MediaFileUpload(path, mimetype=upload.mimetype or None, chunksize=chunk_size, resumable=True)
+    if not upload.upload_uri:
+        request = service.files().create(
+            body={'name': upload.filename, 'parents': [drive_cv_folder_id(service, upload.user_id)]},
+            media_body=media,
+            fields='id,webViewLink'
+        )
+        return request, None
+    
+    request = service.files().create(body={'name': upload.filename}, media_body=media, fields='id,webViewLink')
+    response, content = request.http.request(
+        upload.upload_uri, method='PUT', headers={'Content-Length': '0', 'Content-Range': f"bytes */{media.size()}"}
+    )
+    if response.status in (200, 201):
+        # Dernier bloc reçu avant l'interruption : le fichier existe déjà
+        return request, json.loads(content)
+    if response.status != 308:
+        raise HttpError(response, content, uri=upload.upload_uri)
+    # Range: bytes=0-N (absent si rien n'a été reçu)
+    received = response.get('range')
+    request.resumable_uri = upload.upload_uri
+    request.resumable_progress = int(received.rsplit('-', 1)[1]) + 1 if received else 0
+    return request, None
+
+def process_drive_upload(upload, chunk_size=None):
+    """Envoie ou reprend l'upload d'un CV ; retourne le fichier Drive créé (id, webViewLink)"""
+    service = google_service(upload.user_id, 'drive', 'v3')
+    if service is None:
+        raise LookupError(f"Google n'est pas autorisé pour l'utilisateur {upload.user_id}")
+    # Drive exige des blocs multiples de 256 Kio
+    chunk_size = max((chunk_size or app.config['DRIVE_UPLOAD_CHUNK_SIZE']) // (256 * 1024), 1) * 256 * 1024
+    
+    request = None
+    folder_refreshed = False
+    response = None
+    while response is None:
+        try:
+            if request is None:
+                request, response = drive_upload_request(service, upload, chunk_size)
+                if response is not None:
+                    break
+            # Erreurs temporaires (5xx, 429) retentées sur place, à partir du bloc en cours
+            progress, response = request.next_chunk(num_retries=3)
+        except HttpError as e:
+            if e.resp.status in (404, 410) and upload.upload_uri:
+                # Session expirée ou inconnue de Drive : nouvel upload depuis le début
+                logger.info(f"Upload Drive {upload.id} : session expirée, nouvel envoi complet")
+                upload.upload_uri = None
+                upload.uploaded_bytes = 0
+                db.session.commit()
+            elif e.resp.status == 404 and not folder_refreshed:
+                # Dossier MondeRH_CV supprimé ou autre compte Google autorisé depuis
+                folder_refreshed = True
+                drive_cv_folder_id(service, upload.user_id, refresh=True)
+            else:
+                raise
+            request = None
+            continue
+        
+        if progress is not None:
+            # Point de reprise enregistré après chaque bloc reçu par Drive
+            upload.upload_uri = request.resumable_uri
+            upload.uploaded_bytes = progress.resumable_progress
+            upload.claimed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+            db.session.commit()
+    return response
+
+def complete_drive_upload(upload, result=None, error=None, permanent=False):
+    """Enregistre le résultat d'un upload : lien sur la candidature, reprogrammé ou en lettre morte"""
+    upload.claim_token = None
+    upload.claimed_at = None
+    if error is None:
+        upload.status = 'done'
+        upload.file_id = result.get('id')
+        upload.upload_uri = None
+        upload.last_error = None
+        upload.finished_at = datetime.now(timezone.utc)
+        application = db.session.get(Application, upload.application_id) if upload.application_id else None
+        if application is not None:
+            application.google_drive_link = result.get('webViewLink')
+        db.session.commit()
+        return
+    upload.attempts += 1
+    upload.last_error = str(error)[:2000]
+    if permanent or upload.attempts >= app.config['DRIVE_UPLOAD_MAX_ATTEMPTS']:
+        upload.status = 'dead'
+        upload.finished_at = datetime.now(timezone.utc)
+        logger.error(f"Upload Drive {upload.id} abandonné après {upload.attempts} tentative(s): {error}")
+    else:
+        upload.status = 'queued'
+        upload.next_attempt_at = datetime.now(timezone.utc) + retry_delay(
+            upload.attempts, app.config['DRIVE_UPLOAD_RETRY_BASE'], app.config['DRIVE_UPLOAD_RETRY_MAX']
+        )
+    db.session.commit()
+
+def requeue_interrupted_drive_uploads():
+    """Remet en attente les uploads laissés 'uploading' par un worker arrêté (reprise au dernier bloc)
+
+    Seules les réservations sans bloc envoyé depuis DRIVE_UPLOAD_CLAIM_LEASE secondes sont
+    reprises : un upload en cours dans un autre worker n'est pas envoyé deux fois.
+    """
+    expired = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=app.config['DRIVE_UPLOAD_CLAIM_LEASE'])
+    count = DriveUpload.query.filter(
+        DriveUpload.status == 'uploading',
+        db.or_(DriveUpload.claimed_at.is_(None), DriveUpload.claimed_at < expired)
+    ).update({'status': 'queued', 'claim_token': None, 'claimed_at': None}, synchronize_session=False)
+    db.session.commit()
+    return count
+
 # Forms
 class LoginForm(FlaskForm):
     email = StringField('Email', validators=[DataRequired(), Email()])
@@ -524,6 +1642,10 @@ def nl2br(value):
         return cleaned.replace('\n', '<br>')
     return value
 
+# Surlignage des termes recherchés (voir search.py)
+app.add_template_filter(highlight, 'highlight')
+app.add_template_filter(snippet, 'search_snippet')
+
 # Données des services (inchangées)
 services = {
     'recrutement': {
@@ -706,7 +1828,7 @@ def apply():
     if form.validate_on_submit():
         # Handle file upload
         cv_filename = None
-        google_drive_link = None
+        cv_mimetype = None
         
         if form.cv_file.data:
             file = form.cv_file.data
@@ -716,27 +1838,13 @@ def apply():
                 # Sauvegarde locale (backup)
                 file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
                 cv_filename = filename
-                
-                # Upload vers Google Drive si l'utilisateur est administrateur et a autorisé Google
-                if current_user.is_authenticated and current_user.is_admin():
-                    file.seek(0)  # Reset file pointer
-                    file_content = file.read()
-                    drive_result = upload_to_google_drive(
-                        current_user.id, 
-                        file_content, 
-                        filename, 
-                        file.mimetype
-                    )
-                    if drive_result:
-                        google_drive_link = drive_result['web_link']
-                        flash('CV sauvegardé sur Google Drive !', 'info')
+                cv_mimetype = file.mimetype
         
         application = Application(
             user_id=current_user.id if current_user.is_authenticated else None,
             position=form.position.data,
             service_type=form.service_type.data,
             cv_filename=cv_filename,
-            google_drive_link=google_drive_link,
             cover_letter=form.cover_letter.data,
 
             experience_years=form.experience_years.data,
@@ -745,12 +1853,21 @@ def apply():
         )
         
         db.session.add(application)
-        db.session.commit()
+        db.session.flush()
         
-        # Send notification email
+        # Notification mise en file dans la même transaction (envoyée par worker.py emails)
         send_application_notification(application)
         
+        # Copie du CV sur Google Drive si l'administrateur a autorisé Google (worker.py drive)
+        drive_upload = None
+        if cv_filename and current_user.is_authenticated and current_user.is_admin() \
+                and GoogleToken.query.filter_by(user_id=current_user.id).first():
+            drive_upload = queue_drive_upload(application, current_user.id, cv_mimetype)
+        db.session.commit()
+        
         flash('Votre candidature a été soumise avec succès !', 'success')
+        if drive_upload is not None:
+            flash('Le CV sera copié sur Google Drive dans quelques instants.', 'info')
         if current_user.is_authenticated:
             if current_user.is_admin():
                 return redirect(url_for('admin_dashboard'))
@@ -795,10 +1912,11 @@ def appointments():
         )
         
         db.session.add(appointment)
-        db.session.commit()
+        db.session.flush()
         
-        # Send confirmation email
+        # Confirmation mise en file dans la même transaction (envoyée par worker.py emails)
         send_appointment_confirmation(appointment)
+        db.session.commit()
         
         if calendar_link:
             flash('Rendez-vous ajouté à votre Google Calendar !', 'info')
@@ -844,6 +1962,22 @@ def subscribe_newsletter():
     
     return redirect(request.referrer or url_for('index'))
 
+@app.route('/newsletter/unsubscribe/<token>', methods=['GET', 'POST'])
+def newsletter_unsubscribe(token):
+    """Désinscription depuis le lien d'une campagne (POST : désinscription en un clic, RFC 8058)"""
+    try:
+        subscriber_id = _unsubscribe_serializer().loads(token)
+    except BadSignature:
+        abort(404)
+    subscriber = db.session.get(Newsletter, subscriber_id)
+    if subscriber is not None and subscriber.is_active:
+        subscriber.is_active = False
+        db.session.commit()
+    if request.method == 'POST':
+        return '', 204
+    flash('Vous êtes désinscrit de notre newsletter.', 'info')
+    return redirect(url_for('index'))
+
 # API routes
 @app.route('/contact')
 def contact_page():
@@ -853,8 +1987,9 @@ def contact_page():
 @app.route('/api/contact', methods=['POST'])
 def contact():
     data = request.get_json()
-    # Send contact email
+    # Send contact email (mis en file, envoyé par worker.py emails)
     send_contact_email(data)
+    db.session.commit()
     return jsonify({'message': 'Message reçu avec succès! Nous vous recontacterons rapidement.'})
 
 
@@ -875,157 +2010,178 @@ def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Boîte d'envoi des emails (email_outbox)
+# Les send_* ci-dessous ne contactent pas le serveur SMTP : ils ajoutent l'email à la
+# session courante, validé (ou annulé) avec l'action qui l'a produit. worker.py emails
+# vide la file par lots sur une connexion SMTP conservée, avec nouvelles tentatives
+# espacées exponentiellement puis passage en lettre morte (status 'dead').
+def queue_email(msg):
+    """Ajoute un message Flask-Mail à la boîte d'envoi (sans commit)"""
+    entry = EmailOutbox(
+        subject=msg.subject,
+        sender=msg.sender if isinstance(msg.sender, str) else formataddr(msg.sender),
+        recipients=json.dumps(list(msg.recipients)),
+        body=msg.body,
+        html=msg.html,
+        headers=json.dumps(msg.extra_headers) if msg.extra_headers else None,
+        status='queued'
+    )
+    db.session.add(entry)
+    return entry
+
+def outbox_message(entry):
+    """Reconstruit le message Flask-Mail d'une entrée de la boîte d'envoi"""
+    return Message(
+        entry.subject,
+        sender=entry.sender,
+        recipients=json.loads(entry.recipients),
+        body=entry.body,
+        html=entry.html,
+        extra_headers=json.loads(entry.headers) if entry.headers else None
+    )
+
+def email_retry_delay(attempts):
+    """Délai avant la nouvelle tentative d'un email (voir retry_delay)"""
+    return retry_delay(attempts, app.config['EMAIL_RETRY_BASE'], app.config['EMAIL_RETRY_MAX'])
+
+def claim_email_batch(limit=None):
+    """Réserve les emails dont l'envoi est dû (sûr avec plusieurs workers)"""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    ids = db.session.execute(db.select(EmailOutbox.id).where(
+        EmailOutbox.status == 'queued', EmailOutbox.next_attempt_at <= now
+    ).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(limit or app.config['EMAIL_BATCH_SIZE'])).scalars().all()
+    if not ids:
+        return []
+    
+    token = uuid.uuid4().hex
+    EmailOutbox.query.filter(EmailOutbox.id.in_(ids), EmailOutbox.status == 'queued').update(
+        {'status': 'sending', 'claim_token': token, 'claimed_at': now}, synchronize_session=False
+    )
+    db.session.commit()
+    return EmailOutbox.query.filter_by(claim_token=token, status='sending').order_by(EmailOutbox.id).all()
+
+def complete_email(entry, error=None, permanent=False):
+    """Enregistre le résultat d'un envoi : envoyé, reprogrammé ou en lettre morte (sans commit)"""
+    entry.claim_token = None
+    entry.claimed_at = None
+    if error is None:
+        entry.status = 'sent'
+        entry.sent_at = datetime.now(timezone.utc)
+        entry.last_error = None
+        return
+    entry.attempts += 1
+    entry.last_error = str(error)[:2000]
+    if permanent or entry.attempts >= app.config['EMAIL_MAX_ATTEMPTS']:
+        entry.status = 'dead'
+        logger.error(f"Email {entry.id} en lettre morte après {entry.attempts} tentative(s): {error}")
+    else:
+        entry.status = 'queued'
+        entry.next_attempt_at = datetime.now(timezone.utc) + email_retry_delay(entry.attempts)
+
+def requeue_interrupted_emails():
+    """Remet en attente les emails laissés 'sending' par un worker arrêté brutalement
+
+    Seules les réservations plus anciennes que EMAIL_CLAIM_LEASE sont reprises : le lot
+    d'un autre worker encore actif n'est pas renvoyé.
+    """
+    expired = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=app.config['EMAIL_CLAIM_LEASE'])
+    count = EmailOutbox.query.filter(
+        EmailOutbox.status == 'sending',
+        db.or_(EmailOutbox.claimed_at.is_(None), EmailOutbox.claimed_at < expired)
+    ).update({'status': 'queued', 'claim_token': None, 'claimed_at': None}, synchronize_session=False)
+    db.session.commit()
+    return count
+
+def cleanup_email_outbox():
+    """Supprime les emails envoyés au-delà de la durée de rétention"""
+    limit = datetime.now(timezone.utc) - timedelta(days=app.config['EMAIL_OUTBOX_RETENTION_DAYS'])
+    count = EmailOutbox.query.filter(
+        EmailOutbox.status == 'sent', EmailOutbox.sent_at < limit.replace(tzinfo=None)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return count
+
+# Gabarits des emails (templates/emails/, voir email_templates.py) : compilés une fois
+# par processus, rendus en série par queue_templated_emails()
+email_templates = EmailTemplates(app.jinja_env)
+
+# Email envoyé au candidat pour chaque nouveau statut
+APPLICATION_STATUS_EMAILS = {
+    'accepted': 'application_accepted',
+    'rejected': 'application_rejected',
+    'reviewed': 'application_reviewed',
+}
+
+def email_message(rendered, recipients):
+    """Message Flask-Mail (texte et HTML) d'un email rendu"""
+    return Message(
+        rendered.subject,
+        sender=app.config['MAIL_USERNAME'],
+        recipients=recipients,
+        body=rendered.body,
+        html=rendered.html
+    )
+
+def queue_templated_emails(name, messages):
+    """Rend le gabarit emails/<name>.html pour chaque (destinataires, contexte) et met les emails en file"""
+    messages = list(messages)
+    rendered = email_templates.render_many(
+        name, (context for _, context in messages), site_url=app.config['SITE_URL']
+    )
+    for (recipients, _), email in zip(messages, rendered):
+        queue_email(email_message(email, recipients))
+    return len(messages)
+
 def send_application_notification(application):
     try:
-        msg = Message(
-            'Nouvelle candidature reçue - MondeRH',
-            sender=app.config['MAIL_USERNAME'],
-            recipients=[app.config['MAIL_USERNAME']]
-        )
-        msg.body = f"""
-        Nouvelle candidature reçue :
-        
-        Poste : {application.position}
-        Service : {application.service_type}
-        Candidat : {application.applicant.first_name} {application.applicant.last_name}
-        Email : {application.applicant.email}
-        
-        Consultez le dashboard pour plus de détails.
-        """
-        mail.send(msg)
+        queue_templated_emails('application_notification', [
+            ([app.config['MAIL_USERNAME']], {'application': application})
+        ])
     except Exception as e:
         print(f"Error sending email: {e}")
 
 def send_appointment_confirmation(appointment):
     try:
-        msg = Message(
-            'Confirmation de rendez-vous - MondeRH',
-            sender=app.config['MAIL_USERNAME'],
-            recipients=[appointment.user.email]
-        )
-        msg.body = f"""
-        Bonjour {appointment.user.first_name},
-        
-        Votre rendez-vous a été confirmé :
-        
-        Service : {appointment.service_type}
-        Date : {appointment.date.strftime('%d/%m/%Y')}
-        Heure : {appointment.time.strftime('%H:%M')}
-        Durée : {appointment.duration} minutes
-        Sujet : {appointment.subject}
-        
-        Nous vous contacterons pour confirmer les détails.
-        
-        Cordialement,
-        L'équipe MondeRH
-        """
-        mail.send(msg)
+        queue_templated_emails('appointment_confirmation', [
+            ([appointment.user.email], {'appointment': appointment})
+        ])
     except Exception as e:
         print(f"Error sending email: {e}")
 
 def send_contact_email(data):
     try:
-        msg = Message(
-            'Nouveau message de contact - MondeRH',
-            sender=app.config['MAIL_USERNAME'],
-            recipients=[app.config['MAIL_USERNAME']]
-        )
-        msg.body = f"""
-        Nouveau message de contact :
-        
-        Nom : {data.get('firstName', '')} {data.get('lastName', '')}
-        Email : {data.get('email', '')}
-        Entreprise : {data.get('company', '')}
-        Service : {data.get('service', '')}
-        Message : {data.get('message', '')}
-        """
-        mail.send(msg)
+        queue_templated_emails('contact_message', [
+            ([app.config['MAIL_USERNAME']], {'data': data})
+        ])
     except Exception as e:
         print(f"Error sending email: {e}")
 
-def send_application_accepted_email(application):
-    """Envoyer un email de notification d'acceptation de candidature"""
+def send_application_status_emails(applications, status):
+    """Notifie les candidats d'un changement de statut (un même gabarit rendu pour toute la série)"""
+    name = APPLICATION_STATUS_EMAILS.get(status)
+    if name is None:
+        return 0
     try:
-        msg = Message(
-            'Candidature acceptée - MondeRH',
-            sender=app.config['MAIL_USERNAME'],
-            recipients=[application.applicant.email]
-        )
-        msg.body = f"""
-        Bonjour {application.applicant.first_name},
-        
-        Nous avons le plaisir de vous informer que votre candidature pour le poste de "{application.position}" a été acceptée !
-        
-        Détails de votre candidature :
-        - Poste : {application.position}
-        - Service : {application.service_type}
-        - Expérience : {application.experience_years} ans
-        
-        Notre équipe vous contactera dans les plus brefs délais pour organiser la suite du processus.
-        
-        Félicitations !
-        
-        Cordialement,
-        L'équipe MondeRH
-        """
-        mail.send(msg)
+        return queue_templated_emails(name, (
+            ([application.applicant.email], {'application': application})
+            for application in applications
+            if application.applicant and application.applicant.email
+        ))
     except Exception as e:
-        print(f"Error sending acceptance email: {e}")
+        print(f"Error sending {status} emails: {e}")
+        return 0
+
+def send_application_accepted_email(application):
+    """Envoyer un email de notification d'acceptation de candidature"""
+    send_application_status_emails([application], 'accepted')
 
 def send_application_rejected_email(application):
     """Envoyer un email de notification de rejet de candidature"""
-    try:
-        msg = Message(
-            'Réponse à votre candidature - MondeRH',
-            sender=app.config['MAIL_USERNAME'],
-            recipients=[application.applicant.email]
-        )
-        msg.body = f"""
-        Bonjour {application.applicant.first_name},
-        
-        Nous vous remercions pour votre candidature pour le poste de "{application.position}".
-        
-        Après avoir étudié attentivement votre profil, nous regrettons de vous informer que nous ne pouvons pas retenir votre candidature pour ce poste.
-        
-        Nous vous encourageons à continuer à nous suivre pour d'autres opportunités qui pourraient correspondre à votre profil.
-        
-        Nous vous souhaitons le meilleur pour la suite de votre carrière.
-        
-        Cordialement,
-        L'équipe MondeRH
-        """
-        mail.send(msg)
-    except Exception as e:
-        print(f"Error sending rejection email: {e}")
+    send_application_status_emails([application], 'rejected')
 
 def send_application_reviewed_email(application):
     """Envoyer un email de notification de révision de candidature"""
-    try:
-        msg = Message(
-            'Candidature en cours d\'examen - MondeRH',
-            sender=app.config['MAIL_USERNAME'],
-            recipients=[application.applicant.email]
-        )
-        msg.body = f"""
-        Bonjour {application.applicant.first_name},
-        
-        Nous vous informons que votre candidature pour le poste de "{application.position}" est actuellement en cours d'examen par notre équipe.
-        
-        Détails de votre candidature :
-        - Poste : {application.position}
-        - Service : {application.service_type}
-        - Expérience : {application.experience_years} ans
-        
-        Nous vous tiendrons informé(e) dès qu'une décision sera prise.
-        
-        Merci pour votre patience.
-        
-        Cordialement,
-        L'équipe MondeRH
-        """
-        mail.send(msg)
-    except Exception as e:
-        print(f"Error sending review email: {e}")
+    send_application_status_emails([application], 'reviewed')
 
 # Error handlers
 @app.errorhandler(404)
@@ -1037,6 +2193,188 @@ def internal_error(error):
     db.session.rollback()
     return render_template('500.html'), 500
 
+# Statistiques du tableau de bord
+@dataclass
+class DashboardStats:
+    """Instantané des chiffres affichés sur le tableau de bord admin"""
+    total_users: int = 0
+    total_applications: int = 0
+    total_appointments: int = 0
+    total_newsletters: int = 0
+    applications_labels: list = field(default_factory=list)
+    applications_data: list = field(default_factory=list)
+    applications_by_service: dict = field(default_factory=dict)
+    applications_by_status: dict = field(default_factory=dict)
+    recent_applications: list = field(default_factory=list)
+    recent_appointments: list = field(default_factory=list)
+
+    @property
+    def services_labels(self):
+        return list(self.applications_by_service.keys())
+
+    @property
+    def services_values(self):
+        return list(self.applications_by_service.values())
+
+def compute_dashboard_stats(days=7, recent_limit=5):
+    """Calcule les statistiques du tableau de bord à partir de l'agrégat daily_stats"""
+    read_session = reporting_session()
+    totals = get_rollup_totals(read_session)
+    
+    # Évolution des candidatures : un point par jour (UTC)
+    today = datetime.now(timezone.utc).date()
+    timeline = get_time_series('day', today - timedelta(days=days - 1), today, sources=['applications'], read_session=read_session)
+    
+    return DashboardStats(
+        total_users=totals.users,
+        total_applications=totals.applications,
+        total_appointments=totals.appointments,
+        total_newsletters=totals.newsletters,
+        applications_labels=timeline.labels,
+        applications_data=timeline.series['applications'],
+        applications_by_service=totals.applications_by_service,
+        applications_by_status=totals.applications_by_status,
+        recent_applications=read_session.query(Application).options(*admin_query_options('applications')).order_by(
+            Application.created_at.desc()
+        ).limit(recent_limit).all(),
+        recent_appointments=read_session.query(Appointment).options(*admin_query_options('appointments')).order_by(
+            Appointment.created_at.desc()
+        ).limit(recent_limit).all()
+    )
+
+# Instantané des rapports
+# Mis en cache dans le processus pendant REPORT_SNAPSHOT_TTL secondes et invalidé
+# à chaque écriture validée sur les modèles concernés : une rafale d'exports dans
+# plusieurs formats ne coûte qu'une seule série de requêtes. L'invalidation a lieu
+# au commit (une écriture annulée ne l'invalide pas) et incrémente une génération :
+# un recalcul commencé avant elle n'est pas mis en cache.
+_report_snapshot_cache = {'snapshot': None, 'expires_at': 0.0, 'generation': 0}
+_report_snapshot_lock = threading.Lock()  # état du cache
+_report_snapshot_build_lock = threading.Lock()  # un seul recalcul à la fois
+REPORT_SNAPSHOT_STALE = 'report_snapshot_stale'  # clé de Session.info : écritures non validées
+
+def build_report_snapshot(recent_limit=10):
+    """Calcule les données communes à tous les exports"""
+    read_session = reporting_session()
+    totals = get_rollup_totals(read_session)
+    
+    recent_applications = read_session.query(
+        Application.id, User.first_name, User.last_name, Application.position,
+        Application.service_type, Application.status, Application.created_at
+    ).outerjoin(User, Application.user_id == User.id).order_by(
+        Application.created_at.desc()
+    ).limit(recent_limit).all()
+    
+    recent_appointments = read_session.query(
+        Appointment.id, User.first_name, User.last_name, Appointment.service_type,
+        Appointment.date, Appointment.time, Appointment.status
+    ).outerjoin(User, Appointment.user_id == User.id).order_by(
+        Appointment.created_at.desc()
+    ).limit(recent_limit).all()
+    
+    # Nombre de candidatures par offre via une sous-requête agrégée (pas de chargement des collections)
+    job_counts = read_session.query(
+        JobApplication.job_offer_id, db.func.count(JobApplication.id).label('applications')
+    ).group_by(JobApplication.job_offer_id).subquery()
+    job_offers = read_session.query(
+        JobOffer.id, JobOffer.title, JobOffer.company, JobOffer.location, JobOffer.contract_type,
+        JobOffer.is_active, db.func.coalesce(job_counts.c.applications, 0)
+    ).outerjoin(job_counts, job_counts.c.job_offer_id == JobOffer.id).order_by(JobOffer.id).all()
+    
+    # Évolution mensuelle sur les 12 derniers mois
+    today = datetime.now(timezone.utc).date()
+    first_month = bucket_start(today, 'month')
+    for _ in range(11):
+        first_month = bucket_start(first_month - timedelta(days=1), 'month')
+    timeline = get_time_series('month', first_month, today, read_session=read_session)
+    
+    return ReportSnapshot(
+        generated_at=datetime.now(timezone.utc),
+        total_users=totals.users,
+        total_applications=totals.applications,
+        total_appointments=totals.appointments,
+        total_newsletters=totals.newsletters,
+        total_job_offers=totals.job_offers,
+        active_job_offers=totals.active_job_offers,
+        applications_by_status=totals.applications_by_status,
+        job_offers_by_contract=totals.job_offers_by_contract,
+        recent_applications=[
+            (row[0], _full_name(row[1], row[2])) + tuple(row[3:]) for row in recent_applications
+        ],
+        recent_appointments=[
+            (row[0], _full_name(row[1], row[2])) + tuple(row[3:]) for row in recent_appointments
+        ],
+        job_offers=[tuple(row) for row in job_offers],
+        timeline=timeline
+    )
+
+def get_report_snapshot():
+    """Retourne l'instantané en cache, ou le recalcule s'il a expiré ou été invalidé"""
+    def cached():
+        snapshot = _report_snapshot_cache['snapshot']
+        if snapshot is not None and time.monotonic() < _report_snapshot_cache['expires_at']:
+            return snapshot
+        return None
+    
+    with _report_snapshot_lock:
+        snapshot = cached()
+    if snapshot is not None:
+        return snapshot
+    
+    with _report_snapshot_build_lock:
+        with _report_snapshot_lock:
+            # Recalculé par un autre thread pendant l'attente
+            snapshot = cached()
+            generation = _report_snapshot_cache['generation']
+        if snapshot is not None:
+            return snapshot
+        
+        snapshot = build_report_snapshot()
+        # Pas de mise en cache d'un état lu dans une transaction aux écritures non validées
+        if db.session.info.get(REPORT_SNAPSHOT_STALE):
+            return snapshot
+        with _report_snapshot_lock:
+            if _report_snapshot_cache['generation'] == generation:
+                _report_snapshot_cache['snapshot'] = snapshot
+                _report_snapshot_cache['expires_at'] = time.monotonic() + app.config['REPORT_SNAPSHOT_TTL']
+        return snapshot
+
+def invalidate_report_snapshot():
+    """Invalide l'instantané des rapports (appelé après chaque écriture validée)"""
+    with _report_snapshot_lock:
+        _report_snapshot_cache['generation'] += 1
+        _report_snapshot_cache['snapshot'] = None
+
+def _report_snapshot_mark_stale(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info[REPORT_SNAPSHOT_STALE] = True
+
+def _report_snapshot_after_commit(session):
+    if session.info.pop(REPORT_SNAPSHOT_STALE, False):
+        invalidate_report_snapshot()
+
+def _report_snapshot_after_rollback(session, previous_transaction):
+    # Écritures annulées : rien à invalider (sauf retour à un savepoint, la transaction continue)
+    if not session.in_transaction():
+        session.info.pop(REPORT_SNAPSHOT_STALE, None)
+
+for _model in list(ROLLUP_SOURCES) + [JobApplication]:
+    for _event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event_name, _report_snapshot_mark_stale)
+event.listen(Session, 'after_commit', _report_snapshot_after_commit)
+event.listen(Session, 'after_soft_rollback', _report_snapshot_after_rollback)
+
+# Pool de rendu des graphiques : pyplot n'est jamais importé dans les workers web,
+# les processus de rendu sont démarrés au premier export graphique.
+chart_renderer = ChartRenderer(
+    max_workers=app.config['CHART_RENDER_WORKERS'],
+    max_renders_per_worker=app.config['CHART_RENDERS_PER_WORKER'],
+    timeout=app.config['CHART_RENDER_TIMEOUT']
+)
+
+render_cache = RenderCache(app.config['RENDER_CACHE_FOLDER'], app.config['RENDER_CACHE_MAX_MB'] * 1024 * 1024)
+
 # Admin routes
 @app.route('/admin')
 @login_required
@@ -1044,448 +2382,202 @@ def internal_error(error):
 def admin_dashboard():
     logger.info(f"Accès au tableau de bord admin par {current_user.email}")
     
-    # Statistiques générales
-    total_users = User.query.count()
-    total_applications = Application.query.count()
-    total_appointments = Appointment.query.count()
-    total_newsletters = Newsletter.query.filter_by(is_active=True).count()
-    
-    # Données récentes
-    recent_applications = Application.query.order_by(Application.created_at.desc()).limit(5).all()
-    recent_appointments = Appointment.query.order_by(Appointment.created_at.desc()).limit(5).all()
-    
-    # Données pour le graphique des candidatures (7 derniers jours)
-    from datetime import datetime, timedelta
-    import json
-    
-    # Évolution des candidatures sur 7 jours
-    applications_data = []
-    applications_labels = []
-    for i in range(7):
-        date = datetime.now() - timedelta(days=6-i)
-        count = Application.query.filter(
-            Application.created_at >= date.replace(hour=0, minute=0, second=0, microsecond=0),
-            Application.created_at < date.replace(hour=23, minute=59, second=59, microsecond=999999)
-        ).count()
-        applications_data.append(count)
-        applications_labels.append(date.strftime('%d/%m'))
-    
-    # Répartition par service
-    services_data = {}
-    services = Application.query.with_entities(Application.service_type).all()
-    for service in services:
-        service_type = service.service_type
-        if service_type in services_data:
-            services_data[service_type] += 1
-        else:
-            services_data[service_type] = 1
-    
-    # Convertir en format pour Chart.js
-    services_labels = list(services_data.keys())
-    services_values = list(services_data.values())
-    
-    return render_template('admin/dashboard.html',
-                         total_users=total_users,
-                         total_applications=total_applications,
-                         total_appointments=total_appointments,
-                         total_newsletters=total_newsletters,
-                         recent_applications=recent_applications,
-                         recent_appointments=recent_appointments,
-                         applications_data=json.dumps(applications_data),
-                         applications_labels=json.dumps(applications_labels),
-                         services_labels=json.dumps(services_labels),
-                         services_values=json.dumps(services_values))
+    stats = compute_dashboard_stats()
+    return render_template('admin/dashboard.html', stats=stats)
+
+@app.route('/admin/debug/sql')
+@login_required
+@admin_required
+def admin_debug_sql():
+    """Panneau de diagnostic SQL : dernières requêtes HTTP instrumentées"""
+    history = list(app.extensions.get('sql_profiler', []))
+    return render_template('admin/sql_debug.html',
+                         enabled=app.config['SQL_PROFILING'],
+                         history=history,
+                         threshold=app.config['SQL_N_PLUS_ONE_THRESHOLD'],
+                         pool=POOL_METRICS.snapshot(db.engine.pool))
+
+@app.route('/admin/api/pool')
+@login_required
+@admin_required
+def admin_pool_metrics():
+    """Métriques du pool de connexions du processus (JSON)"""
+    replica = replica_router.status()
+    return jsonify(dict(
+        POOL_METRICS.snapshot(db.engine.pool), pid=os.getpid(),
+        replica={'configured': replica.configured, 'lag': replica.lag, 'method': replica.method,
+                 'in_use': replica_router.use_replica(), 'error': replica.error}
+    ))
+
+# Période par défaut (jours) et nombre maximal d'intervalles de l'API des séries temporelles
+TIME_SERIES_DEFAULT_DAYS = {'day': 30, 'week': 7 * 12, 'month': 365}
+TIME_SERIES_MAX_BUCKETS = 1000
+
+@app.route('/admin/api/timeseries')
+@login_required
+@admin_required
+def admin_time_series():
+    """Séries temporelles (JSON) pour les graphiques du tableau de bord"""
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in TIME_SERIES_GRANULARITIES:
+        return jsonify({'error': 'Granularité non supportée'}), 400
+    sources = [name for name in request.args.get('series', '').split(',') if name] or list(TIME_SERIES_SOURCES)
+    if any(name not in TIME_SERIES_SOURCES for name in sources):
+        return jsonify({'error': 'Série inconnue'}), 400
+
+    try:
+        last_day = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else datetime.now(timezone.utc).date()
+        first_day = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else last_day - timedelta(days=TIME_SERIES_DEFAULT_DAYS[granularity] - 1)
+    except ValueError:
+        return jsonify({'error': 'Date invalide (format attendu : AAAA-MM-JJ)'}), 400
+    if first_day > last_day or len(bucket_range(first_day, last_day, granularity)) > TIME_SERIES_MAX_BUCKETS:
+        return jsonify({'error': 'Période invalide ou trop longue pour cette granularité'}), 400
+
+    return jsonify(get_time_series(granularity, first_day, last_day, sources=sources, read_session=reporting_session()).to_dict())
 
 @app.route('/admin/export/<format>')
 @login_required
 @admin_required
 def admin_export(format):
     """Exporte les données du tableau de bord dans différents formats"""
-    if format == 'csv':
-        return export_csv()
-    elif format == 'excel':
-        return export_excel()
-    elif format == 'pdf':
-        return export_pdf()
-    elif format == 'png':
-        return export_png()
+    if format in ('csv', 'excel', 'pdf', 'png', 'svg'):
+        return report_response(format)
+    elif format == 'excel_full':
+        return export_excel_full()
     else:
         flash('Format d\'export non supporté', 'error')
         return redirect(url_for('admin_dashboard'))
 
-def export_csv():
-    """Exporte les données en CSV"""
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # En-têtes
-    writer.writerow(['Rapport MondeRH - ' + datetime.now(timezone.utc).strftime('%d/%m/%Y %H:%M')])
-    writer.writerow([])
-    
-    # Statistiques générales
-    writer.writerow(['STATISTIQUES GÉNÉRALES'])
-    writer.writerow(['Métrique', 'Valeur'])
-    writer.writerow(['Total Utilisateurs', User.query.count()])
-    writer.writerow(['Total Candidatures', Application.query.count()])
-    writer.writerow(['Total Rendez-vous', Appointment.query.count()])
-    writer.writerow(['Newsletters Actives', Newsletter.query.filter_by(is_active=True).count()])
-    writer.writerow(['Offres d\'emploi', JobOffer.query.count()])
-    writer.writerow(['Offres actives', JobOffer.query.filter_by(is_active=True).count()])
-    writer.writerow([])
-    
-    # Candidatures récentes
-    writer.writerow(['CANDIDATURES RÉCENTES'])
-    writer.writerow(['ID', 'Candidat', 'Poste', 'Service', 'Statut', 'Date'])
-    recent_applications = Application.query.order_by(Application.created_at.desc()).limit(10).all()
-    for app in recent_applications:
-        writer.writerow([
-            app.id,
-            f"{app.applicant.first_name} {app.applicant.last_name}",
-            app.position,
-            app.service_type,
-            app.status,
-            app.created_at.strftime('%d/%m/%Y %H:%M')
-        ])
-    writer.writerow([])
-    
-    # Rendez-vous récents
-    writer.writerow(['RENDEZ-VOUS RÉCENTS'])
-    writer.writerow(['ID', 'Client', 'Service', 'Date', 'Heure', 'Statut'])
-    recent_appointments = Appointment.query.order_by(Appointment.created_at.desc()).limit(10).all()
-    for apt in recent_appointments:
-        writer.writerow([
-            apt.id,
-            f"{apt.user.first_name} {apt.user.last_name}",
-            apt.service_type,
-            apt.date.strftime('%d/%m/%Y'),
-            apt.time.strftime('%H:%M'),
-            apt.status
-        ])
-    writer.writerow([])
-    
-    # Offres d'emploi
-    writer.writerow(['OFFRES D\'EMPLOI'])
-    writer.writerow(['ID', 'Titre', 'Entreprise', 'Localisation', 'Type', 'Statut', 'Candidatures'])
-    job_offers = JobOffer.query.all()
-    for job in job_offers:
-        writer.writerow([
-            job.id,
-            job.title,
-            job.company,
-            job.location,
-            job.contract_type,
-            'Active' if job.is_active else 'Inactive',
-            len(job.applications)
-        ])
+def report_response(format):
+    """Rend un rapport à partir de l'instantané partagé et le renvoie en pièce jointe
+
+    Le rendu est identifié par l'empreinte des données, du format et (graphiques) du préréglage :
+    cette clé sert d'ETag (304 si le client a déjà ce rendu) et de clé du cache disque.
+    """
+    snapshot = get_report_snapshot()
+    preset = request.args.get('preset', app.config['CHART_PRESET'])
+    if preset not in CHART_PRESETS:
+        preset = app.config['CHART_PRESET']
     
-    output.seek(0)
-    return Response(
-        output.getvalue(),
-        mimetype='text/csv',
-        headers={'Content-Disposition': f'attachment; filename=rapport_monderh_{datetime.now(timezone.utc).strftime("%Y%m%d_%H%M")}.csv'}
-    )
+    cache_key = report_cache_key(snapshot.fingerprint(), format, preset)
+    if cache_key in request.if_none_match:
+        response = Response(status=304)
+    else:
+        content = render_cache.get(cache_key)
+        if content is None:
+            content = render_report_bytes(format, snapshot, chart_renderer=chart_renderer, preset=preset)
+            render_cache.put(cache_key, content)
+        response = Response(
+            content,
+            mimetype=REPORT_FORMATS[format][1],
+            headers={'Content-Disposition': f'attachment; filename={report_filename(format, snapshot.generated_at)}'}
+        )
+    response.set_etag(cache_key)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
-def export_excel():
-    """Exporte les données en Excel"""
-    wb = Workbook()
-    
-    # Supprimer la feuille par défaut
-    wb.remove(wb.active)
-    
-    # Statistiques générales
-    ws_stats = wb.create_sheet("Statistiques")
-    ws_stats.title = "Statistiques"
-    
-    # Titre
-    ws_stats['A1'] = f"Rapport MondeRH - {datetime.now(timezone.utc).strftime('%d/%m/%Y %H:%M')}"
-    ws_stats['A1'].font = Font(size=16, bold=True)
-    ws_stats.merge_cells('A1:C1')
-    
-    # Statistiques
-    stats_data = [
-        ['Métrique', 'Valeur'],
-        ['Total Utilisateurs', User.query.count()],
-        ['Total Candidatures', Application.query.count()],
-        ['Total Rendez-vous', Appointment.query.count()],
-        ['Newsletters Actives', Newsletter.query.filter_by(is_active=True).count()],
-        ['Offres d\'emploi', JobOffer.query.count()],
-        ['Offres actives', JobOffer.query.filter_by(is_active=True).count()]
+def _full_name(first_name, last_name):
+    return f"{first_name} {last_name}" if first_name is not None else "Candidat externe"
+
+def export_excel_full():
+    """Exporte l'intégralité des candidatures, rendez-vous et offres en Excel (mémoire constante)"""
+    snapshot = get_report_snapshot()
+    read_session = reporting_session()
+    
+    applications = read_session.query(
+        Application.id, User.first_name, User.last_name, Application.position,
+        Application.service_type, Application.status, Application.created_at
+    ).outerjoin(User, Application.user_id == User.id).order_by(Application.created_at.desc(), Application.id.desc())
+    
+    appointments = read_session.query(
+        Appointment.id, User.first_name, User.last_name, Appointment.service_type,
+        Appointment.date, Appointment.time, Appointment.status
+    ).outerjoin(User, Appointment.user_id == User.id).order_by(Appointment.date.desc(), Appointment.id.desc())
+    
+    def rows(query, formatter):
+        for row in query.yield_per(EXPORT_BATCH_SIZE):
+            yield formatter((row[0], _full_name(row[1], row[2])) + tuple(row[3:]))
+    
+    sheets = [
+        ('Statistiques', ['Métrique', 'Valeur'], snapshot.stats_rows()),
+        ('Candidatures', APPLICATION_HEADERS, rows(applications, format_application_row)),
+        ('Rendez-vous', APPOINTMENT_HEADERS, rows(appointments, format_appointment_row)),
+        ("Offres d'emploi", JOB_HEADERS, snapshot.job_rows())
     ]
     
-    for row_idx, row_data in enumerate(stats_data, start=3):
-        for col_idx, value in enumerate(row_data, start=1):
-            cell = ws_stats.cell(row=row_idx, column=col_idx, value=value)
-            if row_idx == 3:  # En-têtes
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-    
-    # Candidatures
-    ws_apps = wb.create_sheet("Candidatures")
-    recent_applications = Application.query.order_by(Application.created_at.desc()).limit(10).all()
-    
-    headers = ['ID', 'Candidat', 'Poste', 'Service', 'Statut', 'Date']
-    for col_idx, header in enumerate(headers, start=1):
-        cell = ws_apps.cell(row=1, column=col_idx, value=header)
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-    
-    for row_idx, app in enumerate(recent_applications, start=2):
-        ws_apps.cell(row=row_idx, column=1, value=app.id)
-        ws_apps.cell(row=row_idx, column=2, value=f"{app.applicant.first_name} {app.applicant.last_name}")
-        ws_apps.cell(row=row_idx, column=3, value=app.position)
-        ws_apps.cell(row=row_idx, column=4, value=app.service_type)
-        ws_apps.cell(row=row_idx, column=5, value=app.status)
-        ws_apps.cell(row=row_idx, column=6, value=app.created_at.strftime('%d/%m/%Y %H:%M'))
-    
-    # Rendez-vous
-    ws_apts = wb.create_sheet("Rendez-vous")
-    recent_appointments = Appointment.query.order_by(Appointment.created_at.desc()).limit(10).all()
-    
-    headers = ['ID', 'Client', 'Service', 'Date', 'Heure', 'Statut']
-    for col_idx, header in enumerate(headers, start=1):
-        cell = ws_apts.cell(row=1, column=col_idx, value=header)
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-    
-    for row_idx, apt in enumerate(recent_appointments, start=2):
-        ws_apts.cell(row=row_idx, column=1, value=apt.id)
-        ws_apts.cell(row=row_idx, column=2, value=f"{apt.user.first_name} {apt.user.last_name}")
-        ws_apts.cell(row=row_idx, column=3, value=apt.service_type)
-        ws_apts.cell(row=row_idx, column=4, value=apt.date.strftime('%d/%m/%Y'))
-        ws_apts.cell(row=row_idx, column=5, value=apt.time.strftime('%H:%M'))
-        ws_apts.cell(row=row_idx, column=6, value=apt.status)
-    
-    # Offres d'emploi
-    ws_jobs = wb.create_sheet("Offres d'emploi")
-    job_offers = JobOffer.query.all()
-    
-    headers = ['ID', 'Titre', 'Entreprise', 'Localisation', 'Type', 'Statut', 'Candidatures']
-    for col_idx, header in enumerate(headers, start=1):
-        cell = ws_jobs.cell(row=1, column=col_idx, value=header)
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-    
-    for row_idx, job in enumerate(job_offers, start=2):
-        ws_jobs.cell(row=row_idx, column=1, value=job.id)
-        ws_jobs.cell(row=row_idx, column=2, value=job.title)
-        ws_jobs.cell(row=row_idx, column=3, value=job.company)
-        ws_jobs.cell(row=row_idx, column=4, value=job.location)
-        ws_jobs.cell(row=row_idx, column=5, value=job.contract_type)
-        ws_jobs.cell(row=row_idx, column=6, value='Active' if job.is_active else 'Inactive')
-        ws_jobs.cell(row=row_idx, column=7, value=len(job.applications))
-    
-    # Ajuster la largeur des colonnes
-    for ws in [ws_stats, ws_apps, ws_apts, ws_jobs]:
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Sauvegarder en mémoire
-    output = io.BytesIO()
-    wb.save(output)
+    # Le classeur est écrit sur disque dans un fichier temporaire anonyme, libéré après l'envoi
+    output = tempfile.TemporaryFile()
+    write_streaming_workbook(output, sheets)
     output.seek(0)
     
-    return Response(
-        output.getvalue(),
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        headers={'Content-Disposition': f'attachment; filename=rapport_monderh_{datetime.now(timezone.utc).strftime("%Y%m%d_%H%M")}.xlsx'}
+    return send_file(
+        output,
+        mimetype=EXCEL_MIMETYPE,
+        as_attachment=True,
+        download_name=f"export_complet_monderh_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M')}.xlsx"
     )
 
-def export_pdf():
-    """Exporte les données en PDF"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    
-    # Styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=1  # Center
-    )
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=12,
-        spaceBefore=20
-    )
-    
-    # Titre
-    title = Paragraph(f"Rapport MondeRH - {datetime.now(timezone.utc).strftime('%d/%m/%Y %H:%M')}", title_style)
-    elements.append(title)
-    elements.append(Spacer(1, 20))
-    
-    # Statistiques générales
-    elements.append(Paragraph("Statistiques Générales", heading_style))
-    
-    stats_data = [
-        ['Métrique', 'Valeur'],
-        ['Total Utilisateurs', str(User.query.count())],
-        ['Total Candidatures', str(Application.query.count())],
-        ['Total Rendez-vous', str(Appointment.query.count())],
-        ['Newsletters Actives', str(Newsletter.query.filter_by(is_active=True).count())],
-        ['Offres d\'emploi', str(JobOffer.query.count())],
-        ['Offres actives', str(JobOffer.query.filter_by(is_active=True).count())]
-    ]
-    
-    stats_table = Table(stats_data, colWidths=[200, 100])
-    stats_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    elements.append(stats_table)
-    elements.append(Spacer(1, 20))
-    
-    # Candidatures récentes
-    elements.append(Paragraph("Candidatures Récentes", heading_style))
-    
-    recent_applications = Application.query.order_by(Application.created_at.desc()).limit(10).all()
-    apps_data = [['ID', 'Candidat', 'Poste', 'Service', 'Statut', 'Date']]
-    for app in recent_applications:
-        apps_data.append([
-            str(app.id),
-            f"{app.applicant.first_name} {app.applicant.last_name}",
-            app.position,
-            app.service_type,
-            app.status,
-            app.created_at.strftime('%d/%m/%Y %H:%M')
-        ])
-    
-    apps_table = Table(apps_data, colWidths=[30, 80, 80, 60, 50, 60])
-    apps_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 8)
-    ]))
-    elements.append(apps_table)
-    elements.append(Spacer(1, 20))
-    
-    # Rendez-vous récents
-    elements.append(Paragraph("Rendez-vous Récents", heading_style))
-    
-    recent_appointments = Appointment.query.order_by(Appointment.created_at.desc()).limit(10).all()
-    apts_data = [['ID', 'Client', 'Service', 'Date', 'Heure', 'Statut']]
-    for apt in recent_appointments:
-        apts_data.append([
-            str(apt.id),
-            f"{apt.user.first_name} {apt.user.last_name}",
-            apt.service_type,
-            apt.date.strftime('%d/%m/%Y'),
-            apt.time.strftime('%H:%M'),
-            apt.status
-        ])
-    
-    apts_table = Table(apts_data, colWidths=[30, 80, 60, 60, 50, 50])
-    apts_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 8)
-    ]))
-    elements.append(apts_table)
-    
-    # Générer le PDF
-    doc.build(elements)
-    buffer.seek(0)
-    
-    return Response(
-        buffer.getvalue(),
-        mimetype='application/pdf',
-        headers={'Content-Disposition': f'attachment; filename=rapport_monderh_{datetime.now(timezone.utc).strftime("%Y%m%d_%H%M")}.pdf'}
-    )
+# Exports analytiques (Parquet / Feather) des tables complètes pour la BI
+ANALYTICS_DATASETS = {
+    'applications': AnalyticsDataset(
+        'applications',
+        db.select(
+            Application.id, Application.user_id, Application.position, Application.service_type,
+            Application.status, Application.experience_years, Application.salary_expectation,
+            Application.availability, Application.created_at
+        ).order_by(Application.id),
+        categorical=('service_type', 'status')
+    ),
+    'appointments': AnalyticsDataset(
+        'appointments',
+        db.select(
+            Appointment.id, Appointment.user_id, Appointment.service_type, Appointment.date,
+            Appointment.time, Appointment.duration, Appointment.status, Appointment.created_at
+        ).order_by(Appointment.id),
+        categorical=('service_type', 'status')
+    ),
+    'job_offers': AnalyticsDataset(
+        'job_offers',
+        db.select(
+            JobOffer.id, JobOffer.title, JobOffer.company, JobOffer.location, JobOffer.contract_type,
+            JobOffer.experience_level, JobOffer.department, JobOffer.is_active,
+            JobOffer.created_at, JobOffer.updated_at
+        ).order_by(JobOffer.id),
+        categorical=('contract_type', 'experience_level')
+    ),
+    'newsletter_subscribers': AnalyticsDataset(
+        'newsletter_subscribers',
+        db.select(
+            Newsletter.id, Newsletter.email, Newsletter.first_name, Newsletter.last_name,
+            Newsletter.company, Newsletter.interests, Newsletter.subscribed_at, Newsletter.is_active
+        ).order_by(Newsletter.id)
+    ),
+}
 
-def export_png():
-    """Exporte les données en PNG (graphiques)"""
-    # Créer une figure avec plusieurs sous-graphiques
-    fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 10))
-    fig.suptitle(f'Rapport MondeRH - {datetime.now(timezone.utc).strftime("%d/%m/%Y %H:%M")}', fontsize=16, fontweight='bold')
-    
-    # Graphique 1: Statistiques générales
-    stats_labels = ['Utilisateurs', 'Candidatures', 'Rendez-vous', 'Newsletters']
-    stats_values = [
-        User.query.count(),
-        Application.query.count(),
-        Appointment.query.count(),
-        Newsletter.query.filter_by(is_active=True).count()
-    ]
+def export_analytics_dataset(output, dataset_name, format):
+    """Écrit une table complète au format colonne ; retourne le nombre de lignes"""
+    with replica_router.engine().connect() as connection:
+        return write_dataset(output, connection, ANALYTICS_DATASETS[dataset_name], format)
+
+@app.route('/admin/export/analytics/<dataset>/<format>')
+@login_required
+@admin_required
+def admin_export_analytics(dataset, format):
+    """Exporte une table complète en Parquet ou Feather"""
+    if dataset not in ANALYTICS_DATASETS or format not in ANALYTICS_FORMATS:
+        flash('Export analytique non supporté', 'error')
+        return redirect(url_for('admin_dashboard'))
     
-    ax1.bar(stats_labels, stats_values, color=['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4'])
-    ax1.set_title('Statistiques Générales')
-    ax1.set_ylabel('Nombre')
-    ax1.tick_params(axis='x', rotation=45)
-    
-    # Graphique 2: Statut des candidatures
-    applications = Application.query.all()
-    status_counts = {}
-    for app in applications:
-        status_counts[app.status] = status_counts.get(app.status, 0) + 1
-    
-    if status_counts:
-        ax2.pie(status_counts.values(), labels=status_counts.keys(), autopct='%1.1f%%')
-        ax2.set_title('Statut des Candidatures')
-    
-    # Graphique 3: Offres d'emploi par type
-    job_offers = JobOffer.query.all()
-    contract_counts = {}
-    for job in job_offers:
-        contract_counts[job.contract_type] = contract_counts.get(job.contract_type, 0) + 1
-    
-    if contract_counts:
-        ax3.bar(contract_counts.keys(), contract_counts.values(), color=['#FFEAA7', '#DDA0DD', '#98D8C8'])
-        ax3.set_title('Offres par Type de Contrat')
-        ax3.set_ylabel('Nombre')
-        ax3.tick_params(axis='x', rotation=45)
-    
-    # Graphique 4: Évolution mensuelle (simulation)
-    months = ['Jan', 'Fév', 'Mar', 'Avr', 'Mai', 'Jun']
-    applications_monthly = [5, 8, 12, 15, 18, 22]  # Données simulées
-    
-    ax4.plot(months, applications_monthly, marker='o', linewidth=2, markersize=8)
-    ax4.set_title('Évolution des Candidatures')
-    ax4.set_ylabel('Nombre de candidatures')
-    ax4.grid(True, alpha=0.3)
-    
-    plt.tight_layout()
-    
-    # Sauvegarder en mémoire
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-    buffer.seek(0)
-    plt.close()
+    output = tempfile.TemporaryFile()
+    rows = export_analytics_dataset(output, dataset, format)
+    output.seek(0)
+    logger.info(f"Export analytique {dataset} ({format}) : {rows} lignes")
     
-    return Response(
-        buffer.getvalue(),
-        mimetype='image/png',
-        headers={'Content-Disposition': f'attachment; filename=rapport_monderh_{datetime.now(timezone.utc).strftime("%Y%m%d_%H%M")}.png'}
+    return send_file(
+        output,
+        mimetype=ANALYTICS_FORMATS[format][0],
+        as_attachment=True,
+        download_name=analytics_filename(dataset, format, datetime.now(timezone.utc))
     )
 
 @app.route('/admin/settings', methods=['GET', 'POST'])
@@ -1514,15 +2606,45 @@ def admin_settings():
 @login_required
 @admin_required
 def admin_users():
-    page = request.args.get('page', 1, type=int)
-    users = User.query.paginate(page=page, per_page=20, error_out=False)
-    return render_template('admin/users.html', users=users)
+    search = request.args.get('search', '').strip()
+    query = User.query
+    if search:
+        # Résultats de la recherche approximative, du plus proche au moins proche
+        user_ids = [user.id for user, _ in lookup_users(search, limit=SEARCH_MAX_RESULTS)]
+        if user_ids:
+            query = query.filter(User.id.in_(user_ids))
+            users = paginate_listing(query, ranked_sort_keys(User.id, user_ids))
+        else:
+            # Aucun résultat (ou requête trop courte) : page vide sans requête
+            users = KeysetPage(items=[], per_page=LISTING_PER_PAGE, total=0)
+    else:
+        users = paginate_listing(query, LISTING_SORT_KEYS['users'], rollup_total=get_rollup_totals().users)
+    return render_template('admin/users.html', users=users, search_term=search)
+
+@app.route('/admin/api/users/lookup')
+@login_required
+@admin_required
+def admin_user_lookup():
+    """Suggestions (JSON) pour la recherche d'utilisateurs au fil de la saisie"""
+    limit = min(request.args.get('limit', 10, type=int), LOOKUP_MAX_RESULTS)
+    return jsonify([
+        {
+            'id': user.id,
+            'name': f"{user.first_name} {user.last_name}",
+            'email': user.email,
+            'company': user.company,
+            'user_type': user.user_type,
+            'score': round(score, 3) if score is not None else None,
+            'url': url_for('admin_edit_user', user_id=user.id),
+        }
+        for user, score in lookup_users(request.args.get('q', ''), limit=max(limit, 1))
+    ])
 
 @app.route('/admin/users/<int:user_id>/edit', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def admin_edit_user(user_id):
-    user = User.query.get_or_404(user_id)
+    user = User.query.options(*admin_query_options('user_detail')).get_or_404(user_id)
     form = UserEditForm()
     
     if form.validate_on_submit():
@@ -1568,10 +2690,18 @@ def admin_delete_user(user_id):
         flash('Vous ne pouvez pas supprimer votre propre compte.', 'error')
         return redirect(url_for('admin_users'))
     
-    # Supprimer les données associées
-    Application.query.filter_by(user_id=user.id).delete()
-    Appointment.query.filter_by(user_id=user.id).delete()
+    # Supprimer les données associées (une par une pour mettre à jour daily_stats)
+    for application in Application.query.filter_by(user_id=user.id).all():
+        db.session.delete(application)
+    for appointment in Appointment.query.filter_by(user_id=user.id).all():
+        db.session.delete(appointment)
     GoogleToken.query.filter_by(user_id=user.id).delete()
+    google_clients.invalidate(user.id)
+    # Exports demandés par l'utilisateur : supprimés avec leurs fichiers (la contrainte
+    # ON DELETE CASCADE n'existe pas sur les tables créées avant elle, ni sous SQLite)
+    for job in ExportJob.query.filter_by(user_id=user.id).all():
+        delete_export_job(job)
+    NewsletterCampaign.query.filter_by(created_by=user.id).update({'created_by': None}, synchronize_session=False)
     
     # Supprimer l'utilisateur
     db.session.delete(user)
@@ -1580,28 +2710,56 @@ def admin_delete_user(user_id):
     flash('Utilisateur supprimé avec succès !', 'success')
     return redirect(url_for('admin_users'))
 
-@app.route('/admin/applications')
-@login_required
-@admin_required
-def admin_applications():
-    page = request.args.get('page', 1, type=int)
-    status_filter = request.args.get('status', '')
-    service_filter = request.args.get('service', '')
-    search_term = request.args.get('search', '')
-    
-    # Construire la requête de base
-    query = Application.query
-    
-    # Appliquer les filtres
-    if status_filter:
-        query = query.filter(Application.status == status_filter)
-    
-    if service_filter:
-        query = query.filter(Application.service_type == service_filter)
-    
-    # Appliquer la recherche
-    if search_term:
-        search_filter = f"%{search_term}%"
+def get_application_filters(args):
+    """Lit les filtres de la liste des candidatures (statut, service, recherche, période)"""
+    def parse_day(value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d') if value else None
+        except ValueError:
+            return None
+    
+    return {
+        'status': args.get('status', ''),
+        'service': args.get('service', ''),
+        'search': args.get('search', ''),
+        'date_from': parse_day(args.get('date_from', '')),
+        'date_to': parse_day(args.get('date_to', ''))
+    }
+
+def applications_rollup_total(filters):
+    """Total exact lu dans daily_stats quand les filtres le permettent (statut ou service seul), sinon None"""
+    if filters['search'] or filters['date_from'] or filters['date_to'] or (filters['status'] and filters['service']):
+        return None
+    totals = get_rollup_totals()
+    if filters['status']:
+        return totals.applications_by_status.get(filters['status'], 0)
+    if filters['service']:
+        return totals.applications_by_service.get(filters['service'], 0)
+    return totals.applications
+
+def filter_applications_query(query, status='', service='', search='', date_from=None, date_to=None, search_ids=None):
+    """Applique les filtres de candidatures
+
+    search_ids est le résultat de search_application_ids(search) ; s'il vaut None
+    (pas d'index), la recherche se fait par LIKE et User doit être joint.
+    """
+    if status:
+        query = query.filter(Application.status == status)
+    
+    if service:
+        query = query.filter(Application.service_type == service)
+    
+    if date_from:
+        query = query.filter(Application.created_at >= date_from)
+    
+    if date_to:
+        # Date de fin incluse
+        query = query.filter(Application.created_at < date_to + timedelta(days=1))
+    
+    if search and search_ids is not None:
+        query = query.filter(Application.id.in_(search_ids))
+    elif search:
+        search_filter = f"%{search}%"
         query = query.filter(
             db.or_(
                 Application.position.ilike(search_filter),
@@ -1610,16 +2768,40 @@ def admin_applications():
                 User.last_name.ilike(search_filter),
                 User.email.ilike(search_filter)
             )
-        ).join(User, Application.user_id == User.id)
+        )
     
-    # Trier par date de création (plus récent en premier)
-    applications = query.order_by(Application.created_at.desc()).paginate(page=page, per_page=20, error_out=False)
+    return query
+
+@app.route('/admin/applications')
+@login_required
+@admin_required
+def admin_applications():
+    filters = get_application_filters(request.args)
+    
+    # Construire la requête de base
+    query = Application.query.options(*admin_query_options('applications'))
+    search_ids = search_application_ids(filters['search']) if filters['search'] else None
+    if filters['search'] and search_ids is None:
+        query = query.join(User, Application.user_id == User.id)
+    
+    # Appliquer les filtres et la recherche
+    query = filter_applications_query(query, search_ids=search_ids, **filters)
+    
+    if search_ids:
+        # Résultats de recherche : par pertinence
+        applications = paginate_listing(query, ranked_sort_keys(Application.id, search_ids))
+    else:
+        # Par date de création (plus récent en premier)
+        applications = paginate_listing(query, LISTING_SORT_KEYS['applications'], rollup_total=applications_rollup_total(filters))
     
     return render_template('admin/applications.html', 
                          applications=applications,
-                         status_filter=status_filter,
-                         service_filter=service_filter,
-                         search_term=search_term)
+                         search_terms=query_terms(filters['search']),
+                         status_filter=filters['status'],
+                         service_filter=filters['service'],
+                         search_term=filters['search'],
+                         date_from=request.args.get('date_from', ''),
+                         date_to=request.args.get('date_to', ''))
 
 @app.route('/admin/applications/<int:application_id>')
 @login_required
@@ -1644,19 +2826,10 @@ def admin_update_application_status(application_id):
         if notes:
             application.notes = notes
         
-        db.session.commit()
+        # Notifier le candidat : l'email est mis en file avec le changement de statut
+        send_application_status_emails([application], status)
         
-        # Envoyer un email de notification au candidat
-        if application.applicant and application.applicant.email:
-            try:
-                if status == 'accepted':
-                    send_application_accepted_email(application)
-                elif status == 'rejected':
-                    send_application_rejected_email(application)
-                elif status == 'reviewed':
-                    send_application_reviewed_email(application)
-            except Exception as e:
-                print(f"Erreur lors de l'envoi de l'email: {e}")
+        db.session.commit()
         
         flash(f'Statut de la candidature mis à jour avec succès !', 'success')
     else:
@@ -1712,47 +2885,61 @@ def admin_delete_application(application_id):
 @login_required
 @admin_required
 def admin_export_applications():
-    """Exporter les candidatures en CSV"""
-    applications = Application.query.order_by(Application.created_at.desc()).all()
-    
-    # Créer le contenu CSV
-    csv_data = []
-    csv_data.append(['ID', 'Candidat', 'Email', 'Poste', 'Service', 'Expérience', 'Salaire', 'Disponibilité', 'Statut', 'Date'])
-    
-    for app in applications:
-        candidate_name = f"{app.applicant.first_name} {app.applicant.last_name}" if app.applicant else "Candidat externe"
-        candidate_email = app.applicant.email if app.applicant else "N/A"
+    """Exporter les candidatures en CSV (flux continu, mémoire constante)"""
+    filters = get_application_filters(request.args)
+    
+    # Une seule requête avec jointure sur User, lue par lots (sur le réplica s'il est à jour)
+    query = reporting_session().query(
+        Application.id, User.first_name, User.last_name, User.email, Application.position,
+        Application.service_type, Application.experience_years, Application.salary_expectation,
+        Application.availability, Application.status, Application.created_at
+    ).outerjoin(User, Application.user_id == User.id)
+    search_ids = search_application_ids(filters['search']) if filters['search'] else None
+    query = filter_applications_query(query, search_ids=search_ids, **filters).order_by(Application.created_at.desc(), Application.id.desc())
+    
+    def generate():
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['ID', 'Candidat', 'Email', 'Poste', 'Service', 'Expérience', 'Salaire', 'Disponibilité', 'Statut', 'Date'])
+        
+        for (app_id, first_name, last_name, email, position, service_type, experience_years,
+             salary_expectation, availability, status, created_at) in query.yield_per(EXPORT_BATCH_SIZE):
+            has_applicant = first_name is not None
+            writer.writerow([
+                app_id,
+                f"{first_name} {last_name}" if has_applicant else "Candidat externe",
+                email if has_applicant else "N/A",
+                position,
+                service_type,
+                experience_years,
+                salary_expectation,
+                availability,
+                status,
+                created_at.strftime('%d/%m/%Y') if created_at else ''
+            ])
+            
+            # Envoyer le contenu par blocs pour garder une mémoire constante
+            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
         
-        csv_data.append([
-            app.id,
-            candidate_name,
-            candidate_email,
-            app.position,
-            app.service_type,
-            app.experience_years,
-            app.salary_expectation,
-            app.availability,
-            app.status,
-            app.created_at.strftime('%d/%m/%Y')
-        ])
+        yield buffer.getvalue()
     
-    # Créer la réponse CSV
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerows(csv_data)
-    
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv'
-    response.headers['Content-Disposition'] = 'attachment; filename=candidatures.csv'
-    
-    return response
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=candidatures.csv'}
+    )
 
 @app.route('/admin/appointments')
 @login_required
 @admin_required
 def admin_appointments():
-    page = request.args.get('page', 1, type=int)
-    appointments = Appointment.query.order_by(Appointment.date.desc()).paginate(page=page, per_page=20, error_out=False)
+    appointments = paginate_listing(
+        Appointment.query.options(*admin_query_options('appointments')),
+        LISTING_SORT_KEYS['appointments'], rollup_total=get_rollup_totals().appointments
+    )
     return render_template('admin/appointments.html', appointments=appointments)
 
 @app.route('/admin/appointments/<int:appointment_id>/view')
@@ -1822,8 +3009,10 @@ def admin_delete_appointment(appointment_id):
 @login_required
 @admin_required
 def admin_jobs():
-    page = request.args.get('page', 1, type=int)
-    jobs = JobOffer.query.order_by(JobOffer.created_at.desc()).paginate(page=page, per_page=20, error_out=False)
+    jobs = paginate_listing(
+        JobOffer.query.options(*admin_query_options('jobs')),
+        LISTING_SORT_KEYS['jobs'], rollup_total=get_rollup_totals().job_offers
+    )
     return render_template('admin/jobs.html', jobs=jobs)
 
 @app.route('/admin/jobs/new', methods=['GET', 'POST'])
@@ -2104,6 +3293,7 @@ def google_disconnect():
     if token:
         db.session.delete(token)
         db.session.commit()
+        google_clients.invalidate(current_user.id)
         flash('Déconnexion Google réussie !', 'success')
     else:
         flash('Aucune connexion Google active.', 'info')
@@ -2151,6 +3341,7 @@ def google_status():
             # Token expiré, le supprimer
             db.session.delete(token)
             db.session.commit()
+            google_clients.invalidate(current_user.id)
             return jsonify({
                 'connected': False,
                 'message': 'Token expiré'
@@ -2214,73 +3405,7 @@ def google_gmail_redirect():
 def export_dashboard_pdf():
     """Exporter le dashboard en PDF"""
     try:
-        # Récupérer les données du dashboard
-        total_applications = Application.query.count()
-        total_appointments = Appointment.query.count()
-        total_users = User.query.count()
-        
-        # Calculer le taux d'acceptation
-        accepted_applications = Application.query.filter_by(status='accepted').count()
-        acceptance_rate = (accepted_applications / total_applications * 100) if total_applications > 0 else 0
-        
-        # Créer le PDF
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        elements = []
-        
-        # Styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30,
-            alignment=1  # Center
-        )
-        
-        # Titre
-        elements.append(Paragraph("Tableau de Bord - MondeRH", title_style))
-        elements.append(Spacer(1, 20))
-        
-        # Date de génération
-        elements.append(Paragraph(f"Généré le : {datetime.now().strftime('%d/%m/%Y à %H:%M')}", styles['Normal']))
-        elements.append(Spacer(1, 30))
-        
-        # Statistiques
-        stats_data = [
-            ['Métrique', 'Valeur'],
-            ['Total Candidatures', str(total_applications)],
-            ['Total Rendez-vous', str(total_appointments)],
-            ['Total Utilisateurs', str(total_users)],
-            ['Taux d\'acceptation', f"{acceptance_rate:.1f}%"]
-        ]
-        
-        stats_table = Table(stats_data)
-        stats_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 14),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(stats_table)
-        elements.append(Spacer(1, 30))
-        
-        # Construire le PDF
-        doc.build(elements)
-        buffer.seek(0)
-        
-        # Retourner le PDF
-        response = make_response(buffer.getvalue())
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'attachment; filename=dashboard_monderh_{datetime.now().strftime("%Y%m%d_%H%M")}.pdf'
-        
-        return response
-        
+        return report_response('dashboard_pdf')
     except Exception as e:
         flash(f'Erreur lors de l\'export PDF : {str(e)}', 'error')
         return redirect(url_for('admin_dashboard'))
@@ -2291,94 +3416,164 @@ def export_dashboard_pdf():
 def export_dashboard_png():
     """Exporter le dashboard en PNG"""
     try:
-        # Récupérer les données du dashboard
-        total_applications = Application.query.count()
-        total_appointments = Appointment.query.count()
-        total_users = User.query.count()
-        
-        # Calculer le taux d'acceptation
-        accepted_applications = Application.query.filter_by(status='accepted').count()
-        acceptance_rate = (accepted_applications / total_applications * 100) if total_applications > 0 else 0
-        
-        # Créer le graphique
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(12, 8))
-        fig.suptitle('Tableau de Bord - MondeRH', fontsize=16, fontweight='bold')
-        
-        # Graphique 1: Répartition des candidatures
-        labels = ['En attente', 'Acceptées', 'Refusées']
-        sizes = [
-            Application.query.filter_by(status='pending').count(),
-            accepted_applications,
-            Application.query.filter_by(status='rejected').count()
-        ]
-        colors_pie = ['#ffc107', '#28a745', '#dc3545']
-        ax1.pie(sizes, labels=labels, colors=colors_pie, autopct='%1.1f%%', startangle=90)
-        ax1.set_title('Répartition des Candidatures')
-        
-        # Graphique 2: Statistiques générales
-        categories = ['Candidatures', 'Rendez-vous', 'Utilisateurs']
-        values = [total_applications, total_appointments, total_users]
-        colors_bar = ['#667eea', '#28a745', '#ffc107']
-        bars = ax2.bar(categories, values, color=colors_bar)
-        ax2.set_title('Statistiques Générales')
-        ax2.set_ylabel('Nombre')
-        
-        # Ajouter les valeurs sur les barres
-        for bar, value in zip(bars, values):
-            height = bar.get_height()
-            ax2.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                    f'{value}', ha='center', va='bottom')
-        
-        # Graphique 3: Taux d'acceptation
-        ax3.pie([acceptance_rate, 100-acceptance_rate], 
-                labels=[f'Acceptées ({acceptance_rate:.1f}%)', f'Autres ({100-acceptance_rate:.1f}%)'],
-                colors=['#28a745', '#f8f9fa'], autopct='%1.1f%%')
-        ax3.set_title('Taux d\'Acceptation')
-        
-        # Graphique 4: Informations textuelles
-        ax4.axis('off')
-        info_text = f"""
-        RAPPORT DASHBOARD
-        
-        Date: {datetime.now().strftime('%d/%m/%Y')}
-        Heure: {datetime.now().strftime('%H:%M')}
-        
-        STATISTIQUES:
-        • Candidatures: {total_applications}
-        • Rendez-vous: {total_appointments}
-        • Utilisateurs: {total_users}
-        • Taux d'acceptation: {acceptance_rate:.1f}%
-        
-        Généré automatiquement par MondeRH
-        """
-        ax4.text(0.1, 0.9, info_text, transform=ax4.transAxes, fontsize=10,
-                verticalalignment='top', fontfamily='monospace')
-        
-        plt.tight_layout()
-        
-        # Sauvegarder en PNG
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-        buffer.seek(0)
-        plt.close()
-        
-        # Retourner le PNG
-        response = make_response(buffer.getvalue())
-        response.headers['Content-Type'] = 'image/png'
-        response.headers['Content-Disposition'] = f'attachment; filename=dashboard_monderh_{datetime.now().strftime("%Y%m%d_%H%M")}.png'
-        
-        return response
-        
+        return report_response('dashboard_png')
     except Exception as e:
         flash(f'Erreur lors de l\'export PNG : {str(e)}', 'error')
         return redirect(url_for('admin_dashboard'))
 
+@app.route('/admin/dashboard/export/svg')
+@login_required
+@admin_required
+def export_dashboard_svg():
+    """Exporter le dashboard en SVG"""
+    try:
+        return report_response('dashboard_svg')
+    except Exception as e:
+        flash(f'Erreur lors de l\'export SVG : {str(e)}', 'error')
+        return redirect(url_for('admin_dashboard'))
+
+# File d'exports en arrière-plan
+# Les routes créent un ExportJob ; worker.py le prend en charge, construit l'instantané
+# et délègue le rendu à un pool de processus qui écrit le fichier dans EXPORT_FOLDER.
+BACKGROUND_EXPORT_FORMATS = ('csv', 'excel', 'pdf', 'png', 'svg', 'dashboard_pdf', 'dashboard_png', 'dashboard_svg')
+
+def export_params_hash(format, **params):
+    """Empreinte d'une demande d'export, utilisée pour dédupliquer les demandes identiques"""
+    payload = json.dumps({'format': format, 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def request_export_job(user_id, format, **params):
+    """Crée un job d'export, ou réutilise un job identique encore en attente ou en cours"""
+    params_hash = export_params_hash(format, **params)
+    job = ExportJob.query.filter(
+        ExportJob.params_hash == params_hash,
+        ExportJob.status.in_(['queued', 'running'])
+    ).order_by(ExportJob.id).first()
+    if job:
+        return job
+    
+    job = ExportJob(user_id=user_id, format=format, params_hash=params_hash, status='queued')
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def claim_next_export_job():
+    """Réserve le plus ancien job en attente (sûr avec plusieurs workers)"""
+    while True:
+        job = ExportJob.query.filter_by(status='queued').order_by(ExportJob.id).first()
+        if not job:
+            return None
+        
+        claimed = ExportJob.query.filter_by(id=job.id, status='queued').update(
+            {'status': 'running', 'started_at': datetime.now(timezone.utc)},
+            synchronize_session=False
+        )
+        db.session.commit()
+        if claimed:
+            db.session.refresh(job)
+            return job
+
+def complete_export_job(job_id, error=None):
+    """Marque un job comme terminé ou en échec ; False si le job a été supprimé entre-temps"""
+    job = db.session.get(ExportJob, job_id)
+    if not job:
+        return False
+    job.status = 'failed' if error else 'done'
+    job.error = str(error) if error else None
+    job.finished_at = datetime.now(timezone.utc)
+    db.session.commit()
+    return True
+
+def requeue_interrupted_export_jobs():
+    """Remet en attente les jobs laissés 'running' par un worker arrêté brutalement
+
+    Seuls les jobs démarrés depuis plus de EXPORT_JOB_TIMEOUT secondes sont repris : ceux
+    d'un autre worker encore actif ne sont ni rendus deux fois ni écrasés.
+    """
+    expired = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=app.config['EXPORT_JOB_TIMEOUT'])
+    count = ExportJob.query.filter(
+        ExportJob.status == 'running',
+        db.or_(ExportJob.started_at.is_(None), ExportJob.started_at < expired)
+    ).update({'status': 'queued', 'started_at': None}, synchronize_session=False)
+    db.session.commit()
+    return count
+
+def cleanup_export_jobs():
+    """Supprime les jobs terminés et leurs fichiers au-delà de la durée de rétention"""
+    limit = datetime.now(timezone.utc) - timedelta(hours=app.config['EXPORT_RETENTION_HOURS'])
+    expired = ExportJob.query.filter(
+        ExportJob.status.in_(['done', 'failed']),
+        ExportJob.finished_at < limit.replace(tzinfo=None)
+    ).all()
+    for job in expired:
+        delete_export_job(job)
+    db.session.commit()
+    return len(expired)
+
+def delete_export_job(job):
+    """Supprime un job d'export et son fichier (sans commit)"""
+    if job.file_path and os.path.exists(job.file_path):
+        try:
+            os.remove(job.file_path)
+        except OSError as e:
+            logger.warning(f"Impossible de supprimer l'export {job.file_path}: {e}")
+    db.session.delete(job)
+
+@app.route('/admin/exports', methods=['POST'])
+@login_required
+@admin_required
+def admin_request_export():
+    """Demande un export en arrière-plan"""
+    data = request.get_json(silent=True) or request.form
+    format = data.get('format', '')
+    if format not in BACKGROUND_EXPORT_FORMATS:
+        return jsonify({'error': 'Format d\'export non supporté'}), 400
+    
+    job = request_export_job(current_user.id, format)
+    return jsonify(job.to_dict()), 202
+
+@app.route('/admin/exports/<int:job_id>')
+@login_required
+@admin_required
+def admin_export_status(job_id):
+    """Statut d'un export en arrière-plan (interrogé par le tableau de bord)"""
+    job = ExportJob.query.get_or_404(job_id)
+    return jsonify(job.to_dict())
+
+@app.route('/admin/exports/<int:job_id>/download')
+@login_required
+@admin_required
+def admin_download_export(job_id):
+    """Télécharge le fichier produit par un export terminé"""
+    job = ExportJob.query.get_or_404(job_id)
+    if job.status != 'done' or not job.file_path or not os.path.exists(job.file_path):
+        abort(404)
+    return send_file(
+        job.file_path,
+        mimetype=REPORT_FORMATS[job.format][1],
+        as_attachment=True,
+        download_name=job.filename
+    )
+
 # Create database tables
 with app.app_context():
     try:
         db.create_all()
     except Exception as e:
         print(f"Note: Certaines tables existent déjà - {e}")
+    try:
+        setup_search_index()
+    except Exception as e:
+        logger.warning(f"Index de recherche indisponible, recherche par LIKE : {e}")
+    try:
+        setup_user_lookup()
+    except Exception as e:
+        logger.warning(f"Index de recherche des utilisateurs indisponible, recherche par LIKE : {e}")
+    # Gabarits d'emails compilés au démarrage plutôt qu'au premier envoi
+    try:
+        email_templates.preload()
+    except Exception as e:
+        logger.warning(f"Gabarits d'emails non précompilés : {e}")
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
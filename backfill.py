@@ -0,0 +1,180 @@
+# Remplissage progressif (backfill) MonDRH
+# Peuple une colonne dérivée ou un index annexe sur des millions de lignes sans
+# verrouiller la table : les lignes sont traitées par lots d'identifiants
+# consécutifs, chaque lot dans sa propre transaction avec son point de reprise
+# (table backfill_progress), et une pause proportionnelle à la durée du lot laisse
+# la base servir le trafic. Un arrêt (Ctrl+C, redéploiement) reprend au lot suivant.
+# Ce module ne dépend pas de app.py.
+
+import math
+import time
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select, text
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 1000
+BACKFILL_PAUSE = 0.05  # secondes, pause minimale entre deux lots
+BACKFILL_THROTTLE = 0.5  # pause supplémentaire, en proportion de la durée du lot
+
+@dataclass(frozen=True)
+class Backfill:
+    """Traitement par lots : apply(connection, ids) traite les lignes d'identifiants ids (triés)
+
+    where restreint éventuellement aux lignes restant à traiter (ex. colonne IS NULL).
+    """
+    name: str
+    table: object
+    apply: object
+    where: object = None
+    description: str = ''
+
+    @property
+    def id_column(self):
+        return self.table.c.id
+
+    def pending_ids(self, after_id, limit):
+        statement = select(self.id_column).where(self.id_column > after_id)
+        if self.where is not None:
+            statement = statement.where(self.where)
+        return statement.order_by(self.id_column).limit(limit)
+
+    def pending_count(self, after_id):
+        statement = select(func.count()).select_from(self.table).where(self.id_column > after_id)
+        if self.where is not None:
+            statement = statement.where(self.where)
+        return statement
+
+@dataclass
+class BackfillProgress:
+    """Point de reprise d'un backfill"""
+    name: str
+    last_id: int = 0
+    rows_done: int = 0
+    batches: int = 0
+    started_at: datetime = None
+    updated_at: datetime = None
+    finished_at: datetime = None
+
+@dataclass
+class BackfillEstimate:
+    """Estimation du travail restant (mode dry-run)"""
+    remaining_rows: int
+    batches: int
+    seconds_per_batch: float = None
+    seconds_per_pause: float = 0.0
+
+    @property
+    def eta_seconds(self):
+        if self.seconds_per_batch is None:
+            return None
+        return self.batches * (self.seconds_per_batch + self.seconds_per_pause)
+
+class BackfillRunner:
+    """Exécute un backfill lot par lot en enregistrant sa progression"""
+
+    def __init__(self, engine, backfill, batch_size=BACKFILL_BATCH_SIZE, pause=BACKFILL_PAUSE, throttle=BACKFILL_THROTTLE):
+        self.engine = engine
+        self.backfill = backfill
+        self.batch_size = batch_size
+        self.pause = pause
+        self.throttle = throttle
+
+    def ensure_table(self):
+        with self.engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE IF NOT EXISTS backfill_progress ("
+                "name VARCHAR(100) PRIMARY KEY, last_id BIGINT NOT NULL DEFAULT 0, "
+                "rows_done BIGINT NOT NULL DEFAULT 0, batches INTEGER NOT NULL DEFAULT 0, "
+                "started_at TIMESTAMP, updated_at TIMESTAMP, finished_at TIMESTAMP)"
+            ))
+
+    def progress(self, connection=None):
+        """Point de reprise enregistré (à zéro si le backfill n'a jamais tourné)"""
+        if connection is None:
+            self.ensure_table()
+            with self.engine.connect() as connection:
+                return self.progress(connection)
+        row = connection.execute(text(
+            "SELECT last_id, rows_done, batches, started_at, updated_at, finished_at "
+            "FROM backfill_progress WHERE name = :name"
+        ), {'name': self.backfill.name}).first()
+        if row is None:
+            return BackfillProgress(name=self.backfill.name)
+        return BackfillProgress(self.backfill.name, *row)
+
+    def reset(self):
+        """Oublie le point de reprise : le prochain run repart du début"""
+        self.ensure_table()
+        with self.engine.begin() as connection:
+            connection.execute(text("DELETE FROM backfill_progress WHERE name = :name"), {'name': self.backfill.name})
+
+    def _save(self, connection, progress):
+        updated = connection.execute(text(
+            "UPDATE backfill_progress SET last_id = :last_id, rows_done = :rows_done, batches = :batches, "
+            "updated_at = :updated_at, finished_at = :finished_at WHERE name = :name"
+        ), vars(progress)).rowcount
+        if not updated:
+            connection.execute(text(
+                "INSERT INTO backfill_progress (name, last_id, rows_done, batches, started_at, updated_at, finished_at) "
+                "VALUES (:name, :last_id, :rows_done, :batches, :started_at, :updated_at, :finished_at)"
+            ), vars(progress))
+
+    def _batch(self, connection, progress):
+        """Traite le lot suivant ; retourne les identifiants traités (liste vide : terminé)"""
+        ids = connection.execute(self.backfill.pending_ids(progress.last_id, self.batch_size)).scalars().all()
+        if ids:
+            self.backfill.apply(connection, ids)
+        return ids
+
+    def estimate(self, sample=True):
+        """Lignes et lots restants ; avec sample, un lot est exécuté puis annulé pour mesurer sa durée"""
+        progress = self.progress()
+        with self.engine.connect() as connection:
+            remaining = connection.execute(self.backfill.pending_count(progress.last_id)).scalar()
+            estimate = BackfillEstimate(remaining_rows=remaining, batches=math.ceil(remaining / self.batch_size))
+            if sample and remaining:
+                try:
+                    started = time.perf_counter()
+                    self._batch(connection, progress)
+                    estimate.seconds_per_batch = time.perf_counter() - started
+                    estimate.seconds_per_pause = max(self.pause, estimate.seconds_per_batch * self.throttle)
+                finally:
+                    connection.rollback()
+        return estimate
+
+    def run(self, max_batches=None, on_batch=None):
+        """Traite les lots restants (au plus max_batches) ; retourne la progression finale
+
+        on_batch(progress, ids, duration) est appelé après chaque lot validé.
+        """
+        progress = self.progress()
+        if progress.started_at is None:
+            progress.started_at = datetime.now(timezone.utc)
+        progress.finished_at = None
+        done = 0
+        while max_batches is None or done < max_batches:
+            started = time.perf_counter()
+            with self.engine.begin() as connection:
+                ids = self._batch(connection, progress)
+                progress.updated_at = datetime.now(timezone.utc)
+                if ids:
+                    progress.last_id = ids[-1]
+                    progress.rows_done += len(ids)
+                    progress.batches += 1
+                else:
+                    progress.finished_at = progress.updated_at
+                # Le point de reprise est validé avec le lot : un lot n'est jamais appliqué deux fois
+                self._save(connection, progress)
+            if not ids:
+                logger.info(f"Backfill {self.backfill.name} terminé : {progress.rows_done} lignes")
+                break
+            duration = time.perf_counter() - started
+            done += 1
+            if on_batch is not None:
+                on_batch(progress, ids, duration)
+            time.sleep(max(self.pause, duration * self.throttle))
+        return progress
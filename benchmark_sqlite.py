@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark lecture/écriture concurrentes sur SQLite
+Usage: python benchmark_sqlite.py [--seconds S] [--readers N] [--writers N] [--rows N] [--profiles legacy wal]
+
+Reproduit la charge de deux workers gunicorn sur monderh.db : des processus
+lecteurs (liste paginée, compteur par statut) et écrivains (nouvelle candidature,
+changement de statut) tournent en parallèle sur une base temporaire, une fois par
+profil de pragmas (voir sqlite_profile.py). Affiche le débit et les échecs
+« database is locked » de chaque profil.
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+import argparse
+import multiprocessing
+
+# Ajouter le répertoire parent au path pour importer sqlite_profile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import NullPool
+
+from sqlite_profile import SQLITE_PROFILES, init_sqlite_profile, current_pragmas
+
+STATUSES = ('pending', 'reviewed', 'accepted', 'rejected')
+
+def make_engine(path, profile_name):
+    # pysqlite attend 5 s par défaut : l'attente est réglée par le profil seul
+    engine = create_engine(f"sqlite:///{path}", poolclass=NullPool, connect_args={'timeout': 0})
+    init_sqlite_profile(engine, SQLITE_PROFILES[profile_name])
+    return engine
+
+def seed(path, profile_name, rows):
+    engine = make_engine(path, profile_name)
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE application (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+            "status VARCHAR(20) NOT NULL, cover_letter TEXT, created_at FLOAT NOT NULL)"
+        ))
+        connection.execute(text("CREATE INDEX ix_application_created_at_id ON application (created_at, id)"))
+        connection.execute(text("CREATE INDEX ix_application_status_created_at ON application (status, created_at)"))
+        connection.execute(text(
+            "INSERT INTO application (user_id, status, cover_letter, created_at) "
+            "VALUES (:user_id, :status, :cover_letter, :created_at)"
+        ), [
+            {'user_id': i % 500, 'status': STATUSES[i % 4], 'cover_letter': 'x' * 400, 'created_at': time.time() - i}
+            for i in range(rows)
+        ])
+        pragmas = current_pragmas(connection)
+    engine.dispose()
+    return pragmas
+
+def reader(path, profile_name, start, deadline, results):
+    engine = make_engine(path, profile_name)
+    time.sleep(max(start - time.time(), 0))
+    done = errors = 0
+    while time.time() < deadline:
+        try:
+            with engine.connect() as connection:
+                connection.execute(text(
+                    "SELECT id, status FROM application ORDER BY created_at DESC, id DESC LIMIT 20"
+                )).all()
+                connection.execute(text(
+                    "SELECT count(*) FROM application WHERE status = :status"
+                ), {'status': random.choice(STATUSES)}).scalar()
+            done += 1
+        except OperationalError:
+            errors += 1
+    results.put(('read', done, errors))
+
+def writer(path, profile_name, start, deadline, rows, results):
+    engine = make_engine(path, profile_name)
+    time.sleep(max(start - time.time(), 0))
+    done = errors = 0
+    while time.time() < deadline:
+        try:
+            with engine.begin() as connection:
+                connection.execute(text(
+                    "INSERT INTO application (user_id, status, cover_letter, created_at) "
+                    "VALUES (:user_id, 'pending', :cover_letter, :created_at)"
+                ), {'user_id': random.randrange(500), 'cover_letter': 'x' * 400, 'created_at': time.time()})
+                connection.execute(text(
+                    "UPDATE application SET status = :status WHERE id = :id"
+                ), {'status': random.choice(STATUSES), 'id': random.randint(1, rows)})
+            done += 1
+        except OperationalError:
+            errors += 1
+    results.put(('write', done, errors))
+
+def run_profile(profile_name, args):
+    directory = tempfile.mkdtemp(prefix='monderh-bench-')
+    path = os.path.join(directory, 'bench.db')
+    pragmas = seed(path, profile_name, args.rows)
+
+    results = multiprocessing.Queue()
+    # Départ commun une fois tous les processus lancés
+    start = time.time() + 0.5
+    deadline = start + args.seconds
+    processes = [
+        multiprocessing.Process(target=reader, args=(path, profile_name, start, deadline, results))
+        for _ in range(args.readers)
+    ] + [
+        multiprocessing.Process(target=writer, args=(path, profile_name, start, deadline, args.rows, results))
+        for _ in range(args.writers)
+    ]
+    for process in processes:
+        process.start()
+    totals = {'read': [0, 0], 'write': [0, 0]}
+    for _ in processes:
+        kind, done, errors = results.get()
+        totals[kind][0] += done
+        totals[kind][1] += errors
+    for process in processes:
+        process.join()
+
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+    return pragmas, totals
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SQLite MonDRH")
+    parser.add_argument('--seconds', type=float, default=5.0, help="durée de chaque mesure")
+    parser.add_argument('--readers', type=int, default=4, help="processus lecteurs")
+    parser.add_argument('--writers', type=int, default=2, help="processus écrivains")
+    parser.add_argument('--rows', type=int, default=20000, help="candidatures initiales")
+    parser.add_argument('--profiles', nargs='+', choices=sorted(SQLITE_PROFILES), default=['legacy', 'wal'])
+    args = parser.parse_args()
+
+    print(f"🔧 {args.readers} lecteurs, {args.writers} écrivains, {args.seconds:.0f} s par profil, {args.rows} lignes")
+    try:
+        for profile_name in args.profiles:
+            pragmas, totals = run_profile(profile_name, args)
+            reads, read_errors = totals['read']
+            writes, write_errors = totals['write']
+            print(f"\n📊 Profil {profile_name} (journal {pragmas['journal_mode']}, synchronous {pragmas['synchronous']}, busy_timeout {pragmas['busy_timeout']} ms)")
+            print(f"   Lectures : {reads / args.seconds:.0f}/s ({read_errors} échecs « database is locked »)")
+            print(f"   Écritures : {writes / args.seconds:.0f}/s ({write_errors} échecs « database is locked »)")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erreur lors du benchmark: {e}")
+        return False
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
@@ -0,0 +1,128 @@
+# Envoi des campagnes newsletter MonDRH
+# Le contenu d'une campagne est rendu une fois par segment d'abonnés ; seuls les
+# champs de fusion [[first_name]], [[unsubscribe_url]]... sont remplacés pour chaque
+# destinataire. Les messages partent sur un petit pool de connexions SMTP (une par
+# thread, conservée pendant tout l'envoi) au rythme imposé par un seau à jetons,
+# pour rester sous les limites du fournisseur. Ce module ne dépend pas de app.py.
+
+import re
+import time
+import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email import policy
+from html import escape
+
+CAMPAIGN_RATE = 5.0  # emails par seconde
+CAMPAIGN_SMTP_CONNECTIONS = 2
+CAMPAIGN_BATCH_SIZE = 200  # abonnés lus par requête
+
+MERGE_FIELD = re.compile(r"\[\[\s*(\w+)\s*\]\]")
+
+# En-têtes déjà encodés par Flask-Mail laissés tels quels : une URL List-Unsubscribe
+# longue serait sinon convertie en mots encodés (RFC 2047) illisibles par les clients
+MESSAGE_POLICY = policy.SMTP.clone(refold_source='none')
+
+def merge_fields(template, values, escape_html=False):
+    """Remplace les champs [[nom]] par leur valeur (chaîne vide si inconnue)"""
+    if not template:
+        return template
+
+    def replace(match):
+        value = values.get(match.group(1))
+        value = '' if value is None else str(value)
+        return escape(value) if escape_html else value
+
+    return MERGE_FIELD.sub(replace, template)
+
+def message_bytes(message):
+    """Message Flask-Mail sérialisé pour l'envoi (nécessite un contexte d'application)"""
+    return message._message().as_bytes(policy=MESSAGE_POLICY)
+
+@dataclass(frozen=True)
+class RenderedCampaign:
+    """Campagne rendue pour un segment ; les champs de fusion restent à remplacer"""
+    subject: str
+    body: str
+    html: str = None
+
+    def personalize(self, values):
+        """(sujet, texte, html) pour un destinataire"""
+        return (
+            merge_fields(self.subject, values),
+            merge_fields(self.body, values),
+            merge_fields(self.html, values, escape_html=True),
+        )
+
+class RateLimiter:
+    """Seau à jetons : rate envois par seconde en moyenne, rafales de burst envois au plus"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Attend qu'un jeton soit disponible (sans limite si rate <= 0)"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class SMTPConnectionPool:
+    """Envois répartis sur size threads, chacun avec sa connexion SMTP ouverte par connect()"""
+
+    def __init__(self, connect, size=CAMPAIGN_SMTP_CONNECTIONS):
+        self.connect = connect
+        self.size = size
+        self._local = threading.local()
+        self._hosts = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='smtp')
+
+    def _host(self):
+        host = getattr(self._local, 'host', None)
+        if host is None:
+            host = self.connect()
+            self._local.host = host
+            with self._lock:
+                self._hosts.append(host)
+        return host
+
+    def _send(self, sender, recipients, payload):
+        try:
+            self._host().sendmail(sender, recipients, payload)
+        except smtplib.SMTPServerDisconnected:
+            # Connexion fermée par le serveur (inactivité, limite par session) : une reconnexion
+            self._local.host = None
+            self._host().sendmail(sender, recipients, payload)
+
+    def submit(self, sender, recipients, payload):
+        """Planifie un envoi ; retourne un Future (exception SMTP éventuelle)"""
+        return self._executor.submit(self._send, sender, recipients, payload)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        for host in self._hosts:
+            try:
+                host.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+        self._hosts = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,261 @@
+# Graphiques MonDRH
+# Description des graphiques (données simples) et rendu matplotlib hors des workers web
+#
+# Les processus web ne font que décrire un graphique (ChartSpec) ; le rendu est
+# effectué par un pool de processus dédié (ChartRenderer), pré-chauffé et recyclé
+# régulièrement pour borner la mémoire consommée par matplotlib. Les processus de
+# rendu sont forkés d'un serveur (forkserver) qui n'a importé que ce module : ils
+# n'exécutent jamais le module __main__ du parent (app.py lancé directement, script
+# sans garde if __name__ == '__main__'). Ce module ne dépend pas de app.py et
+# n'importe pyplot qu'à la demande.
+
+import io
+import sys
+import types
+import logging
+import threading
+import multiprocessing
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as RenderTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# forkserver n'existe pas sous Windows : spawn, avec la même précaution pour __main__
+CHART_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+@dataclass(frozen=True)
+class ChartPreset:
+    """Résolution et échelle de sortie d'un graphique"""
+    dpi: int
+    scale: float = 1.0
+
+# Préréglages de sortie : 'print' conserve la qualité historique des exports (300 dpi)
+CHART_PRESETS = {
+    'print': ChartPreset(dpi=300),
+    'screen': ChartPreset(dpi=100),
+    'thumbnail': ChartPreset(dpi=72, scale=0.5),
+}
+
+# Formats de sortie : type MIME
+CHART_OUTPUTS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+@dataclass
+class ChartPanel:
+    """Un sous-graphique : type de tracé et séries de données"""
+    kind: str  # bar, pie, line, text
+    title: str = ''
+    labels: list = field(default_factory=list)
+    values: list = field(default_factory=list)
+    # Plusieurs courbes sur les mêmes libellés (type line) : nom de la série -> valeurs
+    series: dict = field(default_factory=dict)
+    colors: list = None
+    ylabel: str = ''
+    rotate_labels: int = 0
+    annotate: bool = False
+    start_angle: int = 0
+    text: str = ''
+
+@dataclass
+class ChartSpec:
+    """Description complète d'une figure, transmise telle quelle au pool de rendu"""
+    title: str
+    figsize: tuple
+    panels: list
+    grid: tuple = (2, 2)
+
+_pyplot = None
+
+def get_pyplot():
+    """Importe pyplot avec le backend non interactif (une seule fois par processus)"""
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib
+        matplotlib.use('Agg')  # Use non-interactive backend
+        matplotlib.rcParams['svg.fonttype'] = 'none'  # texte SVG conservé en texte : fichiers plus légers
+        import matplotlib.pyplot as plt
+        _pyplot = plt
+    return _pyplot
+
+def _draw_bar(ax, panel):
+    bars = ax.bar(panel.labels, panel.values, color=panel.colors)
+    if panel.annotate:
+        # Ajouter les valeurs sur les barres
+        for bar, value in zip(bars, panel.values):
+            ax.text(bar.get_x() + bar.get_width()/2., bar.get_height() + 0.1,
+                    f'{value}', ha='center', va='bottom')
+
+def _draw_pie(ax, panel):
+    if not any(panel.values):
+        return
+    ax.pie(panel.values, labels=panel.labels, colors=panel.colors, autopct='%1.1f%%', startangle=panel.start_angle)
+
+def _draw_line(ax, panel):
+    if panel.series:
+        for name, values in panel.series.items():
+            ax.plot(panel.labels, values, marker='o', linewidth=2, markersize=5, label=name)
+        ax.legend()
+    else:
+        ax.plot(panel.labels, panel.values, marker='o', linewidth=2, markersize=8)
+    ax.grid(True, alpha=0.3)
+
+def _draw_text(ax, panel):
+    ax.axis('off')
+    ax.text(0.1, 0.9, panel.text, transform=ax.transAxes, fontsize=10,
+            verticalalignment='top', fontfamily='monospace')
+
+PANEL_DRAWERS = {
+    'bar': _draw_bar,
+    'pie': _draw_pie,
+    'line': _draw_line,
+    'text': _draw_text,
+}
+
+def render_chart(spec, output='png', preset='print'):
+    """Dessine une figure et retourne son contenu encodé (PNG ou SVG)"""
+    if output not in CHART_OUTPUTS:
+        raise ValueError(f"Format de graphique non supporté : {output}")
+    plt = get_pyplot()
+    chart_preset = CHART_PRESETS[preset]
+    width, height = spec.figsize
+    rows, columns = spec.grid
+
+    fig, axes = plt.subplots(rows, columns, figsize=(width * chart_preset.scale, height * chart_preset.scale), squeeze=False)
+    try:
+        fig.suptitle(spec.title, fontsize=16, fontweight='bold')
+        for ax, panel in zip(axes.flat, spec.panels):
+            PANEL_DRAWERS[panel.kind](ax, panel)
+            if panel.title and (panel.kind != 'pie' or any(panel.values)):
+                ax.set_title(panel.title)
+            if panel.ylabel:
+                ax.set_ylabel(panel.ylabel)
+            if panel.rotate_labels:
+                ax.tick_params(axis='x', rotation=panel.rotate_labels)
+
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=output, dpi=chart_preset.dpi, bbox_inches='tight')
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+def warm_up():
+    """Initialise un processus de rendu : import de pyplot et chargement des polices"""
+    plt = get_pyplot()
+    fig = plt.figure(figsize=(1, 1))
+    fig.text(0.5, 0.5, 'MonDRH')
+    fig.savefig(io.BytesIO(), format='png', dpi=10)
+    plt.close(fig)
+
+def _ready():
+    return True
+
+_main_module_lock = threading.Lock()
+
+class _RenderProcess(multiprocessing.get_context(CHART_START_METHOD).Process):
+    """Processus de rendu démarré sans transmettre le module __main__ du parent"""
+
+    def start(self):
+        # multiprocessing fait réexécuter au fils le __main__ du parent s'il a un
+        # fichier : le fils n'exécute que des fonctions de ce module, il n'en a pas besoin
+        with _main_module_lock:
+            main_module = sys.modules['__main__']
+            sys.modules['__main__'] = types.ModuleType('__main__')
+            try:
+                super().start()
+            finally:
+                sys.modules['__main__'] = main_module
+
+class _RenderContext:
+    """Contexte multiprocessing des pools de rendu : processus _RenderProcess"""
+    Process = _RenderProcess
+
+    def __init__(self, context):
+        self._context = context
+
+    def __getattr__(self, name):
+        return getattr(self._context, name)
+
+class ChartRenderer:
+    """Pool de processus dédié au rendu des graphiques
+
+    Le pool est créé à la première demande et pré-chauffé (pyplot importé dans
+    chaque processus). Après max_workers * max_renders_per_worker rendus, il est
+    remplacé par un pool neuf : les rendus en cours se terminent dans l'ancien,
+    dont les processus s'arrêtent ensuite et rendent leur mémoire.
+    """
+
+    def __init__(self, max_workers=2, max_renders_per_worker=50, timeout=60, start_method=CHART_START_METHOD):
+        self.max_workers = max_workers
+        self.max_renders_per_worker = max_renders_per_worker
+        self.timeout = timeout
+        self.start_method = start_method
+        self._lock = threading.Lock()
+        self._executor = None
+        self._renders = 0
+
+    def _create_executor(self):
+        context = multiprocessing.get_context(self.start_method)
+        if self.start_method == 'forkserver':
+            # Le serveur de fork n'importe que ce module (pas le __main__ du parent)
+            context.set_forkserver_preload([__name__])
+        if self.start_method == CHART_START_METHOD:
+            context = _RenderContext(context)
+        executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=context,
+            initializer=warm_up
+        )
+        # Démarrer tous les processus maintenant plutôt qu'au premier rendu
+        for _ in range(self.max_workers):
+            executor.submit(_ready)
+        return executor
+
+    def _acquire_executor(self):
+        with self._lock:
+            if self._executor is not None and self._renders >= self.max_workers * self.max_renders_per_worker:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            if self._executor is None:
+                self._executor = self._create_executor()
+                self._renders = 0
+            self._renders += 1
+            return self._executor
+
+    def _discard(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def render(self, spec, output='png', preset='print'):
+        """Rend une figure dans le pool et retourne son contenu encodé
+
+        Si un processus de rendu meurt, le rendu est retenté une fois dans un pool
+        neuf ; si le pool échoue encore ou dépasse le délai, la figure est dessinée
+        dans le processus courant plutôt que de faire échouer l'export.
+        """
+        for attempt in range(2):
+            executor = self._acquire_executor()
+            try:
+                return executor.submit(render_chart, spec, output, preset).result(timeout=self.timeout)
+            except BrokenProcessPool as e:
+                # Un processus de rendu est mort (mémoire, signal) : repartir d'un pool neuf
+                self._discard(executor)
+                logger.warning(f"Pool de rendu des graphiques cassé (essai {attempt + 1}) : {e}")
+            except RenderTimeout:
+                # Rendu bloqué : son processus reste occupé, ne plus confier de rendus à ce pool
+                self._discard(executor)
+                logger.warning(f"Rendu de graphique au-delà de {self.timeout} s, rendu dans le processus courant")
+                break
+        return render_chart(spec, output, preset)
+
+    def shutdown(self):
+        """Arrête le pool de rendu"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
@@ -1,6 +1,12 @@
 # Configuration MonDRH
 import os
 
+from pool_metrics import MeteredQueuePool
+from sqlite_profile import SqliteProfile
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
 class Config:
     # Configuration de base
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'monderh-secret-key-2024-production-super-secure-12345'
@@ -17,6 +23,56 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///monderh.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Pool de connexions (par processus gunicorn)
+    # Chaque worker a son propre pool : pool_size = nombre de threads du worker, et le
+    # débordement se partage DB_MAX_CONNECTIONS entre les WEB_CONCURRENCY workers.
+    WEB_CONCURRENCY = env_int('WEB_CONCURRENCY', 2)  # workers gunicorn
+    GUNICORN_THREADS = env_int('GUNICORN_THREADS', 1)
+    DB_MAX_CONNECTIONS = env_int('DB_MAX_CONNECTIONS', 20)  # budget de connexions du service web
+    DB_POOL_TIMEOUT = env_int('DB_POOL_TIMEOUT', 10)  # secondes d'attente d'une connexion libre
+    DB_POOL_RECYCLE = env_int('DB_POOL_RECYCLE', 280)  # secondes, sous le délai de coupure des connexions inactives
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'false').lower() in ('1', 'true', 'yes')
+    DB_STATEMENT_TIMEOUT = env_int('DB_STATEMENT_TIMEOUT', 0)  # millisecondes (PostgreSQL), 0 = aucun
+    
+    # Profil SQLite (base par défaut) : voir sqlite_profile.py
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = env_int('SQLITE_BUSY_TIMEOUT', 5000)  # millisecondes d'attente d'un verrou d'écriture
+    SQLITE_CACHE_SIZE_MB = env_int('SQLITE_CACHE_SIZE_MB', 20)  # par connexion
+    SQLITE_MMAP_SIZE_MB = env_int('SQLITE_MMAP_SIZE_MB', 256)
+    
+    @classmethod
+    def sqlite_profile(cls):
+        """Pragmas posés sur chaque connexion SQLite"""
+        return SqliteProfile(
+            journal_mode=cls.SQLITE_JOURNAL_MODE,
+            synchronous=cls.SQLITE_SYNCHRONOUS,
+            busy_timeout=cls.SQLITE_BUSY_TIMEOUT,
+            cache_size=-cls.SQLITE_CACHE_SIZE_MB * 1000,
+            mmap_size=cls.SQLITE_MMAP_SIZE_MB * 1024 * 1024,
+        )
+    
+    @classmethod
+    def engine_options(cls, database_uri):
+        """Options du moteur SQLAlchemy (SQLALCHEMY_ENGINE_OPTIONS) pour cette base"""
+        if database_uri.startswith('sqlite'):
+            # Fichier local : pas de coupure réseau ni de limite de connexions ; les pragmas
+            # (WAL, busy_timeout...) sont posés par init_sqlite_profile
+            return {}
+        pool_size = max(cls.GUNICORN_THREADS, 1)
+        options = {
+            'poolclass': MeteredQueuePool,
+            'pool_size': pool_size,
+            'max_overflow': max(cls.DB_MAX_CONNECTIONS // max(cls.WEB_CONCURRENCY, 1) - pool_size, 0),
+            'pool_timeout': cls.DB_POOL_TIMEOUT,
+            'pool_recycle': cls.DB_POOL_RECYCLE,
+            'pool_pre_ping': cls.DB_POOL_PRE_PING,
+            'pool_use_lifo': True,  # les connexions peu utilisées vieillissent et sont recyclées
+        }
+        if cls.DB_STATEMENT_TIMEOUT and database_uri.startswith('postgres'):
+            options['connect_args'] = {'options': f'-c statement_timeout={cls.DB_STATEMENT_TIMEOUT}'}
+        return options
+    
     # Configuration Flask
     FLASK_ENV = os.environ.get('FLASK_ENV') or 'development'
     FLASK_DEBUG = os.environ.get('FLASK_DEBUG') or True
@@ -28,6 +84,10 @@ class DevelopmentConfig(Config):
 class ProductionConfig(Config):
     DEBUG = False
     FLASK_ENV = 'production'
+    
+    # La base managée ferme les connexions inactives : vérifier avant usage, borner les requêtes
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+    DB_STATEMENT_TIMEOUT = env_int('DB_STATEMENT_TIMEOUT', 30000)
 
 # Configuration par défaut
 config = {
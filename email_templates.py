@@ -0,0 +1,90 @@
+# Gabarits d'emails MonDRH
+# Chaque email est un gabarit Jinja2 de templates/emails/ à trois blocs : subject,
+# text (partie texte brut) et html (partie HTML, facultative). Le texte des emails se
+# modifie donc sans toucher au code. Les gabarits sont compilés une seule fois par
+# processus et gardés en mémoire avec leurs fonctions de bloc : render_many() produit
+# une série de messages personnalisés à partir d'un même gabarit sans repasser par le
+# chargeur (rafales de changements de statut, envois groupés).
+# Ce module ne dépend pas de app.py.
+
+import posixpath
+import threading
+from dataclasses import dataclass
+
+EMAIL_TEMPLATE_FOLDER = 'emails'
+EMAIL_TEMPLATE_EXTENSION = '.html'
+
+@dataclass(frozen=True)
+class RenderedEmail:
+    """Email rendu pour un destinataire"""
+    subject: str
+    body: str
+    html: str = None
+
+class CompiledEmail:
+    """Gabarit d'email compilé et ses fonctions de bloc"""
+
+    def __init__(self, template):
+        missing = [name for name in ('subject', 'text') if name not in template.blocks]
+        if missing:
+            raise ValueError(f"Gabarit {template.name} : bloc(s) {', '.join(missing)} manquant(s)")
+        self.template = template
+        self.subject = template.blocks['subject']
+        self.text = template.blocks['text']
+        self.html = template.blocks.get('html')
+
+    def render(self, values):
+        # Un seul contexte pour les trois blocs, comme le ferait le rendu du gabarit entier
+        context = self.template.new_context(values)
+        html = ''.join(self.html(context)).strip() if self.html else ''
+        return RenderedEmail(
+            subject=' '.join(''.join(self.subject(context)).split()),
+            body=''.join(self.text(context)).strip() + '\n',
+            html=html or None
+        )
+
+class EmailTemplates:
+    """Cache des gabarits d'emails compilés d'un environnement Jinja2"""
+
+    def __init__(self, environment, folder=EMAIL_TEMPLATE_FOLDER):
+        self.environment = environment
+        self.folder = folder
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        return f"{self.folder}/{name}{EMAIL_TEMPLATE_EXTENSION}"
+
+    def get(self, name):
+        """Gabarit compilé (recompilé s'il a changé sur disque en mode auto_reload)"""
+        compiled = self._compiled.get(name)
+        if compiled is None or (self.environment.auto_reload and not compiled.template.is_up_to_date):
+            with self._lock:
+                compiled = CompiledEmail(self.environment.get_template(self.path(name)))
+                self._compiled[name] = compiled
+        return compiled
+
+    def names(self):
+        """Emails disponibles (les fichiers préfixés par _ sont des gabarits partagés)"""
+        return sorted(
+            posixpath.basename(path)[:-len(EMAIL_TEMPLATE_EXTENSION)]
+            for path in self.environment.list_templates()
+            if posixpath.dirname(path) == self.folder and path.endswith(EMAIL_TEMPLATE_EXTENSION)
+            and not posixpath.basename(path).startswith('_')
+        )
+
+    def preload(self):
+        """Compile tous les emails à l'avance ; retourne leurs noms"""
+        names = self.names()
+        for name in names:
+            self.get(name)
+        return names
+
+    def render(self, name, **values):
+        return self.get(name).render(values)
+
+    def render_many(self, name, contexts, **shared):
+        """Rend le gabarit pour chaque contexte (variables partagées en plus) ; générateur de RenderedEmail"""
+        compiled = self.get(name)
+        for values in contexts:
+            yield compiled.render(dict(shared, **values) if shared else values)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Script d'export analytique des tables complètes (Parquet ou Feather)
+Usage: python export_analytics.py [--format parquet|feather] [--output DOSSIER] [table ...]
+
+Produit un fichier par table (candidatures, rendez-vous, offres d'emploi,
+abonnés newsletter) pour alimenter les outils de BI.
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, timezone
+
+# Ajouter le répertoire parent au path pour importer app
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, ANALYTICS_DATASETS, export_analytics_dataset
+from analytics import ANALYTICS_FORMATS, analytics_filename
+
+def main():
+    parser = argparse.ArgumentParser(description="Export analytique MonDRH")
+    parser.add_argument('datasets', nargs='*', choices=sorted(ANALYTICS_DATASETS), help="tables à exporter (toutes par défaut)")
+    parser.add_argument('--format', choices=sorted(ANALYTICS_FORMATS), default='parquet')
+    parser.add_argument('--output', default='analytics', help="dossier de destination")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    generated_at = datetime.now(timezone.utc)
+
+    with app.app_context():
+        print(f"📦 Export analytique ({args.format}) vers {args.output}/")
+
+        try:
+            for name in args.datasets or sorted(ANALYTICS_DATASETS):
+                path = os.path.join(args.output, analytics_filename(name, args.format, generated_at))
+                started = time.monotonic()
+                rows = export_analytics_dataset(path, name, args.format)
+                print(f"✅ {name}: {rows} lignes en {time.monotonic() - started:.1f}s -> {path}")
+            return True
+
+        except Exception as e:
+            print(f"❌ Erreur lors de l'export: {e}")
+            return False
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
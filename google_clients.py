@@ -0,0 +1,76 @@
+# Clients des API Google MonDRH
+# build() relit et analyse le document de découverte de l'API à chaque appel. Ici les
+# documents fournis avec google-api-python-client (découverte statique, sans appel
+# réseau) sont analysés une fois par processus, et les clients construits sont
+# conservés par utilisateur dans un cache LRU borné. Le cache est propre à chaque
+# thread : le transport httplib2 d'un client ne se partage pas entre threads.
+# Un client dont les credentials ont expiré n'est pas réutilisé : il est reconstruit
+# avec les credentials rafraîchis (et enregistrés) que fournit l'application.
+# Ce module ne dépend pas de app.py.
+
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+
+GOOGLE_CLIENT_CACHE_SIZE = 16  # clients par thread
+
+@lru_cache(maxsize=None)
+def discovery_document(api, version):
+    """Document de découverte fourni avec la bibliothèque, analysé une seule fois"""
+    document = discovery_cache.get_static_doc(api, version)
+    if document is None:
+        raise ValueError(f"Document de découverte {api} {version} absent de google-api-python-client")
+    return json.loads(document)
+
+@dataclass
+class CachedClient:
+    """Client construit et credentials avec lesquels il l'a été"""
+    service: object
+    credentials: object
+    generation: int
+
+class GoogleClientCache:
+    """Clients d'API Google par (utilisateur, API, version), LRU bornée par thread"""
+
+    def __init__(self, maxsize=GOOGLE_CLIENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._local = threading.local()
+        # Incrémentée par invalidate() : les clients des autres threads sont aussi écartés
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def _clients(self):
+        clients = getattr(self._local, 'clients', None)
+        if clients is None:
+            clients = self._local.clients = OrderedDict()
+        return clients
+
+    def get(self, user_id, api, version, load_credentials):
+        """Client de l'API ; load_credentials() n'est appelé que pour (re)construire (None : pas de client)"""
+        clients = self._clients()
+        key = (user_id, api, version)
+        generation = self._generations.get(user_id, 0)
+        entry = clients.get(key)
+        if entry is not None and entry.generation == generation and entry.credentials.valid:
+            clients.move_to_end(key)
+            return entry.service
+
+        clients.pop(key, None)
+        credentials = load_credentials()
+        if credentials is None:
+            return None
+        service = build_from_document(discovery_document(api, version), credentials=credentials)
+        clients[key] = CachedClient(service, credentials, generation)
+        while len(clients) > self.maxsize:
+            clients.popitem(last=False)
+        return service
+
+    def invalidate(self, user_id):
+        """Écarte les clients de l'utilisateur (nouvelle autorisation, déconnexion)"""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
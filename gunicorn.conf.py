@@ -0,0 +1,41 @@
+# Configuration gunicorn MonDRH (chargée automatiquement depuis le répertoire courant)
+# Le nombre de workers et de threads sert aussi à dimensionner le pool de
+# connexions de chaque worker (voir config.py).
+import os
+
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'false').lower() in ('1', 'true', 'yes')
+
+def post_fork(server, worker):
+    """Le worker ne doit pas réutiliser les connexions ouvertes par le maître avant le fork"""
+    if not preload_app:
+        return
+    from app import app, db
+    from pool_metrics import POOL_METRICS
+    with app.app_context():
+        # close=False : les sockets héritées restent au parent, le worker ouvre les siennes
+        db.engine.dispose(close=False)
+    POOL_METRICS.reset()
+    server.log.info(f"Worker {worker.pid} : pool de connexions réinitialisé après le fork")
+
+# Workers des tâches en arrière-plan, lancés et relancés par supervisor.py avec le
+# maître gunicorn (vide : aucun, par exemple quand ils tournent ailleurs)
+background_workers = [
+    queue.strip() for queue in os.environ.get('BACKGROUND_WORKERS', 'exports,emails,drive').split(',') if queue.strip()
+]
+
+def when_ready(server):
+    """Démarre le superviseur des workers une fois le port ouvert"""
+    from supervisor import start_supervisor
+    server.background_supervisor = start_supervisor(background_workers)
+    if server.background_supervisor is not None:
+        server.log.info(f"Workers en arrière-plan : {', '.join(background_workers)}")
+
+def on_exit(server):
+    """Arrête le superviseur (et ses workers) avec gunicorn"""
+    supervisor = getattr(server, 'background_supervisor', None)
+    if supervisor is not None and supervisor.poll() is None:
+        supervisor.terminate()
+        supervisor.wait(timeout=30)
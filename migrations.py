@@ -0,0 +1,171 @@
+# Migrations de schéma MonDRH
+# Chaque migration porte un numéro de version ; celles déjà appliquées sont
+# enregistrées dans la table schema_migrations. Les opérations sont idempotentes
+# (colonne ou index déjà présent : rien à faire) et adaptées au dialecte : sous
+# PostgreSQL, les index sont construits avec CREATE INDEX CONCURRENTLY, hors
+# transaction, pour ne pas bloquer les écritures sur les tables de production.
+# Ce module ne dépend pas de app.py.
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class AddColumn:
+    """Ajoute une colonne (nullable) si elle n'existe pas"""
+    table: str
+    column: str
+    ddl_type: str
+    concurrent = False
+
+    def describe(self):
+        return f"colonne {self.table}.{self.column}"
+
+    def apply(self, connection):
+        columns = {column['name'] for column in inspect(connection).get_columns(self.table)}
+        if self.column in columns:
+            return False
+        quote = connection.dialect.identifier_preparer.quote
+        connection.execute(text(f"ALTER TABLE {quote(self.table)} ADD COLUMN {quote(self.column)} {self.ddl_type}"))
+        return True
+
+@dataclass(frozen=True)
+class CreateIndex:
+    """Crée un index (composite) s'il n'existe pas, concurremment sous PostgreSQL"""
+    name: str
+    table: str
+    columns: tuple
+    unique: bool = False
+    concurrent = True
+
+    def describe(self):
+        return f"index {self.name} ({self.table}: {', '.join(self.columns)})"
+
+    def apply(self, connection):
+        quote = connection.dialect.identifier_preparer.quote
+        postgresql = connection.dialect.name == 'postgresql'
+        if postgresql:
+            # Une construction concurrente interrompue laisse un index invalide : le reconstruire
+            valid = connection.execute(text(
+                "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name"
+            ), {'name': self.name}).scalar()
+            if valid:
+                return False
+            if valid is False:
+                connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {quote(self.name)}"))
+        elif self.name in {index['name'] for index in inspect(connection).get_indexes(self.table)}:
+            return False
+
+        statement = (
+            f"CREATE {'UNIQUE ' if self.unique else ''}INDEX {'CONCURRENTLY ' if postgresql else ''}"
+            f"{quote(self.name)} ON {quote(self.table)} ({', '.join(quote(column) for column in self.columns)})"
+        )
+        connection.execute(text(statement))
+        return True
+
+@dataclass(frozen=True)
+class Migration:
+    """Migration numérotée : liste d'opérations appliquées dans l'ordre"""
+    version: int
+    name: str
+    operations: tuple
+
+    def needs_autocommit(self, dialect_name):
+        return dialect_name == 'postgresql' and any(operation.concurrent for operation in self.operations)
+
+MIGRATIONS = (
+    Migration(1, 'google_workspace_columns', (
+        AddColumn('application', 'google_drive_link', 'VARCHAR(500)'),
+        AddColumn('appointment', 'google_calendar_link', 'VARCHAR(500)'),
+    )),
+    Migration(2, 'hot_query_indexes', (
+        # Listes paginées par curseur (created_at, id) / (date, id) et leurs filtres
+        CreateIndex('ix_user_created_at_id', 'user', ('created_at', 'id')),
+        CreateIndex('ix_application_created_at_id', 'application', ('created_at', 'id')),
+        CreateIndex('ix_application_status_created_at', 'application', ('status', 'created_at')),
+        CreateIndex('ix_application_service_type_created_at', 'application', ('service_type', 'created_at')),
+        CreateIndex('ix_application_user_id', 'application', ('user_id',)),
+        CreateIndex('ix_appointment_date_id', 'appointment', ('date', 'id')),
+        CreateIndex('ix_appointment_user_id_date', 'appointment', ('user_id', 'date')),
+        CreateIndex('ix_job_offer_created_at_id', 'job_offer', ('created_at', 'id')),
+        CreateIndex('ix_job_offer_is_active_created_at', 'job_offer', ('is_active', 'created_at')),
+        CreateIndex('ix_job_application_job_offer_id', 'job_application', ('job_offer_id',)),
+        CreateIndex('ix_job_application_user_id', 'job_application', ('user_id',)),
+        CreateIndex('ix_google_token_user_id', 'google_token', ('user_id',)),
+    )),
+    Migration(3, 'google_drive_folder_id', (
+        AddColumn('google_token', 'drive_folder_id', 'VARCHAR(200)'),
+    )),
+    Migration(4, 'email_outbox_claimed_at', (
+        AddColumn('email_outbox', 'claimed_at', 'TIMESTAMP'),
+    )),
+    Migration(5, 'drive_upload_claimed_at', (
+        AddColumn('drive_upload', 'claimed_at', 'TIMESTAMP'),
+    )),
+)
+
+class MigrationRunner:
+    """Applique les migrations manquantes sur un moteur SQLAlchemy"""
+
+    def __init__(self, engine, migrations=MIGRATIONS):
+        self.engine = engine
+        self.migrations = sorted(migrations, key=lambda migration: migration.version)
+
+    def ensure_table(self):
+        with self.engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "version INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, applied_at TIMESTAMP NOT NULL)"
+            ))
+
+    def applied_versions(self):
+        self.ensure_table()
+        with self.engine.connect() as connection:
+            return set(connection.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+    def pending(self):
+        applied = self.applied_versions()
+        return [migration for migration in self.migrations if migration.version not in applied]
+
+    def _record(self, connection, migration):
+        connection.execute(text(
+            "INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"
+        ), {'version': migration.version, 'name': migration.name, 'applied_at': datetime.now(timezone.utc)})
+
+    def apply(self, migration):
+        """Applique une migration ; retourne la description des opérations effectuées"""
+        done = []
+        if migration.needs_autocommit(self.engine.dialect.name):
+            # CREATE INDEX CONCURRENTLY ne peut pas s'exécuter dans une transaction : chaque
+            # opération est validée seule, et la version n'est enregistrée qu'à la fin
+            with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                # Une construction d'index peut dépasser le statement_timeout du service web
+                connection.execute(text("SET statement_timeout = 0"))
+                try:
+                    for operation in migration.operations:
+                        if operation.apply(connection):
+                            done.append(operation.describe())
+                    self._record(connection, migration)
+                finally:
+                    connection.execute(text("RESET statement_timeout"))
+        else:
+            with self.engine.begin() as connection:
+                for operation in migration.operations:
+                    if operation.apply(connection):
+                        done.append(operation.describe())
+                self._record(connection, migration)
+        logger.info(f"Migration {migration.version} ({migration.name}) appliquée : {len(done)} opération(s)")
+        return done
+
+    def run(self):
+        """Applique toutes les migrations manquantes ; retourne [(migration, opérations effectuées)]"""
+        return [(migration, self.apply(migration)) for migration in self.pending()]
+
+def run_migrations(engine):
+    """Applique les migrations manquantes (voir migrate_db.py)"""
+    return MigrationRunner(engine).run()
@@ -0,0 +1,137 @@
+# Pagination par curseur (keyset) MonDRH
+# Les listes d'administration sont parcourues par clé de tri, par exemple
+# (created_at, id) : chaque page est une requête "WHERE (created_at, id) < curseur
+# ORDER BY ... LIMIT n" servie par l'index, quelle que soit sa profondeur, sans
+# OFFSET ni COUNT(*). Les curseurs sont des jetons signés opaques. Ce module ne
+# dépend pas de app.py.
+
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import and_, or_, text
+
+@dataclass(frozen=True)
+class SortKey:
+    """Colonne de tri ; value(item) lit sa valeur sur un élément (attribut du même nom par défaut)"""
+    column: object
+    descending: bool = True
+    value: object = None
+
+    def value_of(self, item):
+        if self.value is not None:
+            return self.value(item)
+        return getattr(item, self.column.key)
+
+    def python_type(self):
+        try:
+            return self.column.type.python_type
+        except NotImplementedError:
+            return None
+
+@dataclass
+class KeysetPage:
+    """Page d'une liste parcourue par curseur"""
+    items: list
+    per_page: int
+    next_cursor: str = None
+    prev_cursor: str = None
+    total: int = None
+    total_is_estimate: bool = False
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+def _dump_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _load_value(value, python_type):
+    if value is None:
+        return None
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return value
+
+class KeysetPaginator:
+    """Pagine une requête ORM sur des clés de tri dont la dernière est unique (l'id)"""
+
+    def __init__(self, keys, secret_key, salt='keyset-pagination'):
+        self.keys = tuple(keys)
+        self.serializer = URLSafeSerializer(secret_key, salt=salt)
+
+    def encode(self, direction, item):
+        return self.serializer.dumps([direction] + [_dump_value(key.value_of(item)) for key in self.keys])
+
+    def decode(self, cursor):
+        """(sens, valeurs) d'un curseur, ou None s'il est absent ou invalide (première page)"""
+        if not cursor:
+            return None
+        try:
+            payload = self.serializer.loads(cursor)
+            direction, values = payload[0], payload[1:]
+            if direction not in ('next', 'prev') or len(values) != len(self.keys):
+                return None
+            return direction, [_load_value(value, key.python_type()) for key, value in zip(self.keys, values)]
+        except (BadSignature, ValueError, TypeError, IndexError):
+            return None
+
+    def _order(self, reverse):
+        return [
+            key.column.desc() if key.descending != reverse else key.column.asc()
+            for key in self.keys
+        ]
+
+    def _after(self, values, reverse):
+        """Condition "après le curseur" dans l'ordre de tri (inversé si reverse)"""
+        clauses = []
+        for position, key in enumerate(self.keys):
+            descending = key.descending != reverse
+            column, value = key.column, values[position]
+            equal = [previous.column == values[index] for index, previous in enumerate(self.keys[:position])]
+            clauses.append(and_(*equal, column < value if descending else column > value))
+        # Borne sur la première clé : permet un parcours d'index par intervalle
+        first = self.keys[0]
+        bound = first.column <= values[0] if first.descending != reverse else first.column >= values[0]
+        return and_(bound, or_(*clauses))
+
+    def paginate(self, query, cursor=None, per_page=20):
+        """Page suivant (ou précédant) le curseur, triée dans l'ordre des clés"""
+        decoded = self.decode(cursor)
+        reverse = decoded is not None and decoded[0] == 'prev'
+        if decoded is not None:
+            query = query.filter(self._after(decoded[1], reverse))
+        rows = query.order_by(None).order_by(*self._order(reverse)).limit(per_page + 1).all()
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+        if reverse:
+            rows.reverse()
+
+        page = KeysetPage(items=rows, per_page=per_page)
+        if rows:
+            # En avançant, une page précédente existe dès qu'on est parti d'un curseur ;
+            # en reculant, une page suivante existe toujours (celle d'où l'on vient)
+            if more or reverse:
+                page.next_cursor = self.encode('next', rows[-1])
+            if (more and reverse) or (decoded is not None and not reverse):
+                page.prev_cursor = self.encode('prev', rows[0])
+        return page
+
+def estimate_count(connection, statement):
+    """Nombre de lignes estimé par le planificateur PostgreSQL, ou None sur une autre base"""
+    if connection.dialect.name != 'postgresql':
+        return None
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True})
+    plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
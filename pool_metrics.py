@@ -0,0 +1,87 @@
+# Métriques du pool de connexions MonDRH
+# Attente pour obtenir une connexion, débordement (overflow) et renouvellement des
+# connexions (ouvertures, fermetures, invalidations) pour le processus courant.
+# L'attente est mesurée par MeteredQueuePool (voir config.py), le reste par les
+# événements du pool. Ce module ne dépend pas de app.py.
+
+import time
+import threading
+from dataclasses import dataclass, field, fields, asdict
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+_lock = threading.Lock()
+
+@dataclass
+class PoolMetrics:
+    """Compteurs du pool depuis le démarrage (ou le fork) du processus"""
+    checkouts: int = 0
+    checkins: int = 0
+    connects: int = 0
+    closes: int = 0
+    invalidations: int = 0
+    checkout_wait_total: float = 0.0  # secondes
+    checkout_wait_max: float = 0.0
+    checkout_timeouts: int = 0
+    started_at: float = field(default_factory=time.time)
+
+    def record_wait(self, seconds, timed_out=False):
+        with _lock:
+            self.checkout_wait_total += seconds
+            self.checkout_wait_max = max(self.checkout_wait_max, seconds)
+            if timed_out:
+                self.checkout_timeouts += 1
+
+    def increment(self, name):
+        with _lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def reset(self):
+        with _lock:
+            fresh = PoolMetrics()
+            for item in fields(self):
+                setattr(self, item.name, getattr(fresh, item.name))
+
+    def snapshot(self, pool=None):
+        """Compteurs et état instantané du pool (taille, connexions prêtées, débordement)"""
+        with _lock:
+            data = asdict(self)
+        data['checkout_wait_avg'] = data['checkout_wait_total'] / data['checkouts'] if data['checkouts'] else 0.0
+        data['uptime'] = time.time() - data.pop('started_at')
+        if isinstance(pool, QueuePool):
+            data.update(size=pool.size(), checked_out=pool.checkedout(), overflow=max(pool.overflow(), 0), idle=pool.checkedin())
+        return data
+
+POOL_METRICS = PoolMetrics()
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool qui mesure l'attente d'une connexion (pool saturé)"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            POOL_METRICS.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        POOL_METRICS.record_wait(time.perf_counter() - started)
+        return connection
+
+def init_pool_metrics(engine, metrics=POOL_METRICS):
+    """Compte les prêts, retours, ouvertures, fermetures et invalidations de connexions"""
+    if getattr(engine, '_pool_metrics', None) is metrics:
+        return metrics
+    listeners = {
+        'checkout': 'checkouts',
+        'checkin': 'checkins',
+        'connect': 'connects',
+        'close': 'closes',
+        'close_detached': 'closes',
+        'invalidate': 'invalidations',
+        'soft_invalidate': 'invalidations',
+    }
+    for event_name, counter in listeners.items():
+        event.listen(engine, event_name, lambda *args, counter=counter: metrics.increment(counter))
+    engine._pool_metrics = metrics
+    return metrics
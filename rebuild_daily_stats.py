@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Script de reconstruction de l'agrégat daily_stats
+Usage: python rebuild_daily_stats.py
+
+À lancer après un import massif, une restauration de sauvegarde ou lors du
+premier déploiement : les compteurs sont ensuite maintenus par les hooks SQLAlchemy.
+"""
+
+import os
+import sys
+
+# Ajouter le répertoire parent au path pour importer app
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, rebuild_daily_stats, get_rollup_totals
+
+def main():
+    with app.app_context():
+        print("🔧 Reconstruction de daily_stats...")
+        
+        try:
+            db.create_all()
+            buckets = rebuild_daily_stats()
+            totals = get_rollup_totals()
+            
+            print(f"✅ {buckets} compteurs journaliers recalculés")
+            print(f"   Utilisateurs: {totals.users}")
+            print(f"   Candidatures: {totals.applications}")
+            print(f"   Rendez-vous: {totals.appointments}")
+            print(f"   Newsletters actives: {totals.newsletters}")
+            print(f"   Offres d'emploi: {totals.job_offers} ({totals.active_job_offers} actives)")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Erreur lors de la reconstruction: {e}")
+            return False
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Script de reconstruction des index de recherche (candidatures et utilisateurs)
+Usage: python rebuild_search_index.py
+
+À lancer après un import massif ou une restauration de sauvegarde : l'index
+est ensuite maintenu par les hooks SQLAlchemy.
+"""
+
+import os
+import sys
+
+# Ajouter le répertoire parent au path pour importer app
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, setup_search_index, rebuild_search_index, setup_user_lookup, rebuild_user_lookup
+from search import get_search_backend
+
+def main():
+    with app.app_context():
+        print("🔧 Reconstruction des index de recherche...")
+        
+        try:
+            setup_search_index()
+            setup_user_lookup()
+            if get_search_backend(db.engine.dialect.name) is None:
+                print(f"⚠️ Pas d'index de recherche pour {db.engine.dialect.name} : recherche par LIKE")
+                return True
+            print(f"✅ {rebuild_search_index()} candidatures indexées")
+            print(f"✅ {rebuild_user_lookup()} utilisateurs indexés")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Erreur lors de la reconstruction: {e}")
+            return False
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
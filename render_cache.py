@@ -0,0 +1,77 @@
+# Cache des rendus MonDRH
+# Rendus de rapports adressés par leur contenu, stockés sur disque avec éviction LRU
+#
+# La clé d'un rendu est l'empreinte des données du rapport, du format et des
+# options : tant que les données ne changent pas, un export est servi depuis le
+# disque sans relancer reportlab ni matplotlib. Le répertoire peut être partagé
+# par plusieurs processus (écritures atomiques, éviction tolérante).
+
+import os
+import hashlib
+import json
+
+def render_cache_key(fingerprint, format, **options):
+    """Clé d'un rendu : empreinte des données + format + options de rendu"""
+    payload = json.dumps({'data': fingerprint, 'format': format, 'options': options}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class RenderCache:
+    """Cache disque borné en taille ; l'accès à une entrée la rafraîchit (LRU par date de modification)"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """Contenu d'un rendu en cache, ou None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as handle:
+                content = handle.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return content
+
+    def put(self, key, content):
+        """Enregistre un rendu puis évince les entrées les moins récemment utilisées"""
+        if len(content) > self.max_bytes:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.part"
+        with open(tmp_path, 'wb') as handle:
+            handle.write(content)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Supprime les entrées les plus anciennes jusqu'à repasser sous max_bytes"""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith('.part'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        return removed
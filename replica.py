@@ -0,0 +1,97 @@
+# Routage des lectures de reporting vers un réplica MonDRH
+# Les exports et agrégations d'administration peuvent lire sur une copie en lecture
+# seule (bind SQLALCHEMY_BINDS['replica']) pour ne pas concurrencer les écritures des
+# candidats sur la base principale. Avant d'utiliser le réplica, son retard est
+# vérifié (au plus toutes les REPLICA_LAG_CHECK_INTERVAL secondes) : trop en retard
+# ou injoignable, les lectures repartent sur la base principale.
+#
+# Mesure du retard : sur un standby PostgreSQL, d'après le dernier journal rejoué ;
+# sinon (réplication logique, copie de fichier SQLite en local) grâce à une table
+# replica_heartbeat dont la base principale met à jour l'horodatage à chaque
+# vérification, lu ensuite sur le réplica. La précision est alors celle de
+# l'intervalle de vérification. Ce module ne dépend pas de app.py.
+
+import time
+import logging
+import threading
+from dataclasses import dataclass
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+REPLICA_MAX_LAG = 30  # secondes de retard tolérées
+REPLICA_LAG_CHECK_INTERVAL = 5  # secondes entre deux mesures
+
+@dataclass
+class ReplicaStatus:
+    """Dernière mesure du retard du réplica"""
+    configured: bool = False
+    lag: float = None  # secondes, None : inconnu (réplica injoignable ou non alimenté)
+    method: str = ''
+    checked_at: float = 0.0
+    error: str = ''
+
+    @property
+    def healthy(self):
+        return self.lag is not None
+
+class ReplicaRouter:
+    """Choisit le moteur des lectures de reporting : réplica s'il est à jour, sinon principal"""
+
+    def __init__(self, primary, replica=None, max_lag=REPLICA_MAX_LAG, check_interval=REPLICA_LAG_CHECK_INTERVAL):
+        self.primary = primary
+        self.replica = replica
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._status = ReplicaStatus(configured=replica is not None)
+        self._lock = threading.Lock()
+
+    def _beat(self):
+        """Écrit l'horodatage courant dans replica_heartbeat sur la base principale"""
+        with self.primary.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE IF NOT EXISTS replica_heartbeat (id INTEGER PRIMARY KEY, beat_at FLOAT NOT NULL)"
+            ))
+            parameters = {'beat_at': time.time()}
+            updated = connection.execute(text("UPDATE replica_heartbeat SET beat_at = :beat_at WHERE id = 1"), parameters).rowcount
+            if not updated:
+                connection.execute(text("INSERT INTO replica_heartbeat (id, beat_at) VALUES (1, :beat_at)"), parameters)
+
+    def measure_lag(self):
+        """Mesure le retard du réplica ; retourne (secondes, méthode)"""
+        with self.replica.connect() as connection:
+            if connection.dialect.name == 'postgresql' and connection.execute(text("SELECT pg_is_in_recovery()")).scalar():
+                # Tout le journal reçu est rejoué : à jour, même si la base principale est inactive
+                lag = connection.execute(text(
+                    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+                )).scalar()
+                return (float(lag) if lag is not None else None), 'wal_replay'
+            # Autres cas : heartbeat écrit sur la base principale puis relu sur le réplica
+            self._beat()
+            beat_at = connection.execute(text("SELECT beat_at FROM replica_heartbeat WHERE id = 1")).scalar()
+        return (max(time.time() - beat_at, 0.0) if beat_at is not None else None), 'heartbeat'
+
+    def status(self, refresh=False):
+        """Retard du réplica, mesuré au plus toutes les check_interval secondes"""
+        if self.replica is None:
+            return self._status
+        with self._lock:
+            if refresh or time.monotonic() - self._status.checked_at >= self.check_interval:
+                status = ReplicaStatus(configured=True, checked_at=time.monotonic())
+                try:
+                    status.lag, status.method = self.measure_lag()
+                except Exception as e:
+                    status.error = str(e)
+                    logger.warning(f"Réplica injoignable, lectures de reporting sur la base principale : {e}")
+                self._status = status
+            return self._status
+
+    def use_replica(self):
+        status = self.status()
+        return status.healthy and status.lag <= self.max_lag
+
+    def engine(self):
+        """Moteur à utiliser pour une lecture de reporting"""
+        return self.replica if self.use_replica() else self.primary
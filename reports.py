@@ -0,0 +1,584 @@
+# Rapports MonDRH
+# Instantané des données de reporting et rendus (CSV, Excel, PDF, PNG, SVG)
+#
+# Ce module ne dépend pas de app.py : les rendus travaillent uniquement sur un
+# ReportSnapshot (données simples), ce qui permet de les exécuter hors requête.
+
+import io
+import os
+import csv
+import itertools
+import hashlib
+import json
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, date, timedelta
+
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+from charts import ChartSpec, ChartPanel, CHART_OUTPUTS, render_chart
+from render_cache import render_cache_key
+
+# Séries temporelles : intervalles de regroupement et libellés
+TIME_SERIES_GRANULARITIES = ('day', 'week', 'month')
+TIME_SERIES_LABELS = {
+    'applications': 'Candidatures',
+    'appointments': 'Rendez-vous',
+    'registrations': 'Inscriptions',
+}
+MONTH_LABELS = ['Jan', 'Fév', 'Mar', 'Avr', 'Mai', 'Jun', 'Jul', 'Aoû', 'Sep', 'Oct', 'Nov', 'Déc']
+
+def bucket_start(day, granularity):
+    """Premier jour de l'intervalle (jour, semaine ISO commençant le lundi, mois) contenant day"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+def next_bucket(start, granularity):
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+def bucket_range(first_day, last_day, granularity):
+    """Débuts de tous les intervalles couvrant [first_day, last_day]"""
+    buckets = []
+    current = bucket_start(first_day, granularity)
+    while current <= last_day:
+        buckets.append(current)
+        current = next_bucket(current, granularity)
+    return buckets
+
+def bucket_label(start, granularity, with_year=False):
+    """Libellé court d'un intervalle pour les axes des graphiques"""
+    if granularity == 'month':
+        label = MONTH_LABELS[start.month - 1]
+        return f"{label} {start.year}" if with_year else label
+    if granularity == 'week':
+        iso_year, iso_week = start.isocalendar()[:2]
+        return f"S{iso_week:02d} {iso_year}" if with_year else f"S{iso_week:02d}"
+    return start.strftime('%d/%m/%Y' if with_year else '%d/%m')
+
+@dataclass
+class TimeSeries:
+    """Comptages par intervalle de temps, une liste de valeurs par série (alignée sur buckets)"""
+    granularity: str
+    buckets: list = field(default_factory=list)
+    series: dict = field(default_factory=dict)
+
+    @property
+    def labels(self):
+        with_year = bool(self.buckets) and self.buckets[0].year != self.buckets[-1].year
+        return [bucket_label(start, self.granularity, with_year) for start in self.buckets]
+
+    def rows(self):
+        """Lignes (intervalle, valeur de chaque série) pour les tableaux"""
+        return [
+            [label] + [values[index] for values in self.series.values()]
+            for index, label in enumerate(self.labels)
+        ]
+
+    def to_dict(self):
+        return {
+            'granularity': self.granularity,
+            'buckets': [start.isoformat() for start in self.buckets],
+            'labels': self.labels,
+            'series': self.series,
+        }
+
+@dataclass
+class ReportSnapshot:
+    """Données d'un rapport, calculées une fois et partagées par tous les formats d'export"""
+    generated_at: datetime
+    total_users: int = 0
+    total_applications: int = 0
+    total_appointments: int = 0
+    total_newsletters: int = 0
+    total_job_offers: int = 0
+    active_job_offers: int = 0
+    applications_by_status: dict = field(default_factory=dict)
+    job_offers_by_contract: dict = field(default_factory=dict)
+    # (id, candidat, poste, service, statut, date de création)
+    recent_applications: list = field(default_factory=list)
+    # (id, client, service, date, heure, statut)
+    recent_appointments: list = field(default_factory=list)
+    # (id, titre, entreprise, localisation, type de contrat, active, nombre de candidatures)
+    job_offers: list = field(default_factory=list)
+    # Évolution mensuelle des candidatures, rendez-vous et inscriptions
+    timeline: TimeSeries = None
+
+    @property
+    def accepted_applications(self):
+        return self.applications_by_status.get('accepted', 0)
+
+    @property
+    def acceptance_rate(self):
+        if not self.total_applications:
+            return 0
+        return self.accepted_applications / self.total_applications * 100
+
+    @property
+    def title(self):
+        return f"Rapport MondeRH - {self.generated_at.strftime('%d/%m/%Y %H:%M')}"
+
+    def stats_rows(self):
+        """Lignes du tableau 'Statistiques générales'"""
+        return [
+            ['Total Utilisateurs', self.total_users],
+            ['Total Candidatures', self.total_applications],
+            ['Total Rendez-vous', self.total_appointments],
+            ['Newsletters Actives', self.total_newsletters],
+            ['Offres d\'emploi', self.total_job_offers],
+            ['Offres actives', self.active_job_offers]
+        ]
+
+    def application_rows(self):
+        return [format_application_row(row) for row in self.recent_applications]
+
+    def appointment_rows(self):
+        return [format_appointment_row(row) for row in self.recent_appointments]
+
+    def job_rows(self):
+        return [format_job_row(row) for row in self.job_offers]
+
+    def fingerprint(self):
+        """Empreinte des données (hors date de génération) : même empreinte, mêmes rendus"""
+        data = asdict(self)
+        data.pop('generated_at')
+        payload = json.dumps(_canonical(data), default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _canonical(value):
+    # Dictionnaires triés (les clés peuvent être None) pour une sérialisation stable
+    if isinstance(value, dict):
+        return sorted(([str(key), _canonical(item)] for key, item in value.items()), key=lambda pair: pair[0])
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    return value
+
+def format_application_row(row):
+    app_id, candidate, position, service_type, status, created_at = row
+    return [app_id, candidate, position, service_type, status, created_at.strftime('%d/%m/%Y %H:%M') if created_at else '']
+
+def format_appointment_row(row):
+    apt_id, client, service_type, date, time, status = row
+    return [apt_id, client, service_type, date.strftime('%d/%m/%Y'), time.strftime('%H:%M'), status]
+
+def format_job_row(row):
+    job_id, title, company, location, contract_type, is_active, applications = row
+    return [job_id, title, company, location, contract_type, 'Active' if is_active else 'Inactive', applications]
+
+APPLICATION_HEADERS = ['ID', 'Candidat', 'Poste', 'Service', 'Statut', 'Date']
+APPOINTMENT_HEADERS = ['ID', 'Client', 'Service', 'Date', 'Heure', 'Statut']
+JOB_HEADERS = ['ID', 'Titre', 'Entreprise', 'Localisation', 'Type', 'Statut', 'Candidatures']
+
+def render_csv(snapshot):
+    """Rapport complet au format CSV"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+
+    # En-têtes
+    writer.writerow([snapshot.title])
+    writer.writerow([])
+
+    # Statistiques générales
+    writer.writerow(['STATISTIQUES GÉNÉRALES'])
+    writer.writerow(['Métrique', 'Valeur'])
+    writer.writerows(snapshot.stats_rows())
+    writer.writerow([])
+
+    # Candidatures récentes
+    writer.writerow(['CANDIDATURES RÉCENTES'])
+    writer.writerow(APPLICATION_HEADERS)
+    writer.writerows(snapshot.application_rows())
+    writer.writerow([])
+
+    # Rendez-vous récents
+    writer.writerow(['RENDEZ-VOUS RÉCENTS'])
+    writer.writerow(APPOINTMENT_HEADERS)
+    writer.writerows(snapshot.appointment_rows())
+    writer.writerow([])
+
+    # Offres d'emploi
+    writer.writerow(['OFFRES D\'EMPLOI'])
+    writer.writerow(JOB_HEADERS)
+    writer.writerows(snapshot.job_rows())
+
+    return output.getvalue()
+
+def _write_sheet(ws, headers, rows, start_row=1):
+    """Écrit un tableau (en-têtes en gras) et ajuste la largeur des colonnes au fil de l'eau"""
+    widths = {}
+    for row_idx, row_data in enumerate([headers] + rows, start=start_row):
+        for col_idx, value in enumerate(row_data, start=1):
+            cell = ws.cell(row=row_idx, column=col_idx, value=value)
+            if row_idx == start_row:
+                cell.font = Font(bold=True)
+                cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+            widths[cell.column_letter] = max(widths.get(cell.column_letter, 0), len(str(value)))
+
+    for column_letter, max_length in widths.items():
+        ws.column_dimensions[column_letter].width = min(max_length + 2, 50)
+
+def render_excel(snapshot):
+    """Rapport complet au format Excel (une feuille par section)"""
+    wb = Workbook()
+
+    # Supprimer la feuille par défaut
+    wb.remove(wb.active)
+
+    # Statistiques générales
+    ws_stats = wb.create_sheet("Statistiques")
+    ws_stats['A1'] = snapshot.title
+    ws_stats['A1'].font = Font(size=16, bold=True)
+    ws_stats.merge_cells('A1:C1')
+    _write_sheet(ws_stats, ['Métrique', 'Valeur'], snapshot.stats_rows(), start_row=3)
+
+    # Candidatures
+    _write_sheet(wb.create_sheet("Candidatures"), APPLICATION_HEADERS, snapshot.application_rows())
+
+    # Rendez-vous
+    _write_sheet(wb.create_sheet("Rendez-vous"), APPOINTMENT_HEADERS, snapshot.appointment_rows())
+
+    # Offres d'emploi
+    _write_sheet(wb.create_sheet("Offres d'emploi"), JOB_HEADERS, snapshot.job_rows())
+
+    # Sauvegarder en mémoire
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+# Nombre de lignes lues en tête de flux pour dimensionner les colonnes en mode write-only
+EXCEL_WIDTH_SAMPLE_ROWS = 500
+
+def write_streaming_workbook(output, sheets):
+    """Écrit un classeur Excel en mode write-only, sans garder les cellules en mémoire
+
+    sheets est une liste de (titre, en-têtes, itérable de lignes). openpyxl écrit la
+    largeur des colonnes avant les données : elle est calculée à partir des premières
+    lignes du flux, puis ces lignes et le reste du flux sont écrits au fil de l'eau.
+    """
+    wb = Workbook(write_only=True)
+
+    for title, headers, rows in sheets:
+        ws = wb.create_sheet(title)
+        rows = iter(rows)
+        sample = list(itertools.islice(rows, EXCEL_WIDTH_SAMPLE_ROWS))
+
+        widths = [len(str(header)) for header in headers]
+        for row in sample:
+            for col_idx, value in enumerate(row):
+                if value is not None and col_idx < len(widths):
+                    widths[col_idx] = max(widths[col_idx], len(str(value)))
+        for col_idx, width in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = min(width + 2, 50)
+
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = Font(bold=True)
+            cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+            header_cells.append(cell)
+        ws.append(header_cells)
+
+        for row in itertools.chain(sample, rows):
+            ws.append(row)
+
+    wb.save(output)
+
+def _table_style(header_font_size, body_font_size=None):
+    commands = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), header_font_size),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]
+    if body_font_size:
+        commands.append(('FONTSIZE', (0, 1), (-1, -1), body_font_size))
+    return TableStyle(commands)
+
+def _stringify(rows):
+    return [[str(value) for value in row] for row in rows]
+
+def render_pdf(snapshot):
+    """Rapport complet au format PDF"""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    elements = []
+
+    # Styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=30,
+        alignment=1  # Center
+    )
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        spaceAfter=12,
+        spaceBefore=20
+    )
+
+    # Titre
+    elements.append(Paragraph(snapshot.title, title_style))
+    elements.append(Spacer(1, 20))
+
+    # Statistiques générales
+    elements.append(Paragraph("Statistiques Générales", heading_style))
+    stats_table = Table(_stringify([['Métrique', 'Valeur']] + snapshot.stats_rows()), colWidths=[200, 100])
+    stats_table.setStyle(_table_style(12))
+    elements.append(stats_table)
+    elements.append(Spacer(1, 20))
+
+    # Évolution mensuelle
+    if snapshot.timeline and snapshot.timeline.buckets:
+        timeline = snapshot.timeline
+        elements.append(Paragraph("Évolution Mensuelle", heading_style))
+        headers = ['Mois'] + [TIME_SERIES_LABELS[name] for name in timeline.series]
+        timeline_table = Table(_stringify([headers] + timeline.rows()), colWidths=[80] + [90] * len(timeline.series))
+        timeline_table.setStyle(_table_style(10, 8))
+        elements.append(timeline_table)
+        elements.append(Spacer(1, 20))
+
+    # Candidatures récentes
+    elements.append(Paragraph("Candidatures Récentes", heading_style))
+    apps_table = Table(_stringify([APPLICATION_HEADERS] + snapshot.application_rows()), colWidths=[30, 80, 80, 60, 50, 60])
+    apps_table.setStyle(_table_style(10, 8))
+    elements.append(apps_table)
+    elements.append(Spacer(1, 20))
+
+    # Rendez-vous récents
+    elements.append(Paragraph("Rendez-vous Récents", heading_style))
+    apts_table = Table(_stringify([APPOINTMENT_HEADERS] + snapshot.appointment_rows()), colWidths=[30, 80, 60, 60, 50, 50])
+    apts_table.setStyle(_table_style(10, 8))
+    elements.append(apts_table)
+
+    # Générer le PDF
+    doc.build(elements)
+    return buffer.getvalue()
+
+def report_chart_spec(snapshot):
+    """Graphiques du rapport complet (statistiques, statuts, contrats, évolution)"""
+    timeline = snapshot.timeline or TimeSeries('month')
+    return ChartSpec(
+        title=snapshot.title,
+        figsize=(15, 10),
+        panels=[
+            # Graphique 1: Statistiques générales
+            ChartPanel(
+                'bar', title='Statistiques Générales', ylabel='Nombre', rotate_labels=45,
+                labels=['Utilisateurs', 'Candidatures', 'Rendez-vous', 'Newsletters'],
+                values=[snapshot.total_users, snapshot.total_applications,
+                        snapshot.total_appointments, snapshot.total_newsletters],
+                colors=['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4']
+            ),
+            # Graphique 2: Statut des candidatures
+            ChartPanel(
+                'pie', title='Statut des Candidatures',
+                labels=list(snapshot.applications_by_status.keys()),
+                values=list(snapshot.applications_by_status.values())
+            ),
+            # Graphique 3: Offres d'emploi par type
+            ChartPanel(
+                'bar', title='Offres par Type de Contrat' if snapshot.job_offers_by_contract else '',
+                ylabel='Nombre' if snapshot.job_offers_by_contract else '', rotate_labels=45,
+                labels=list(snapshot.job_offers_by_contract.keys()),
+                values=list(snapshot.job_offers_by_contract.values()),
+                colors=['#FFEAA7', '#DDA0DD', '#98D8C8']
+            ),
+            # Graphique 4: Évolution mensuelle
+            ChartPanel(
+                'line', title='Évolution Mensuelle', ylabel='Nombre', rotate_labels=45,
+                labels=timeline.labels,
+                series={TIME_SERIES_LABELS[name]: values for name, values in timeline.series.items()}
+            ),
+        ]
+    )
+
+def render_dashboard_pdf(snapshot):
+    """Synthèse du tableau de bord au format PDF"""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    elements = []
+
+    # Styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=30,
+        alignment=1  # Center
+    )
+
+    # Titre
+    elements.append(Paragraph("Tableau de Bord - MondeRH", title_style))
+    elements.append(Spacer(1, 20))
+
+    # Date de génération
+    elements.append(Paragraph(f"Généré le : {snapshot.generated_at.strftime('%d/%m/%Y à %H:%M')}", styles['Normal']))
+    elements.append(Spacer(1, 30))
+
+    # Statistiques
+    stats_data = [
+        ['Métrique', 'Valeur'],
+        ['Total Candidatures', str(snapshot.total_applications)],
+        ['Total Rendez-vous', str(snapshot.total_appointments)],
+        ['Total Utilisateurs', str(snapshot.total_users)],
+        ['Taux d\'acceptation', f"{snapshot.acceptance_rate:.1f}%"]
+    ]
+
+    stats_table = Table(stats_data)
+    stats_table.setStyle(_table_style(14))
+    elements.append(stats_table)
+    elements.append(Spacer(1, 30))
+
+    # Construire le PDF
+    doc.build(elements)
+    return buffer.getvalue()
+
+def dashboard_chart_spec(snapshot):
+    """Graphiques de synthèse du tableau de bord"""
+    acceptance_rate = snapshot.acceptance_rate
+    info_text = f"""
+    RAPPORT DASHBOARD
+
+    Date: {snapshot.generated_at.strftime('%d/%m/%Y')}
+    Heure: {snapshot.generated_at.strftime('%H:%M')}
+
+    STATISTIQUES:
+    • Candidatures: {snapshot.total_applications}
+    • Rendez-vous: {snapshot.total_appointments}
+    • Utilisateurs: {snapshot.total_users}
+    • Taux d'acceptation: {acceptance_rate:.1f}%
+
+    Généré automatiquement par MondeRH
+    """
+    return ChartSpec(
+        title='Tableau de Bord - MondeRH',
+        figsize=(12, 8),
+        panels=[
+            # Graphique 1: Répartition des candidatures
+            ChartPanel(
+                'pie', title='Répartition des Candidatures', start_angle=90,
+                labels=['En attente', 'Acceptées', 'Refusées'],
+                values=[
+                    snapshot.applications_by_status.get('pending', 0),
+                    snapshot.accepted_applications,
+                    snapshot.applications_by_status.get('rejected', 0)
+                ],
+                colors=['#ffc107', '#28a745', '#dc3545']
+            ),
+            # Graphique 2: Statistiques générales
+            ChartPanel(
+                'bar', title='Statistiques Générales', ylabel='Nombre', annotate=True,
+                labels=['Candidatures', 'Rendez-vous', 'Utilisateurs'],
+                values=[snapshot.total_applications, snapshot.total_appointments, snapshot.total_users],
+                colors=['#667eea', '#28a745', '#ffc107']
+            ),
+            # Graphique 3: Taux d'acceptation
+            ChartPanel(
+                'pie', title='Taux d\'Acceptation',
+                labels=[f'Acceptées ({acceptance_rate:.1f}%)', f'Autres ({100-acceptance_rate:.1f}%)'],
+                values=[acceptance_rate, 100-acceptance_rate],
+                colors=['#28a745', '#f8f9fa']
+            ),
+            # Graphique 4: Informations textuelles
+            ChartPanel('text', text=info_text),
+        ]
+    )
+
+# Graphiques exportables : (description du graphique, format de sortie)
+CHART_FORMATS = {
+    'png': (report_chart_spec, 'png'),
+    'svg': (report_chart_spec, 'svg'),
+    'dashboard_png': (dashboard_chart_spec, 'png'),
+    'dashboard_svg': (dashboard_chart_spec, 'svg'),
+}
+
+def _chart_render(format):
+    def render(snapshot):
+        spec_builder, output = CHART_FORMATS[format]
+        return render_chart(spec_builder(snapshot), output)
+    return render
+
+# Formats d'export : (fonction de rendu, type MIME, extension)
+REPORT_FORMATS = {
+    'csv': (render_csv, 'text/csv', 'csv'),
+    'excel': (render_excel, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    'pdf': (render_pdf, 'application/pdf', 'pdf'),
+    'png': (_chart_render('png'), CHART_OUTPUTS['png'], 'png'),
+    'svg': (_chart_render('svg'), CHART_OUTPUTS['svg'], 'svg'),
+    'dashboard_pdf': (render_dashboard_pdf, 'application/pdf', 'pdf'),
+    'dashboard_png': (_chart_render('dashboard_png'), CHART_OUTPUTS['png'], 'png'),
+    'dashboard_svg': (_chart_render('dashboard_svg'), CHART_OUTPUTS['svg'], 'svg'),
+}
+
+EXCEL_MIMETYPE = REPORT_FORMATS['excel'][1]
+
+def report_filename(format, generated_at):
+    """Nom du fichier téléchargé pour un format de rapport"""
+    extension = REPORT_FORMATS[format][2]
+    prefix = 'dashboard_monderh' if format.startswith('dashboard_') else 'rapport_monderh'
+    return f"{prefix}_{generated_at.strftime('%Y%m%d_%H%M')}.{extension}"
+
+def render_report_bytes(format, snapshot, chart_renderer=None, preset='print'):
+    """Rend un rapport et retourne son contenu binaire
+
+    Les graphiques sont confiés à chart_renderer (pool de rendu) lorsqu'il est
+    fourni, sinon dessinés dans le processus courant.
+    """
+    if format in CHART_FORMATS:
+        spec_builder, output = CHART_FORMATS[format]
+        spec = spec_builder(snapshot)
+        if chart_renderer is not None:
+            return chart_renderer.render(spec, output, preset)
+        return render_chart(spec, output, preset)
+    content = REPORT_FORMATS[format][0](snapshot)
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return content
+
+def report_cache_key(fingerprint, format, preset):
+    """Clé du cache de rendu d'un rapport ; le préréglage n'entre que dans celle des graphiques"""
+    if format in CHART_FORMATS:
+        return render_cache_key(fingerprint, format, preset=preset)
+    return render_cache_key(fingerprint, format)
+
+def render_report_file(format, snapshot, path, render_cache=None, preset='print'):
+    """Rend un rapport sur disque (exécuté dans un processus du pool d'export)
+
+    Le fichier est écrit sous un nom temporaire puis renommé : un lecteur ne voit
+    jamais de fichier partiel. Le rendu est repris du cache s'il y figure déjà,
+    avec la même clé que les exports servis directement par le site.
+    """
+    content = None
+    if render_cache is not None:
+        cache_key = report_cache_key(snapshot.fingerprint(), format, preset)
+        content = render_cache.get(cache_key)
+    if content is None:
+        content = render_report_bytes(format, snapshot, preset=preset)
+        if render_cache is not None:
+            render_cache.put(cache_key, content)
+    tmp_path = f"{path}.part"
+    with open(tmp_path, 'wb') as handle:
+        handle.write(content)
+    os.replace(tmp_path, path)
+    return len(content)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Script de remplissage progressif (backfill) d'un index ou d'une colonne dérivée
+Usage: python run_backfill.py NOM [--dry-run] [--batch-size N] [--pause S] [--throttle R] [--max-batches N] [--restart]
+
+Traite la table par lots d'identifiants, chacun validé avec son point de reprise :
+le script peut être interrompu (Ctrl+C) et relancé, il reprend au lot suivant.
+--dry-run affiche le travail restant et la durée estimée sans rien modifier.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Ajouter le répertoire parent au path pour importer app
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, BACKFILLS
+from backfill import BackfillRunner, BACKFILL_BATCH_SIZE, BACKFILL_PAUSE, BACKFILL_THROTTLE
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill MonDRH")
+    parser.add_argument('name', choices=sorted(BACKFILLS), help="backfill à exécuter")
+    parser.add_argument('--dry-run', action='store_true', help="estimation seule (un lot est exécuté puis annulé)")
+    parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE)
+    parser.add_argument('--pause', type=float, default=BACKFILL_PAUSE, help="pause minimale entre deux lots (secondes)")
+    parser.add_argument('--throttle', type=float, default=BACKFILL_THROTTLE, help="pause supplémentaire, en proportion de la durée d'un lot")
+    parser.add_argument('--max-batches', type=int, help="s'arrêter après N lots")
+    parser.add_argument('--restart', action='store_true', help="ignorer le point de reprise et repartir du début")
+    args = parser.parse_args()
+
+    backfill = BACKFILLS[args.name]
+    with app.app_context():
+        runner = BackfillRunner(db.engine, backfill, batch_size=args.batch_size, pause=args.pause, throttle=args.throttle)
+        print(f"🔧 Backfill {backfill.name} : {backfill.description}")
+
+        try:
+            if args.restart and not args.dry_run:
+                runner.reset()
+            progress = runner.progress()
+            if progress.last_id:
+                print(f"↪️  Reprise après l'id {progress.last_id} ({progress.rows_done} lignes déjà traitées)")
+
+            estimate = runner.estimate(sample=True)
+            eta = f", environ {format_duration(estimate.eta_seconds)}" if estimate.eta_seconds is not None else ""
+            print(f"📋 {estimate.remaining_rows} lignes restantes en {estimate.batches} lots de {args.batch_size}{eta}")
+            if args.dry_run:
+                return True
+
+            started = time.monotonic()
+            total = estimate.remaining_rows
+
+            def report(progress, ids, duration):
+                done = progress.rows_done - initial_rows
+                percent = 100 * done / total if total else 100
+                print(f"   lot {progress.batches} : ids {ids[0]}-{ids[-1]} en {duration * 1000:.0f} ms — {done}/{total} ({percent:.1f}%)")
+
+            initial_rows = progress.rows_done
+            try:
+                progress = runner.run(max_batches=args.max_batches, on_batch=report)
+            except KeyboardInterrupt:
+                progress = runner.progress()
+                print(f"\n⏸️  Interrompu après l'id {progress.last_id} : relancer la même commande pour reprendre")
+                return True
+
+            state = "terminé" if progress.finished_at else "en pause"
+            print(f"✅ Backfill {state} : {progress.rows_done - initial_rows} lignes en {format_duration(time.monotonic() - started)}")
+            return True
+
+        except Exception as e:
+            print(f"❌ Erreur lors du backfill: {e}")
+            return False
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
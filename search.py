@@ -0,0 +1,421 @@
+# Recherche plein texte MonDRH
+# Index des candidatures : SQLite FTS5 en développement, PostgreSQL tsvector + GIN en production
+# Recherche approximative des utilisateurs (fautes de frappe, saisie partielle) par trigrammes :
+# pg_trgm en production, index inversé de trigrammes calculés en Python sous SQLite
+#
+# L'analyse linguistique (minuscules, suppression des accents, mots vides et
+# racinisation française) est faite en Python pour les deux moteurs : les
+# résultats sont identiques en développement et en production, et le surlignage
+# des termes trouvés utilise exactement les mêmes racines que l'index. Ce module
+# ne dépend pas de app.py.
+
+import re
+import unicodedata
+from dataclasses import dataclass
+
+from markupsafe import Markup, escape
+from sqlalchemy import text, bindparam
+
+SEARCH_MAX_RESULTS = 1000
+
+_WORDS = re.compile(r"\w+", re.UNICODE)
+
+FRENCH_STOPWORDS = frozenset("""
+    a au aux avec ce ces dans de des du elle en et eux il je la le les leur lui ma mais me meme mes moi mon
+    ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un une vos votre
+    vous c d j l m n s t y est sont ete etre avoir ai as
+""".split())
+
+# Suffixes retirés par la racinisation légère, du plus long au plus court
+FRENCH_SUFFIXES = (
+    'issements', 'issement', 'atrices', 'atrice', 'ateurs', 'ateur', 'ations', 'ation',
+    'ements', 'ement', 'ments', 'ment', 'ances', 'ance', 'ences', 'ence', 'iques', 'ique',
+    'ismes', 'isme', 'istes', 'iste', 'ables', 'able', 'ibles', 'ible', 'euses', 'euse',
+    'eurs', 'eur', 'ites', 'ite', 'ives', 'ive', 'ifs', 'if', 'ees', 'ee', 'es', 'er', 'ez',
+    's', 'e', 'x',
+)
+
+def normalize_text(value):
+    """Minuscules sans accents"""
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+def stem_french(word):
+    """Racine d'un mot normalisé (racinisation légère : pluriels, féminins, suffixes courants)"""
+    for suffix in FRENCH_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+def analyze(value):
+    """Racines des mots significatifs d'un texte, dans l'ordre"""
+    return [
+        stem_french(word) for word in _WORDS.findall(normalize_text(value))
+        if word not in FRENCH_STOPWORDS
+    ]
+
+def query_terms(query):
+    """Termes d'une recherche saisie (racines, sans doublon)"""
+    return list(dict.fromkeys(analyze(query)))
+
+@dataclass
+class SearchDocument:
+    """Contenu indexé d'une candidature (texte déjà analysé)"""
+    application_id: int
+    position: str
+    applicant: str
+    cover_letter: str
+
+    @classmethod
+    def build(cls, application_id, position, cover_letter, first_name, last_name, email):
+        return cls(
+            application_id=application_id,
+            position=' '.join(analyze(position)),
+            applicant=' '.join(analyze(' '.join(filter(None, (first_name, last_name, email))))),
+            cover_letter=' '.join(analyze(cover_letter)),
+        )
+
+    def params(self):
+        return {
+            'id': self.application_id,
+            'position': self.position,
+            'applicant': self.applicant,
+            'cover_letter': self.cover_letter,
+        }
+
+class SQLiteSearchBackend:
+    """Index FTS5 ; rowid = identifiant de la candidature, classement bm25"""
+
+    def setup(self, connection):
+        """Crée l'index s'il n'existe pas ; retourne True s'il vient d'être créé"""
+        exists = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'application_search'"
+        )).first()
+        if exists:
+            return False
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE application_search USING fts5("
+            "position, applicant, cover_letter, tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+        return True
+
+    def upsert(self, connection, documents):
+        if not documents:
+            return
+        self.delete(connection, [document.application_id for document in documents])
+        connection.execute(text(
+            "INSERT INTO application_search (rowid, position, applicant, cover_letter) "
+            "VALUES (:id, :position, :applicant, :cover_letter)"
+        ), [document.params() for document in documents])
+
+    def delete(self, connection, application_ids):
+        if application_ids:
+            connection.execute(
+                text("DELETE FROM application_search WHERE rowid IN :ids").bindparams(bindparam('ids', expanding=True)),
+                {'ids': list(application_ids)}
+            )
+
+    def clear(self, connection):
+        connection.execute(text("DELETE FROM application_search"))
+
+    def search(self, connection, terms, limit=SEARCH_MAX_RESULTS):
+        """[(id de candidature, score)] du plus pertinent au moins pertinent"""
+        match = ' '.join(f'"{term}"*' for term in terms)
+        rows = connection.execute(text(
+            "SELECT rowid, bm25(application_search, 10.0, 5.0, 1.0) AS score FROM application_search "
+            "WHERE application_search MATCH :match ORDER BY score LIMIT :limit"
+        ), {'match': match, 'limit': limit})
+        # bm25 : plus petit = plus pertinent
+        return [(row[0], -row[1]) for row in rows]
+
+class PostgresSearchBackend:
+    """Table application_search (tsvector pondéré) avec index GIN, classement ts_rank_cd"""
+
+    def setup(self, connection):
+        """Crée la table et l'index s'ils n'existent pas ; retourne True si la table vient d'être créée"""
+        exists = connection.execute(text("SELECT to_regclass('application_search')")).scalar()
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS application_search ("
+            "application_id INTEGER PRIMARY KEY REFERENCES application (id) ON DELETE CASCADE, "
+            "document TSVECTOR NOT NULL)"
+        ))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_application_search_document ON application_search USING GIN (document)"
+        ))
+        return exists is None
+
+    def upsert(self, connection, documents):
+        if not documents:
+            return
+        # Configuration 'simple' : le texte est déjà normalisé et racinisé en Python
+        connection.execute(text(
+            "INSERT INTO application_search (application_id, document) VALUES (:id, "
+            "setweight(to_tsvector('simple', :position), 'A') || "
+            "setweight(to_tsvector('simple', :applicant), 'B') || "
+            "setweight(to_tsvector('simple', :cover_letter), 'C')) "
+            "ON CONFLICT (application_id) DO UPDATE SET document = EXCLUDED.document"
+        ), [document.params() for document in documents])
+
+    def delete(self, connection, application_ids):
+        if application_ids:
+            connection.execute(
+                text("DELETE FROM application_search WHERE application_id IN :ids").bindparams(bindparam('ids', expanding=True)),
+                {'ids': list(application_ids)}
+            )
+
+    def clear(self, connection):
+        connection.execute(text("TRUNCATE application_search"))
+
+    def search(self, connection, terms, limit=SEARCH_MAX_RESULTS):
+        """[(id de candidature, score)] du plus pertinent au moins pertinent"""
+        tsquery = ' & '.join(f"{term}:*" for term in terms)
+        rows = connection.execute(text(
+            "SELECT application_id, ts_rank_cd(document, query) AS score "
+            "FROM application_search, to_tsquery('simple', :tsquery) AS query "
+            "WHERE document @@ query ORDER BY score DESC, application_id DESC LIMIT :limit"
+        ), {'tsquery': tsquery, 'limit': limit})
+        return [(row[0], row[1]) for row in rows]
+
+SEARCH_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+def get_search_backend(dialect_name):
+    """Moteur d'index pour un dialecte, ou None (recherche par LIKE)"""
+    backend = SEARCH_BACKENDS.get(dialect_name)
+    return backend() if backend else None
+
+# Recherche approximative des utilisateurs
+
+# Seuil de pertinence (part des trigrammes de la saisie présents dans la fiche),
+# équivalent de pg_trgm.word_similarity_threshold
+LOOKUP_THRESHOLD = 0.5
+LOOKUP_MAX_RESULTS = 20
+# Nombre maximal d'entrées d'index lues pour choisir les candidats (SQLite)
+LOOKUP_PROBE_BUDGET = 20000
+LOOKUP_CANDIDATES = 200
+
+def lookup_document(first_name, last_name, email, company):
+    """Texte indexé d'une fiche utilisateur (normalisé comme la saisie)"""
+    return ' '.join(_WORDS.findall(normalize_text(' '.join(filter(None, (first_name, last_name, email, company))))))
+
+def trigrams(value):
+    """Trigrammes d'un texte, mot par mot, complétés comme pg_trgm ('  m', ' ma', ..., 'ie ')"""
+    grams = set()
+    for word in _WORDS.findall(normalize_text(value)):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def word_similarity(query_grams, document):
+    """Part des trigrammes de la saisie présents dans le document"""
+    if not query_grams:
+        return 0.0
+    return len(query_grams & trigrams(document)) / len(query_grams)
+
+@dataclass
+class LookupDocument:
+    """Fiche utilisateur indexée pour la recherche approximative"""
+    user_id: int
+    document: str
+
+    @classmethod
+    def build(cls, user_id, first_name, last_name, email, company):
+        return cls(user_id=user_id, document=lookup_document(first_name, last_name, email, company))
+
+class SQLiteLookupBackend:
+    """Index inversé de trigrammes (user_trigram) et fréquence de chaque trigramme (user_trigram_stats)
+
+    La recherche lit d'abord les listes des trigrammes les plus rares de la saisie
+    (dans la limite de LOOKUP_PROBE_BUDGET entrées), puis classe les candidats en
+    Python sur leur fiche complète : le coût ne dépend pas de la taille de la table.
+    """
+
+    def setup(self, connection):
+        """Crée les tables d'index si elles n'existent pas ; retourne True si elles viennent d'être créées"""
+        exists = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_lookup'"
+        )).first()
+        if exists:
+            return False
+        connection.execute(text(
+            "CREATE TABLE user_lookup (user_id INTEGER PRIMARY KEY, document TEXT NOT NULL)"
+        ))
+        connection.execute(text(
+            "CREATE TABLE user_trigram (trigram TEXT NOT NULL, user_id INTEGER NOT NULL, "
+            "PRIMARY KEY (trigram, user_id)) WITHOUT ROWID"
+        ))
+        connection.execute(text(
+            "CREATE TABLE user_trigram_stats (trigram TEXT PRIMARY KEY, users INTEGER NOT NULL) WITHOUT ROWID"
+        ))
+        return True
+
+    def upsert(self, connection, documents):
+        if not documents:
+            return
+        self.delete(connection, [document.user_id for document in documents])
+        connection.execute(text(
+            "INSERT INTO user_lookup (user_id, document) VALUES (:user_id, :document)"
+        ), [{'user_id': document.user_id, 'document': document.document} for document in documents])
+        postings = [
+            {'trigram': gram, 'user_id': document.user_id}
+            for document in documents for gram in trigrams(document.document)
+        ]
+        if postings:
+            connection.execute(text(
+                "INSERT INTO user_trigram (trigram, user_id) VALUES (:trigram, :user_id)"
+            ), postings)
+            connection.execute(text(
+                "INSERT INTO user_trigram_stats (trigram, users) VALUES (:trigram, 1) "
+                "ON CONFLICT (trigram) DO UPDATE SET users = users + 1"
+            ), postings)
+
+    def delete(self, connection, user_ids):
+        if not user_ids:
+            return
+        rows = connection.execute(
+            text("SELECT user_id, document FROM user_lookup WHERE user_id IN :ids").bindparams(bindparam('ids', expanding=True)),
+            {'ids': list(user_ids)}
+        ).all()
+        postings = [{'trigram': gram, 'user_id': user_id} for user_id, document in rows for gram in trigrams(document)]
+        if postings:
+            connection.execute(text(
+                "DELETE FROM user_trigram WHERE trigram = :trigram AND user_id = :user_id"
+            ), postings)
+            connection.execute(text(
+                "UPDATE user_trigram_stats SET users = users - 1 WHERE trigram = :trigram"
+            ), postings)
+        connection.execute(
+            text("DELETE FROM user_lookup WHERE user_id IN :ids").bindparams(bindparam('ids', expanding=True)),
+            {'ids': list(user_ids)}
+        )
+
+    def clear(self, connection):
+        for table in ('user_lookup', 'user_trigram', 'user_trigram_stats'):
+            connection.execute(text(f"DELETE FROM {table}"))
+
+    def search(self, connection, query, limit=LOOKUP_MAX_RESULTS):
+        """[(id utilisateur, score)] du plus proche au moins proche"""
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        frequencies = connection.execute(
+            text("SELECT trigram, users FROM user_trigram_stats WHERE trigram IN :grams AND users > 0 ORDER BY users")
+            .bindparams(bindparam('grams', expanding=True)),
+            {'grams': sorted(query_grams)}
+        ).all()
+        # Trigrammes les plus sélectifs d'abord ; ceux absents de l'index (faute de frappe) sont ignorés
+        probes = []
+        budget = LOOKUP_PROBE_BUDGET
+        for gram, users in frequencies:
+            if probes and users > budget:
+                break
+            probes.append(gram)
+            budget -= users
+        if not probes:
+            return []
+
+        candidates = connection.execute(
+            text(
+                "SELECT l.user_id, l.document FROM user_lookup l JOIN ("
+                "SELECT user_id, COUNT(*) AS shared FROM user_trigram WHERE trigram IN :probes "
+                "GROUP BY user_id ORDER BY shared DESC LIMIT :candidates"
+                ") c ON c.user_id = l.user_id"
+            ).bindparams(bindparam('probes', expanding=True)),
+            {'probes': probes, 'candidates': LOOKUP_CANDIDATES}
+        ).all()
+        scored = [(user_id, word_similarity(query_grams, document)) for user_id, document in candidates]
+        scored = [entry for entry in scored if entry[1] >= LOOKUP_THRESHOLD]
+        scored.sort(key=lambda entry: (-entry[1], entry[0]))
+        return scored[:limit]
+
+class PostgresLookupBackend:
+    """Table user_lookup avec index GIN gin_trgm_ops (extension pg_trgm), classement word_similarity"""
+
+    def setup(self, connection):
+        """Crée l'extension, la table et l'index s'ils n'existent pas ; retourne True si la table vient d'être créée"""
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        exists = connection.execute(text("SELECT to_regclass('user_lookup')")).scalar()
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS user_lookup ("
+            "user_id INTEGER PRIMARY KEY REFERENCES \"user\" (id) ON DELETE CASCADE, "
+            "document TEXT NOT NULL)"
+        ))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_user_lookup_document ON user_lookup USING GIN (document gin_trgm_ops)"
+        ))
+        return exists is None
+
+    def upsert(self, connection, documents):
+        if not documents:
+            return
+        connection.execute(text(
+            "INSERT INTO user_lookup (user_id, document) VALUES (:user_id, :document) "
+            "ON CONFLICT (user_id) DO UPDATE SET document = EXCLUDED.document"
+        ), [{'user_id': document.user_id, 'document': document.document} for document in documents])
+
+    def delete(self, connection, user_ids):
+        if user_ids:
+            connection.execute(
+                text("DELETE FROM user_lookup WHERE user_id IN :ids").bindparams(bindparam('ids', expanding=True)),
+                {'ids': list(user_ids)}
+            )
+
+    def clear(self, connection):
+        connection.execute(text("TRUNCATE user_lookup"))
+
+    def search(self, connection, query, limit=LOOKUP_MAX_RESULTS):
+        """[(id utilisateur, score)] du plus proche au moins proche"""
+        normalized = ' '.join(_WORDS.findall(normalize_text(query)))
+        if not normalized:
+            return []
+        # <% utilise l'index GIN avec le seuil de la session
+        connection.execute(text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+                           {'threshold': str(LOOKUP_THRESHOLD)})
+        rows = connection.execute(text(
+            "SELECT user_id, word_similarity(:query, document) AS score FROM user_lookup "
+            "WHERE :query <% document ORDER BY score DESC, user_id LIMIT :limit"
+        ), {'query': normalized, 'limit': limit})
+        return [(row[0], row[1]) for row in rows]
+
+LOOKUP_BACKENDS = {
+    'sqlite': SQLiteLookupBackend,
+    'postgresql': PostgresLookupBackend,
+}
+
+def get_lookup_backend(dialect_name):
+    """Index de recherche approximative pour un dialecte, ou None (recherche par LIKE)"""
+    backend = LOOKUP_BACKENDS.get(dialect_name)
+    return backend() if backend else None
+
+def _matches(word, terms):
+    stem = stem_french(normalize_text(word))
+    return any(stem.startswith(term) for term in terms)
+
+def highlight(value, terms):
+    """Texte échappé dont les mots correspondant aux termes sont entourés de <mark>"""
+    if not value or not terms:
+        return escape(value or '')
+    parts = []
+    position = 0
+    for match in _WORDS.finditer(value):
+        if _matches(match.group(), terms):
+            parts.append(escape(value[position:match.start()]))
+            parts.append(Markup('<mark>%s</mark>') % match.group())
+            position = match.end()
+    parts.append(escape(value[position:]))
+    return Markup('').join(parts)
+
+def snippet(value, terms, width=160):
+    """Extrait surligné autour du premier terme trouvé, ou chaîne vide"""
+    if not value or not terms:
+        return Markup('')
+    for match in _WORDS.finditer(value):
+        if _matches(match.group(), terms):
+            start = max(0, match.start() - width // 3)
+            end = min(len(value), start + width)
+            prefix = '…' if start > 0 else ''
+            suffix = '…' if end < len(value) else ''
+            return escape(prefix) + highlight(value[start:end], terms) + escape(suffix)
+    return Markup('')
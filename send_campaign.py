@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Script des campagnes newsletter
+Usage: python send_campaign.py create --subject SUJET --html FICHIER [--text FICHIER] [--segment INTÉRÊT]
+       python send_campaign.py send ID [--rate R] [--connections N] [--max-recipients N] [--retry-failed] [--force]
+       python send_campaign.py status [ID]
+
+Le sujet et les corps sont des gabarits Jinja2 (variables segment, site_url) rendus
+une fois par segment, avec des champs de fusion par destinataire : [[first_name]],
+[[last_name]], [[email]], [[company]], [[unsubscribe_url]]. L'envoi peut être
+interrompu (Ctrl+C) et relancé : il reprend aux abonnés qui n'ont rien reçu.
+Une campagne n'est envoyée que par un processus à la fois ; --force reprend une
+campagne restée « en cours » après l'arrêt brutal de son processus.
+"""
+
+import os
+import sys
+import argparse
+
+# Ajouter le répertoire parent au path pour importer app
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, NewsletterCampaign, send_campaign, campaign_progress, reset_failed_deliveries
+from campaigns import CAMPAIGN_BATCH_SIZE
+
+def read_file(path):
+    if not path:
+        return None
+    with open(path, encoding='utf-8') as handle:
+        return handle.read()
+
+def print_progress(campaign):
+    progress = campaign_progress(campaign)
+    print(f"   #{campaign.id} {campaign.subject} [{progress.status}] segment {campaign.segment or 'tous'} : "
+          f"{progress.sent} envoyés, {progress.failed} en échec, {progress.unknown} incertains, {progress.remaining} restants")
+
+def create(args):
+    campaign = NewsletterCampaign(
+        subject=args.subject,
+        body_html=read_file(args.html),
+        body_text=read_file(args.text),
+        segment=args.segment
+    )
+    db.session.add(campaign)
+    db.session.commit()
+    print(f"✅ Campagne {campaign.id} créée (brouillon)")
+    print_progress(campaign)
+    return True
+
+def send(args):
+    campaign = db.session.get(NewsletterCampaign, args.id)
+    if campaign is None:
+        print(f"❌ Campagne {args.id} introuvable")
+        return False
+    if campaign.status == 'sending' and not args.force:
+        print(f"❌ Campagne {args.id} déjà en cours d'envoi : relancer avec --force si son processus a été arrêté brutalement")
+        return False
+    if args.retry_failed:
+        print(f"↪️  {reset_failed_deliveries(campaign)} envoi(s) en échec remis en attente")
+
+    rate = app.config['CAMPAIGN_RATE'] if args.rate is None else args.rate
+    print(f"📨 Campagne {campaign.id} : {rate:g} emails/s, {args.connections or app.config['CAMPAIGN_SMTP_CONNECTIONS']} connexion(s) SMTP, liens vers {app.config['SITE_URL']}")
+
+    def report(submitted):
+        if submitted % 100 == 0:
+            print(f"   {submitted} emails confiés au serveur SMTP")
+
+    try:
+        progress = send_campaign(
+            campaign.id, rate=args.rate, connections=args.connections, batch_size=args.batch_size,
+            max_recipients=args.max_recipients, on_progress=report, force=args.force
+        )
+    except KeyboardInterrupt:
+        print("\n⏸️  Envoi interrompu : relancer la même commande pour reprendre")
+        print_progress(db.session.get(NewsletterCampaign, args.id))
+        return True
+
+    state = "terminée" if progress.status == 'sent' else "en pause"
+    print(f"✅ Campagne {state} : {progress.sent} envoyés, {progress.failed} en échec, {progress.remaining} restants")
+    return True
+
+def status(args):
+    campaigns = [db.session.get(NewsletterCampaign, args.id)] if args.id else NewsletterCampaign.query.order_by(NewsletterCampaign.id).all()
+    if not campaigns or campaigns[0] is None:
+        print("ℹ️  Aucune campagne")
+        return bool(not args.id)
+    print("📋 Campagnes :")
+    for campaign in campaigns:
+        print_progress(campaign)
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Campagnes newsletter MonDRH")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    create_parser = commands.add_parser('create', help="créer une campagne (brouillon)")
+    create_parser.add_argument('--subject', required=True)
+    create_parser.add_argument('--html', help="fichier du corps HTML")
+    create_parser.add_argument('--text', help="fichier du corps texte")
+    create_parser.add_argument('--segment', help="intérêt ciblé (recrutement, coaching, formation, interim, conseil)")
+
+    send_parser = commands.add_parser('send', help="envoyer ou reprendre une campagne")
+    send_parser.add_argument('id', type=int)
+    send_parser.add_argument('--rate', type=float, help="emails par seconde (0 : sans limite)")
+    send_parser.add_argument('--connections', type=int, help="connexions SMTP simultanées")
+    send_parser.add_argument('--batch-size', type=int, default=CAMPAIGN_BATCH_SIZE)
+    send_parser.add_argument('--max-recipients', type=int, help="s'arrêter après N destinataires")
+    send_parser.add_argument('--retry-failed', action='store_true', help="renvoyer aux destinataires en échec")
+    send_parser.add_argument('--force', action='store_true', help="reprendre une campagne restée en cours après un arrêt brutal")
+
+    status_parser = commands.add_parser('status', help="avancement des campagnes")
+    status_parser.add_argument('id', type=int, nargs='?')
+
+    args = parser.parse_args()
+    if args.command == 'create' and not (args.html or args.text):
+        parser.error("--html ou --text est requis")
+
+    with app.app_context():
+        try:
+            return {'create': create, 'send': send, 'status': status}[args.command](args)
+        except Exception as e:
+            print(f"❌ Erreur: {e}")
+            return False
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
@@ -12,7 +12,8 @@ from urllib.parse import urlparse
 # Ajouter le répertoire parent au path pour importer app
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app import app, db, User, JobOffer, Application, Appointment, Newsletter, SiteSettings, GoogleToken
+from app import app, db, User, JobOffer, Application, Appointment, Newsletter, SiteSettings, GoogleToken, DailyStat, rebuild_daily_stats
+from migrations import run_migrations
 
 def setup_production_database():
     """Configure la base de données de production"""
@@ -32,6 +33,15 @@ def setup_production_database():
             db.create_all()
             print("✅ Toutes les tables créées avec succès")
             
+            # Colonnes et index ajoutés depuis (index construits sans verrouiller les tables)
+            for migration, operations in run_migrations(db.engine):
+                print(f"✅ Migration {migration.version:04d} {migration.name} ({len(operations)} opération(s))")
+            
+            # Initialiser l'agrégat daily_stats au premier déploiement
+            if DailyStat.query.first() is None:
+                buckets = rebuild_daily_stats()
+                print(f"✅ daily_stats initialisé ({buckets} compteurs)")
+            
             # Vérifier la connexion
             try:
                 db.session.execute('SELECT 1')
@@ -0,0 +1,157 @@
+# Instrumentation SQL MonDRH
+# Comptage des requêtes, temps passé en base et détection des motifs N+1
+#
+# Les hooks before/after_cursor_execute sont posés sur toutes les connexions
+# SQLAlchemy mais ne mesurent que lorsqu'une collecte est active : par requête
+# HTTP si SQL_PROFILING est activé, ou explicitement avec track_queries() (tests,
+# scripts). Ce module ne dépend pas de app.py.
+
+import re
+import time
+import logging
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Nombre d'exécutions d'une même requête SELECT à partir duquel on signale un N+1
+N_PLUS_ONE_THRESHOLD = 5
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAMETER_LISTS = re.compile(r"\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,?)+\)")
+_SPACES = re.compile(r"\s+")
+
+def statement_fingerprint(statement):
+    """Forme normalisée d'une requête : littéraux et listes de paramètres remplacés"""
+    fingerprint = _LITERALS.sub('?', statement)
+    fingerprint = _PARAMETER_LISTS.sub('(?)', fingerprint)
+    return _SPACES.sub(' ', fingerprint).strip()
+
+@dataclass(eq=False)
+class QueryStats:
+    """Requêtes exécutées pendant une collecte"""
+    label: str = ''
+    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    count: int = 0
+    duration: float = 0.0  # secondes
+    fingerprints: Counter = field(default_factory=Counter)
+    durations: Counter = field(default_factory=Counter)
+
+    def record(self, statement, duration):
+        fingerprint = statement_fingerprint(statement)
+        self.count += 1
+        self.duration += duration
+        self.fingerprints[fingerprint] += 1
+        self.durations[fingerprint] += duration
+
+    def repeated(self, minimum=2):
+        """Requêtes exécutées au moins minimum fois : [(empreinte, nombre, durée cumulée)]"""
+        return [
+            (fingerprint, count, self.durations[fingerprint])
+            for fingerprint, count in self.fingerprints.most_common()
+            if count >= minimum
+        ]
+
+    def n_plus_one(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """SELECT identiques (aux paramètres près) répétés au moins threshold fois"""
+        return [entry for entry in self.repeated(threshold) if entry[0].upper().startswith('SELECT')]
+
+    def server_timing(self):
+        """Valeur de l'en-tête Server-Timing"""
+        return f'db;dur={self.duration * 1000:.1f};desc="SQL ({self.count})"'
+
+_local = threading.local()
+
+def _active_collectors():
+    if not hasattr(_local, 'collectors'):
+        _local.collectors = []
+    return _local.collectors
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active_collectors():
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    collectors = _active_collectors()
+    started = conn.info.get('query_started')
+    if not collectors or not started:
+        return
+    duration = time.perf_counter() - started.pop()
+    for stats in collectors:
+        stats.record(statement, duration)
+
+@contextmanager
+def track_queries(label=''):
+    """Collecte les requêtes exécutées dans le bloc (fil d'exécution courant)"""
+    stats = QueryStats(label=label)
+    collectors = _active_collectors()
+    collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        collectors.remove(stats)
+
+@contextmanager
+def assert_max_queries(maximum, label=''):
+    """Échoue (AssertionError) si le bloc exécute plus de maximum requêtes"""
+    with track_queries(label) as stats:
+        yield stats
+    if stats.count > maximum:
+        details = '\n'.join(f"  {count}× {fingerprint}" for fingerprint, count, _ in stats.repeated(1))
+        raise AssertionError(f"{stats.count} requêtes exécutées (maximum {maximum}):\n{details}")
+
+@contextmanager
+def assert_no_n_plus_one(threshold=N_PLUS_ONE_THRESHOLD, label=''):
+    """Échoue (AssertionError) si le bloc répète un même SELECT threshold fois ou plus"""
+    with track_queries(label) as stats:
+        yield stats
+    suspects = stats.n_plus_one(threshold)
+    if suspects:
+        details = '\n'.join(f"  {count}× {fingerprint}" for fingerprint, count, _ in suspects)
+        raise AssertionError(f"Motif N+1 détecté:\n{details}")
+
+def init_sql_profiler(app, history_size=50):
+    """Active la collecte par requête HTTP : en-tête Server-Timing, journal et historique"""
+    threshold = app.config.get('SQL_N_PLUS_ONE_THRESHOLD', N_PLUS_ONE_THRESHOLD)
+    history = deque(maxlen=history_size)
+    app.extensions['sql_profiler'] = history
+
+    @app.before_request
+    def _start_sql_profiling():
+        g.sql_stats = QueryStats(label=f"{request.method} {request.path}")
+        _active_collectors().append(g.sql_stats)
+
+    @app.after_request
+    def _finish_sql_profiling(response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+        collectors = _active_collectors()
+        if stats in collectors:
+            collectors.remove(stats)
+
+        response.headers.add('Server-Timing', stats.server_timing())
+        suspects = stats.n_plus_one(threshold)
+        for fingerprint, count, _ in suspects:
+            logger.warning(f"N+1 probable sur {stats.label} : {count}× {fingerprint}")
+        history.appendleft(stats)
+        return response
+
+    @app.teardown_request
+    def _abort_sql_profiling(exc=None):
+        # Requête interrompue par une exception : ne pas laisser la collecte active
+        stats = g.pop('sql_stats', None)
+        collectors = _active_collectors()
+        if stats is not None and stats in collectors:
+            collectors.remove(stats)
+
+    return history
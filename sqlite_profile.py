@@ -0,0 +1,76 @@
+# Profil de performance SQLite MonDRH
+# En mode journal classique (rollback), un écrivain bloque les lecteurs pendant
+# son commit et les workers gunicorn se retrouvent en « database is locked ». Le
+# mode WAL laisse lire pendant qu'on écrit ; synchronous=NORMAL ne synchronise le
+# disque qu'aux checkpoints (sûr en WAL : seul le dernier commit peut être perdu en
+# cas de coupure de courant), mmap et cache agrandis limitent les lectures, et
+# busy_timeout fait patienter un écrivain au lieu d'échouer immédiatement.
+# Les pragmas sont posés à chaque nouvelle connexion (événement connect).
+# Ce module ne dépend pas de app.py.
+
+import logging
+from dataclasses import dataclass
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class SqliteProfile:
+    """Pragmas appliqués à chaque connexion SQLite"""
+    journal_mode: str = 'WAL'
+    synchronous: str = 'NORMAL'
+    busy_timeout: int = 5000  # millisecondes
+    cache_size: int = -20000  # négatif : en Kio (20 Mo par connexion)
+    mmap_size: int = 256 * 1024 * 1024  # octets
+    temp_store: str = 'MEMORY'
+
+    def pragmas(self):
+        # busy_timeout d'abord : lire le mode de journal demande déjà un verrou partagé
+        return (
+            ('busy_timeout', self.busy_timeout),
+            ('journal_mode', self.journal_mode),
+            ('synchronous', self.synchronous),
+            ('cache_size', self.cache_size),
+            ('mmap_size', self.mmap_size),
+            ('temp_store', self.temp_store),
+        )
+
+    def apply(self, dbapi_connection):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in self.pragmas():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+SQLITE_PROFILES = {
+    'wal': SqliteProfile(),
+    # Réglages par défaut de SQLite (référence du benchmark)
+    'legacy': SqliteProfile(journal_mode='DELETE', synchronous='FULL', cache_size=-2000, mmap_size=0, temp_store='DEFAULT'),
+}
+
+def current_pragmas(connection):
+    """Valeurs effectives des pragmas du profil sur une connexion SQLAlchemy"""
+    return {
+        name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+        for name, _ in SqliteProfile().pragmas()
+    }
+
+def init_sqlite_profile(engine, profile=None):
+    """Applique le profil à chaque connexion du moteur (sans effet hors SQLite)"""
+    if engine.dialect.name != 'sqlite':
+        return None
+    profile = profile or SQLITE_PROFILES['wal']
+    if getattr(engine, '_sqlite_profile', None) == profile:
+        return profile
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        profile.apply(dbapi_connection)
+
+    # Les connexions déjà ouvertes n'ont pas reçu les pragmas
+    engine.dispose()
+    engine._sqlite_profile = profile
+    logger.info(f"Profil SQLite : journal {profile.journal_mode}, synchronous {profile.synchronous}, busy_timeout {profile.busy_timeout} ms")
+    return profile
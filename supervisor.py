@@ -0,0 +1,108 @@
+# Supervision des workers MonDRH lancés avec le site
+# Les workers d'exports et de copies Drive doivent voir le disque du site (fichiers
+# d'export servis par le site, CV déposés) : sur Render, ils tournent donc dans le
+# service web. gunicorn.conf.py démarre ce superviseur avec le maître gunicorn ; il
+# lance un processus `python worker.py <file>` par file et le relance s'il s'arrête,
+# avec un délai doublé à chaque arrêt rapproché, et s'arrête avec ses workers si le
+# maître disparaît. Chaque ligne de sortie d'un worker est préfixée par le nom de sa
+# file pour rester lisible dans le journal du service.
+# Ce module ne dépend pas de app.py.
+
+import os
+import sys
+import time
+import signal
+import logging
+import threading
+import subprocess
+
+logger = logging.getLogger('supervisor')
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'worker.py')
+RESTART_DELAY = 1.0  # secondes
+MAX_RESTART_DELAY = 60.0
+STABLE_RUNTIME = 60.0  # un worker qui a tourné plus longtemps repart avec le délai initial
+
+class SupervisedWorker:
+    """Processus worker d'une file, relancé après chaque arrêt"""
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.process = None
+        self.started_at = 0.0
+        self.restart_at = 0.0
+        self.delay = RESTART_DELAY
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [sys.executable, '-u', WORKER_SCRIPT, self.queue],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1
+        )
+        self.started_at = time.monotonic()
+        threading.Thread(target=self._relay, args=(self.process.stdout,), daemon=True).start()
+        logger.info(f"Worker '{self.queue}' démarré (pid {self.process.pid})")
+
+    def _relay(self, stream):
+        for line in stream:
+            sys.stdout.write(f"[{self.queue}] {line}")
+            sys.stdout.flush()
+
+    def poll(self, now):
+        """Relance le worker s'il s'est arrêté et que son délai de relance est écoulé"""
+        if self.process is not None:
+            returncode = self.process.poll()
+            if returncode is None:
+                return
+            if now - self.started_at > STABLE_RUNTIME:
+                self.delay = RESTART_DELAY
+            logger.warning(f"Worker '{self.queue}' arrêté (code {returncode}), relance dans {self.delay:.0f} s")
+            self.process = None
+            self.restart_at = now + self.delay
+            self.delay = min(self.delay * 2, MAX_RESTART_DELAY)
+        if now >= self.restart_at:
+            self.start()
+
+    def stop(self, timeout=10):
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+def supervise(queues, poll_interval=1.0):
+    """Lance un worker par file et les relance jusqu'à SIGTERM/SIGINT ou la fin du processus parent"""
+    parent = os.getppid()
+    stopping = threading.Event()
+
+    def request_stop(signum, frame):
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    workers = [SupervisedWorker(queue) for queue in queues]
+    try:
+        while not stopping.is_set() and os.getppid() == parent:
+            now = time.monotonic()
+            for worker in workers:
+                worker.poll(now)
+            stopping.wait(poll_interval)
+    finally:
+        for worker in workers:
+            if worker.process is not None:
+                worker.process.terminate()
+        for worker in workers:
+            worker.stop()
+
+def start_supervisor(queues):
+    """Démarre le superviseur dans un processus séparé (None : aucune file)"""
+    if not queues:
+        return None
+    return subprocess.Popen([sys.executable, '-u', os.path.abspath(__file__), *queues])
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    supervise(sys.argv[1:])
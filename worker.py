@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Worker de tâches en arrière-plan pour MonDRH
+Usage: python worker.py exports|emails|drive [--once]
+
+- exports : rend les exports de rapports demandés depuis l'administration
+- emails : envoie les emails de la boîte d'envoi (table email_outbox)
+- drive : copie les CV sur Google Drive par upload résumable (table drive_upload)
+"""
+
+import os
+import sys
+import time
+import smtplib
+import logging
+import argparse
+from contextlib import ExitStack
+from google.auth.exceptions import RefreshError
+from googleapiclient.errors import HttpError
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# Ajouter le répertoire parent au path pour importer app
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import (
+    app, db, mail, render_cache, get_report_snapshot, claim_next_export_job, complete_export_job,
+    requeue_interrupted_export_jobs, cleanup_export_jobs, claim_email_batch, complete_email,
+    outbox_message, requeue_interrupted_emails, cleanup_email_outbox, claim_drive_uploads,
+    process_drive_upload, complete_drive_upload, requeue_interrupted_drive_uploads
+)
+from reports import report_filename, render_report_file
+from charts import warm_up
+
+logger = logging.getLogger('worker')
+
+# Intervalle entre deux nettoyages des exports expirés (secondes)
+CLEANUP_INTERVAL = 15 * 60
+
+def dispatch_export_job(pool, job):
+    """Prépare le fichier cible d'un job et confie son rendu au pool de processus"""
+    snapshot = get_report_snapshot()
+    job.filename = report_filename(job.format, snapshot.generated_at)
+    job.file_path = os.path.join(app.config['EXPORT_FOLDER'], f"{job.id}_{job.filename}")
+    db.session.commit()
+    return pool.submit(render_report_file, job.format, snapshot, job.file_path, render_cache, app.config['CHART_PRESET'])
+
+def run_export_worker(poll_interval=2.0, once=False):
+    """Boucle principale : réserve les jobs en attente et collecte les rendus terminés"""
+    max_workers = app.config['EXPORT_WORKERS']
+    os.makedirs(app.config['EXPORT_FOLDER'], exist_ok=True)
+
+    pending = {}
+    last_cleanup = 0.0
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=warm_up) as pool:
+        while True:
+            with app.app_context():
+                if time.monotonic() - last_cleanup > CLEANUP_INTERVAL:
+                    removed = cleanup_export_jobs()
+                    if removed:
+                        logger.info(f"{removed} export(s) expiré(s) supprimé(s)")
+                    # Jobs d'un worker arrêté brutalement, une fois EXPORT_JOB_TIMEOUT dépassé
+                    requeued = requeue_interrupted_export_jobs()
+                    if requeued:
+                        logger.info(f"{requeued} export(s) interrompu(s) remis en attente")
+                    last_cleanup = time.monotonic()
+
+                while len(pending) < max_workers:
+                    job = claim_next_export_job()
+                    if not job:
+                        break
+                    logger.info(f"Export {job.id} ({job.format}) démarré")
+                    try:
+                        pending[dispatch_export_job(pool, job)] = (job.id, job.file_path)
+                    except Exception as e:
+                        logger.error(f"Export {job.id} impossible à préparer: {e}")
+                        complete_export_job(job.id, error=e)
+
+            if not pending:
+                if once:
+                    return
+                time.sleep(poll_interval)
+                continue
+
+            done, _ = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            with app.app_context():
+                for future in done:
+                    job_id, file_path = pending.pop(future)
+                    error = future.exception()
+                    if not complete_export_job(job_id, error=error):
+                        # Job supprimé pendant le rendu (utilisateur supprimé) : fichier orphelin
+                        if os.path.exists(file_path):
+                            os.remove(file_path)
+                        logger.info(f"Export {job_id} supprimé pendant son rendu")
+                        continue
+                    if error:
+                        logger.error(f"Export {job_id} en échec: {error}")
+                    else:
+                        logger.info(f"Export {job_id} terminé ({future.result()} octets)")
+
+# Échecs liés à la connexion (serveur injoignable, coupure, authentification) : tout le lot est reprogrammé
+SMTP_CONNECTION_ERRORS = (
+    smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, smtplib.SMTPHeloError,
+    smtplib.SMTPAuthenticationError, smtplib.SMTPNotSupportedError
+)
+
+def is_smtp_connection_error(error):
+    # SMTPException hérite d'OSError : seules les erreurs réseau hors protocole SMTP sont retenues
+    return isinstance(error, SMTP_CONNECTION_ERRORS) or (
+        isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+    )
+
+def is_permanent_smtp_error(error):
+    """Refus définitif (code 5xx, destinataires refusés, message invalide) : inutile de réessayer"""
+    if is_smtp_connection_error(error):
+        return False
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return not isinstance(error, smtplib.SMTPException)
+
+class SMTPSession:
+    """Connexion SMTP ouverte à la demande et conservée d'un lot à l'autre"""
+
+    def __init__(self, idle_timeout):
+        self.idle_timeout = idle_timeout
+        self.stack = None
+        self.connection = None
+        self.last_used = 0.0
+
+    def send(self, message):
+        if self.connection is None:
+            self.stack = ExitStack()
+            self.connection = self.stack.enter_context(mail.connect())
+            logger.info(f"Connexion SMTP ouverte ({app.config['MAIL_SERVER']}:{app.config['MAIL_PORT']})")
+        self.connection.send(message)
+        self.last_used = time.monotonic()
+
+    def close_if_idle(self):
+        if self.connection is not None and time.monotonic() - self.last_used > self.idle_timeout:
+            self.close()
+
+    def close(self):
+        if self.connection is None:
+            return
+        try:
+            self.stack.close()
+        except (smtplib.SMTPException, OSError):
+            pass  # connexion déjà coupée par le serveur
+        self.stack = self.connection = None
+
+def deliver_email_batch(smtp, batch):
+    """Envoie un lot réservé ; retourne le nombre d'emails envoyés"""
+    sent = 0
+    for position, entry in enumerate(batch):
+        try:
+            smtp.send(outbox_message(entry))
+        except Exception as e:
+            complete_email(entry, error=e, permanent=is_permanent_smtp_error(e))
+            if is_smtp_connection_error(e):
+                # Serveur injoignable ou connexion coupée : le reste du lot est reprogrammé
+                smtp.close()
+                for remaining in batch[position + 1:]:
+                    complete_email(remaining, error=e)
+                db.session.commit()
+                logger.warning(f"Serveur SMTP indisponible, {len(batch) - position} email(s) reprogrammé(s): {e}")
+                return sent
+            logger.warning(f"Email {entry.id} non envoyé: {e}")
+        else:
+            complete_email(entry)
+            sent += 1
+        # Chaque résultat est validé aussitôt : un arrêt brutal ne renvoie qu'un seul email
+        db.session.commit()
+    return sent
+
+def run_email_worker(poll_interval=2.0, once=False):
+    """Boucle principale : vide la boîte d'envoi par lots sur une connexion SMTP conservée"""
+    smtp = SMTPSession(app.config['EMAIL_SMTP_IDLE_TIMEOUT'])
+    last_cleanup = 0.0
+    try:
+        while True:
+            with app.app_context():
+                if time.monotonic() - last_cleanup > CLEANUP_INTERVAL:
+                    removed = cleanup_email_outbox()
+                    if removed:
+                        logger.info(f"{removed} email(s) envoyé(s) purgé(s) de la boîte d'envoi")
+                    # Lots réservés par un worker arrêté brutalement, une fois leur réservation expirée
+                    requeued = requeue_interrupted_emails()
+                    if requeued:
+                        logger.info(f"{requeued} email(s) interrompu(s) remis en attente")
+                    last_cleanup = time.monotonic()
+
+                batch = claim_email_batch()
+                if batch:
+                    sent = deliver_email_batch(smtp, batch)
+                    logger.info(f"{sent}/{len(batch)} email(s) envoyé(s)")
+                    continue
+
+            smtp.close_if_idle()
+            if once:
+                return
+            time.sleep(poll_interval)
+    finally:
+        smtp.close()
+
+def is_permanent_drive_error(error):
+    """Échec qu'une nouvelle tentative ne corrigera pas (fichier absent, autorisation retirée, requête refusée)"""
+    if isinstance(error, (FileNotFoundError, LookupError, RefreshError)):
+        return True
+    if isinstance(error, HttpError):
+        if error.resp.status == 403:
+            # Quotas dépassés (rateLimitExceeded, userRateLimitExceeded) : temporaires
+            details = error.error_details if isinstance(error.error_details, list) else []
+            return not any('rateLimit' in str(detail.get('reason', '')) for detail in details if isinstance(detail, dict))
+        return error.resp.status in (400, 401, 404)
+    return False
+
+def run_drive_worker(poll_interval=2.0, once=False):
+    """Boucle principale : copie les CV en attente sur Google Drive, bloc par bloc"""
+    last_requeue = 0.0
+    while True:
+        with app.app_context():
+            if time.monotonic() - last_requeue > CLEANUP_INTERVAL:
+                # Uploads d'un worker arrêté brutalement, une fois leur réservation expirée
+                requeued = requeue_interrupted_drive_uploads()
+                if requeued:
+                    logger.info(f"{requeued} upload(s) Drive interrompu(s) remis en attente")
+                last_requeue = time.monotonic()
+
+            uploads = claim_drive_uploads()
+            for upload in uploads:
+                try:
+                    result = process_drive_upload(upload)
+                except Exception as e:
+                    db.session.rollback()
+                    complete_drive_upload(upload, error=e, permanent=is_permanent_drive_error(e))
+                    logger.warning(f"Upload Drive {upload.id} ({upload.filename}) en échec après {upload.uploaded_bytes} octet(s): {e}")
+                else:
+                    complete_drive_upload(upload, result)
+                    logger.info(f"CV {upload.filename} copié sur Google Drive ({result.get('id')})")
+            if uploads:
+                continue
+
+        if once:
+            return
+        time.sleep(poll_interval)
+
+WORKERS = {
+    'exports': run_export_worker,
+    'emails': run_email_worker,
+    'drive': run_drive_worker,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker de tâches en arrière-plan MonDRH")
+    parser.add_argument('queue', choices=sorted(WORKERS), help="file de tâches à traiter")
+    parser.add_argument('--once', action='store_true', help="traiter les tâches en attente puis s'arrêter")
+    parser.add_argument('--poll-interval', type=float, default=2.0, help="délai entre deux scrutations (secondes)")
+    args = parser.parse_args()
+
+    logger.info(f"Démarrage du worker '{args.queue}'")
+    WORKERS[args.queue](poll_interval=args.poll_interval, once=args.once)
+
+if __name__ == '__main__':
+    main()